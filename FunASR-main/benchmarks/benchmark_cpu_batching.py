@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/alibaba-damo-academy/FunASR). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""RTF and peak RSS of inference_with_vad on cpu across segment batch budgets.
+
+Every budget (cpu_batch_size_s, padded seconds of audio per batch, 0 for one segment per
+batch) runs in its own process so that the peak RSS of one run does not hide the next.
+
+python benchmarks/benchmark_cpu_batching.py --input long_audio.wav --budgets 0 15 30 60 120
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from funasr import AutoModel
+from funasr.utils.load_utils import load_audio_text_image_video
+
+
+def run(args):
+    model = AutoModel(
+        model=args.model,
+        vad_model=args.vad_model,
+        device="cpu",
+        ncpu=args.ncpu,
+        disable_pbar=True,
+        disable_update=True,
+    )
+    duration = len(load_audio_text_image_video(args.input, fs=16000)) / 16000
+    # warm up the allocator and the kernels on the first segments
+    model.generate(input=args.input, cpu_batch_size_s=args.budget)
+    begin = time.perf_counter()
+    for _ in range(args.repeat):
+        model.generate(input=args.input, cpu_batch_size_s=args.budget)
+    elapsed = (time.perf_counter() - begin) / args.repeat
+    # ru_maxrss is in KiB on linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"budget": args.budget, "rtf": elapsed / duration, "peak_rss_mb": peak_rss}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="long-form audio file")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0, 15, 30, 60, 120])
+    parser.add_argument("--model", default="paraformer-zh")
+    parser.add_argument("--vad-model", default="fsmn-vad")
+    parser.add_argument("--ncpu", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.budget is not None:
+        run(args)
+        return
+
+    print(f"{'budget (s)':>10} {'rtf':>8} {'peak rss (MB)':>14}")
+    for budget in args.budgets:
+        cmd = [sys.executable, __file__, "--budget", str(budget)]
+        cmd += ["--input", args.input, "--model", args.model, "--vad-model", args.vad_model]
+        cmd += ["--ncpu", str(args.ncpu), "--repeat", str(args.repeat)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        stats = json.loads(out.strip().splitlines()[-1])
+        print(f"{budget:>10g} {stats['rtf']:>8.4f} {stats['peak_rss_mb']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
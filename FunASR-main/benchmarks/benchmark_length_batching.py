@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/alibaba-damo-academy/FunASR). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""Padding ratio and RTF of AutoModel.generate on a list of inputs of mixed durations, batched in
+the list order (batch_size inputs per batch) or sorted by duration (sort_by_length=True).
+
+The padding ratio is the share of the padded batches that is padding, computed from the
+durations of the inputs (source_len of a jsonl list, audio headers otherwise).
+
+python benchmarks/benchmark_length_batching.py --input list.jsonl --model paraformer-zh --device cuda
+"""
+
+import argparse
+import time
+
+from funasr import AutoModel
+from funasr.auto.auto_model import length_sorted_batches, padding_ratio, prepare_data_iterator
+from funasr.utils.load_utils import audio_duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="wav.scp or jsonl list of mixed durations")
+    parser.add_argument("--model", default="paraformer-zh")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-size-s", type=float, default=None, help="padded seconds per batch")
+    args = parser.parse_args()
+    batch_size_s = args.batch_size_s or (60 if args.device == "cpu" else 300)
+
+    source_lens = []
+    _, data_list = prepare_data_iterator(args.input, source_lens=source_lens)
+    durations = [
+        source_len * 10 if source_len is not None else (audio_duration(data) or 0) * 1000
+        for data, source_len in zip(data_list, source_lens)
+    ]
+    total = sum(durations) / 1000
+    fixed = [
+        (beg, min(len(durations), beg + args.batch_size))
+        for beg in range(0, len(durations), args.batch_size)
+    ]
+    order, sorted_ranges = length_sorted_batches(durations, batch_size_s * 1000, 60 * 1000)
+    print(f"{len(durations)} inputs, {total / 3600:.2f} h audio")
+    print(f"   list order: {len(fixed):4d} batches, padding {padding_ratio(durations, fixed):.3f}")
+    sorted_durations = [durations[i] for i in order]
+    print(
+        f"       sorted: {len(sorted_ranges):4d} batches, "
+        f"padding {padding_ratio(sorted_durations, sorted_ranges):.3f}"
+    )
+
+    model = AutoModel(model=args.model, device=args.device, disable_pbar=True, disable_update=True)
+    # warm up
+    model.generate(input=args.input, batch_size=args.batch_size)
+
+    for name, sort in (("list order", False), ("sorted", True)):
+        begin = time.perf_counter()
+        model.generate(
+            input=args.input,
+            batch_size=args.batch_size,
+            sort_by_length=sort,
+            batch_size_s=batch_size_s,
+            cpu_batch_size_s=batch_size_s,
+        )
+        elapsed = time.perf_counter() - begin
+        print(f"{name:>13}: {elapsed:8.2f}s, rtf {elapsed / max(total, 1e-6):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/alibaba-damo-academy/FunASR). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""Wall time of AutoModel.generate on a list of inputs with and without the background
+prefetch of audio loading and fbank extraction (prefetch_batches).
+
+python benchmarks/benchmark_prefetch.py --input wav.scp --model paraformer-zh --batch-size 8
+"""
+
+import argparse
+import time
+
+from funasr import AutoModel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="wav.scp or jsonl list")
+    parser.add_argument("--model", default="paraformer-zh")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--prefetch-batches", type=int, default=2)
+    parser.add_argument("--prefetch-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    model = AutoModel(model=args.model, device=args.device, disable_pbar=True, disable_update=True)
+    # warm up
+    model.generate(input=args.input, batch_size=args.batch_size)
+
+    for name, prefetch in (("serial", 0), ("prefetch", args.prefetch_batches)):
+        begin = time.perf_counter()
+        res = model.generate(
+            input=args.input,
+            batch_size=args.batch_size,
+            prefetch_batches=prefetch,
+            prefetch_workers=args.prefetch_workers,
+        )
+        elapsed = time.perf_counter() - begin
+        print(f"{name:>9}: {elapsed:8.2f}s for {len(res)} inputs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/alibaba-damo-academy/FunASR). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""RTF breakdown of AutoModel.inference_with_vad with and without the VAD -> ASR audio handoff.
+
+For every file of the folder, the decode (load + resample) is timed alone, then generate() is
+run with vad_audio_handoff=False (the VAD and the ASR stages decode the file separately) and
+with the handoff (decoded once).
+
+python benchmarks/benchmark_vad_handoff.py --input-folder /data/long_audio --model paraformer-zh
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from funasr import AutoModel
+from funasr.utils.load_utils import load_audio_text_image_video
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input-folder", type=Path, required=True)
+    parser.add_argument("--extensions", nargs="+", default=[".wav", ".mp3"])
+    parser.add_argument("--model", default="paraformer-zh")
+    parser.add_argument("--vad-model", default="fsmn-vad")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size-s", type=int, default=300)
+    args = parser.parse_args()
+
+    files = sorted(p for p in args.input_folder.iterdir() if p.suffix.lower() in args.extensions)
+    model = AutoModel(
+        model=args.model, vad_model=args.vad_model, device=args.device, disable_pbar=True
+    )
+
+    total = {"audio": 0.0, "decode": 0.0, "separate": 0.0, "handoff": 0.0}
+    for path in files:
+        begin = time.perf_counter()
+        speech = load_audio_text_image_video(str(path), fs=16000)
+        decode = time.perf_counter() - begin
+        duration = len(speech) / 16000
+        del speech
+
+        elapsed = {}
+        for name, handoff in (("separate", False), ("handoff", True)):
+            begin = time.perf_counter()
+            model.generate(
+                input=str(path), batch_size_s=args.batch_size_s, vad_audio_handoff=handoff
+            )
+            elapsed[name] = time.perf_counter() - begin
+
+        print(
+            f"{path.name}: {duration:7.1f}s audio, decode rtf {decode / duration:.4f}, "
+            f"total rtf {elapsed['separate'] / duration:.4f} -> {elapsed['handoff'] / duration:.4f}"
+        )
+        total["audio"] += duration
+        total["decode"] += decode
+        total["separate"] += elapsed["separate"]
+        total["handoff"] += elapsed["handoff"]
+
+    audio = max(total["audio"], 1e-6)
+    print(f"{len(files)} files, {total['audio'] / 3600:.2f} h audio")
+    print(f"  decode once:        rtf {total['decode'] / audio:.4f}")
+    print(f"  separate decodes:   rtf {total['separate'] / audio:.4f}")
+    print(f"  vad -> asr handoff: rtf {total['handoff'] / audio:.4f}")
+    print(f"  load time removed:  {total['separate'] - total['handoff']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/alibaba-damo-academy/FunASR). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""Wall time and batch occupancy of inference_with_vad on a list of short inputs, batching the
+vad segments per input or packing them across inputs (pack_inputs=True).
+
+python benchmarks/benchmark_vad_packing.py --input wav.scp --model paraformer-zh --device cuda
+"""
+
+import argparse
+import time
+
+from funasr import AutoModel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="wav.scp or jsonl list of short inputs")
+    parser.add_argument("--model", default="paraformer-zh")
+    parser.add_argument("--vad-model", default="fsmn-vad")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size-s", type=int, default=300)
+    parser.add_argument("--pack-window-s", type=float, default=600)
+    args = parser.parse_args()
+
+    model = AutoModel(
+        model=args.model,
+        vad_model=args.vad_model,
+        device=args.device,
+        disable_pbar=True,
+        disable_update=True,
+    )
+
+    # record the number of segments of every asr forward
+    batches = []
+    inference = model.model.inference
+
+    def counted(data_in=None, **kwargs):
+        batches.append(len(data_in))
+        return inference(data_in=data_in, **kwargs)
+
+    model.model.inference = counted
+
+    for name, pack in (("per input", False), ("packed", True)):
+        batches.clear()
+        begin = time.perf_counter()
+        res = model.generate(
+            input=args.input,
+            batch_size_s=args.batch_size_s,
+            pack_inputs=pack,
+            pack_window_s=args.pack_window_s,
+        )
+        elapsed = time.perf_counter() - begin
+        print(
+            f"{name:>10}: {elapsed:8.1f}s for {len(res)} inputs, {len(batches)} batches, "
+            f"{sum(batches) / max(len(batches), 1):.1f} segments per batch"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,12 @@ from funasr.utils.timestamp_tools import timestamp_sentence_en
 from funasr.download.download_model_from_hub import download_model
 from funasr.utils.vad_utils import slice_padding_audio_samples
 from funasr.utils.vad_utils import merge_vad
+from funasr.utils.vad_utils import cpu_batch_threads
+from funasr.utils.vad_utils import pack_sorted_segments
 from funasr.utils.load_utils import load_audio_text_image_video
+from funasr.utils.load_utils import AudioCache
+from funasr.utils.load_utils import BatchPrefetcher
+from funasr.utils.load_utils import audio_duration
 from funasr.train_utils.set_all_random_seed import set_all_random_seed
 from funasr.train_utils.load_pretrained_model import load_pretrained_model
 from funasr.utils import export_utils
@@ -36,9 +41,15 @@ try:
 except:
     pass
 
+# models whose own inference() takes the precomputed fbank of data_type="fbank"; the subclasses
+# that override inference() (SeacoParaformer, BiCifParaformer, ContextualParaformer,
+# ParaformerStreaming, ...) and the vad models run their frontend again on whatever they get
+FBANK_INPUT_MODELS = {"Paraformer", "EParaformer", "FsmnKWS", "SanmKWS", "FsmnKWSMT"}
 
-def prepare_data_iterator(data_in, input_len=None, data_type=None, key=None):
-    """ """
+
+def prepare_data_iterator(data_in, input_len=None, data_type=None, key=None, source_lens=None):
+    """source_lens: optional list, filled with the source_len (10ms frames) of the jsonl lines,
+    None for the other inputs of a filelist"""
     data_list = []
     key_list = []
     filelist = [".scp", ".txt", ".json", ".jsonl", ".text"]
@@ -61,10 +72,14 @@ def prepare_data_iterator(data_in, input_len=None, data_type=None, key=None):
                         lines = json.loads(line.strip())
                         data = lines["source"]
                         key = lines.get("key", key)
+                        if source_lens is not None:
+                            source_lens.append(lines.get("source_len", None))
                     else:  # filelist, wav.scp, text.txt: id \t data or data
                         lines = line.strip().split(maxsplit=1)
                         data = lines[1] if len(lines) > 1 else lines[0]
                         key = lines[0] if len(lines) > 1 else key
+                        if source_lens is not None:
+                            source_lens.append(None)
 
                     data_list.append(data)
                     key_list.append(key)
@@ -108,6 +123,38 @@ def prepare_data_iterator(data_in, input_len=None, data_type=None, key=None):
     return key_list, data_list
 
 
+def length_sorted_batches(durations, batch_size_ms, batch_size_threshold_ms):
+    """Sort the inputs by duration (ms, None if unknown) and split them into batches of at most
+    batch_size_ms padded ms. Inputs of unknown duration are decoded alone, after the others.
+    Returns (order, [(beg, end), ...]), the ranges index the inputs taken in order."""
+    lengths = [float("inf") if d is None else d for d in durations]
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batch_ranges = pack_sorted_segments(
+        [lengths[i] for i in order], batch_size_ms, batch_size_threshold_ms
+    )
+    return order, batch_ranges
+
+
+def report_progress(progress_callback, done, total):
+    """Call progress_callback(done, total), an error of the callback does not stop the decoding."""
+    if progress_callback:
+        try:
+            progress_callback(done, total)
+        except Exception as e:
+            logging.error(f"progress_callback error: {e}")
+
+
+def padding_ratio(durations, batch_ranges):
+    """Share of the padded batches that is padding, inputs of unknown duration are skipped."""
+    padded, total = 0.0, 0.0
+    for beg, end in batch_ranges:
+        lengths = [d for d in durations[beg:end] if d is not None]
+        if lengths:
+            padded += max(lengths) * len(lengths)
+            total += sum(lengths)
+    return 1.0 - total / padded if padded > 0 else 0.0
+
+
 class AutoModel:
 
     def __init__(self, **kwargs):
@@ -171,6 +218,8 @@ class AutoModel:
         self.spk_model = spk_model
         self.spk_kwargs = spk_kwargs
         self.model_path = kwargs.get("model_path")
+        # decoded audio kept across generate() calls on the same files, in seconds
+        self.audio_cache = AudioCache(kwargs.get("audio_cache_s", 0))
 
     @staticmethod
     def build_model(**kwargs):
@@ -333,59 +382,152 @@ class AutoModel:
         # if kwargs.get("device", "cpu") == "cpu":
         #     batch_size = 1
 
+        source_lens = []
         key_list, data_list = prepare_data_iterator(
-            input, input_len=input_len, data_type=kwargs.get("data_type", None), key=key
+            input,
+            input_len=input_len,
+            data_type=kwargs.get("data_type", None),
+            key=key,
+            source_lens=source_lens,
         )
+        num_samples = len(data_list)
+        batch_ranges = [
+            (beg, min(num_samples, beg + batch_size)) for beg in range(0, num_samples, batch_size)
+        ]
+
+        # sort a list of inputs by duration and batch them under a padded seconds budget, so that
+        # short inputs are not padded to long ones; the results are returned in the input order
+        order = None
+        if (
+            kwargs.get("sort_by_length", False)
+            and model is self.model
+            and self.vad_model is None
+            and num_samples > 1
+            and kwargs.get("data_type", None) in (None, "sound")
+        ):
+            fs = kwargs.get("fs", 16000)
+            durations = []
+            for i, data in enumerate(data_list):
+                if i < len(source_lens) and source_lens[i] is not None:
+                    durations.append(source_lens[i] * 10)
+                else:
+                    duration = audio_duration(data, fs=fs)
+                    durations.append(None if duration is None else duration * 1000)
+            if kwargs.get("device", "cpu") == "cpu":
+                batch_size_s = kwargs.get("cpu_batch_size_s", 60)
+            else:
+                batch_size_s = kwargs.get("batch_size_s", 300)
+            padding_before = padding_ratio(durations, batch_ranges)
+            order, batch_ranges = length_sorted_batches(
+                durations,
+                max(batch_size_s * 1000, 1),
+                kwargs.get("batch_size_threshold_s", 60) * 1000,
+            )
+            durations = [durations[i] for i in order]
+            data_list = [data_list[i] for i in order]
+            key_list = [key_list[i] for i in order]
+            padding_after = padding_ratio(durations, batch_ranges)
+
+        # load the next batches in background, the models that take fbank input get the fbank,
+        # the others the decoded waveforms
+        prefetcher = None
+        frontend = kwargs.get("frontend", None)
+        if (
+            kwargs.get("prefetch_batches", 0) > 0
+            and model is self.model
+            and hasattr(frontend, "fs")
+            and kwargs.get("data_type", None) in (None, "sound")
+        ):
+            fbank_input = type(model).__name__ in FBANK_INPUT_MODELS
+            prefetcher = BatchPrefetcher(
+                data_list,
+                batch_ranges,
+                frontend,
+                audio_fs=kwargs.get("fs", 16000),
+                num_workers=kwargs.get("prefetch_workers", 1),
+                depth=kwargs["prefetch_batches"],
+                extract_feat=fbank_input,
+            )
+            # the waveforms are already at the rate of the frontend
+            prefetch_kwargs = (
+                dict(kwargs, data_type="fbank") if fbank_input else dict(kwargs, fs=frontend.fs)
+            )
 
         speed_stats = {}
+        if order is not None:
+            speed_stats["padding"] = f"{padding_before:0.3f}->{padding_after:0.3f}"
         asr_result_list = []
-        num_samples = len(data_list)
         disable_pbar = self.kwargs.get("disable_pbar", False)
         pbar = (
             tqdm(colour="blue", total=num_samples, dynamic_ncols=True) if not disable_pbar else None
         )
         time_speech_total = 0.0
         time_escape_total = 0.0
-        for beg_idx in range(0, num_samples, batch_size):
-            end_idx = min(num_samples, beg_idx + batch_size)
-            data_batch = data_list[beg_idx:end_idx]
-            key_batch = key_list[beg_idx:end_idx]
-            batch = {"data_in": data_batch, "key": key_batch}
-
-            if (end_idx - beg_idx) == 1 and kwargs.get("data_type", None) == "fbank":  # fbank
-                batch["data_in"] = data_batch[0]
-                batch["data_lengths"] = input_len
-
-            time1 = time.perf_counter()
-            with torch.no_grad():
-                res = model.inference(**batch, **kwargs)
-                if isinstance(res, (list, tuple)):
-                    results = res[0] if len(res) > 0 else [{"text": ""}]
-                    meta_data = res[1] if len(res) > 1 else {}
-            time2 = time.perf_counter()
-
-            asr_result_list.extend(results)
-
-            # batch_data_time = time_per_frame_s * data_batch_i["speech_lengths"].sum().item()
-            batch_data_time = meta_data.get("batch_data_time", -1)
-            time_escape = time2 - time1
-            speed_stats["load_data"] = meta_data.get("load_data", 0.0)
-            speed_stats["extract_feat"] = meta_data.get("extract_feat", 0.0)
-            speed_stats["forward"] = f"{time_escape:0.3f}"
-            speed_stats["batch_size"] = f"{len(results)}"
-            speed_stats["rtf"] = f"{(time_escape) / batch_data_time:0.3f}"
-            description = f"{speed_stats}, "
-            if pbar:
-                pbar.update(end_idx - beg_idx)
-                pbar.set_description(description)
-            if progress_callback:
-                try:
-                    progress_callback(end_idx, num_samples)
-                except Exception as e:
-                    logging.error(f"progress_callback error: {e}")
-            time_speech_total += batch_data_time
-            time_escape_total += time_escape
-
+        try:
+            for beg_idx, end_idx in batch_ranges:
+                data_batch = data_list[beg_idx:end_idx]
+                key_batch = key_list[beg_idx:end_idx]
+                batch = {"data_in": data_batch, "key": key_batch}
+
+                if (end_idx - beg_idx) == 1 and kwargs.get("data_type", None) == "fbank":  # fbank
+                    batch["data_in"] = data_batch[0]
+                    batch["data_lengths"] = input_len
+
+                if prefetcher is not None:
+                    time0 = time.perf_counter()
+                    speech, speech_lengths, prefetch_meta = prefetcher.get()
+                    speed_stats["prefetch_wait"] = f"{time.perf_counter() - time0:0.3f}"
+                    batch["data_in"] = speech
+                    if speech_lengths is not None:
+                        batch["data_lengths"] = speech_lengths
+
+                time1 = time.perf_counter()
+                with torch.no_grad():
+                    if prefetcher is not None:
+                        res = model.inference(**batch, **prefetch_kwargs)
+                    else:
+                        res = model.inference(**batch, **kwargs)
+                    if isinstance(res, (list, tuple)):
+                        results = res[0] if len(res) > 0 else [{"text": ""}]
+                        meta_data = res[1] if len(res) > 1 else {}
+                time2 = time.perf_counter()
+                if prefetcher is not None:
+                    # the model only reads the prefetched waveforms
+                    meta_data = {**prefetch_meta, **meta_data, "load_data": prefetch_meta["load_data"]}
+
+                asr_result_list.extend(results)
+
+                # batch_data_time = time_per_frame_s * data_batch_i["speech_lengths"].sum().item()
+                batch_data_time = meta_data.get("batch_data_time", -1)
+                time_escape = time2 - time1
+                speed_stats["load_data"] = meta_data.get("load_data", 0.0)
+                speed_stats["extract_feat"] = meta_data.get("extract_feat", 0.0)
+                speed_stats["forward"] = f"{time_escape:0.3f}"
+                speed_stats["batch_size"] = f"{len(results)}"
+                speed_stats["rtf"] = f"{(time_escape) / batch_data_time:0.3f}"
+                description = f"{speed_stats}, "
+                if pbar:
+                    pbar.update(end_idx - beg_idx)
+                    pbar.set_description(description)
+                report_progress(progress_callback, end_idx, num_samples)
+                time_speech_total += batch_data_time
+                time_escape_total += time_escape
+        finally:
+            # stop decoding the next batches if the model or a prefetched batch raised
+            if prefetcher is not None:
+                prefetcher.close()
+
+        if order is not None:
+            if len(asr_result_list) == num_samples:
+                restored = [None] * num_samples
+                for i, result in zip(order, asr_result_list):
+                    restored[i] = result
+                asr_result_list = restored
+            else:
+                logging.warning(
+                    f"sort_by_length: {len(asr_result_list)} results for {num_samples} inputs, "
+                    f"the results are left in the duration order"
+                )
         if pbar:
             # pbar.update(1)
             pbar.set_description(f"rtf_avg: {time_escape_total/time_speech_total:0.3f}")
@@ -396,29 +538,17 @@ class AutoModel:
                 torch.cuda.empty_cache()
         return asr_result_list
 
-    def inference_with_vad(self, input, input_len=None, **cfg):
+    def inference_with_vad(self, input, input_len=None, progress_callback=None, **cfg):
+        """progress_callback(done, total) is called with the number of inputs decoded."""
         kwargs = self.kwargs
-        # step.1: compute the vad model
         deep_update(self.vad_kwargs, cfg)
-        beg_vad = time.time()
-        res = self.inference(
-            input, input_len=input_len, model=self.vad_model, kwargs=self.vad_kwargs, **cfg
-        )
-        end_vad = time.time()
-
-        #  FIX(gcf): concat the vad clips for sense vocie model for better aed
-        if cfg.get("merge_vad", False):
-            for i in range(len(res)):
-                res[i]["value"] = merge_vad(
-                    res[i]["value"], kwargs.get("merge_length_s", 15) * 1000
-                )
-
-        # step.2 compute asr model
         model = self.model
         deep_update(kwargs, cfg)
         batch_size = max(int(kwargs.get("batch_size_s", 300)) * 1000, 1)
         batch_size_threshold_ms = int(kwargs.get("batch_size_threshold_s", 60)) * 1000
         kwargs["batch_size"] = batch_size
+        on_cpu = kwargs["device"] == "cpu"
+        num_threads = torch.get_num_threads()
 
         key_list, data_list = prepare_data_iterator(
             input, input_len=input_len, data_type=kwargs.get("data_type", None)
@@ -428,237 +558,412 @@ class AutoModel:
 
         beg_total = time.time()
         pbar_total = (
-            tqdm(colour="red", total=len(res), dynamic_ncols=True)
+            tqdm(colour="red", total=len(data_list), dynamic_ncols=True)
             if not kwargs.get("disable_pbar", False)
             else None
         )
-        for i in range(len(res)):
-            key = res[i]["key"]
-            vadsegments = res[i]["value"]
-            input_i = data_list[i]
-            fs = kwargs["frontend"].fs if hasattr(kwargs["frontend"], "fs") else 16000
-            speech = load_audio_text_image_video(input_i, fs=fs, audio_fs=kwargs.get("fs", 16000))
-            speech_lengths = len(speech)
-            n = len(vadsegments)
-            data_with_index = [(vadsegments[i], i) for i in range(n)]
-            sorted_data = sorted(data_with_index, key=lambda x: x[0][1] - x[0][0])
-            results_sorted = []
-
-            if not len(sorted_data):
-                results_ret_list.append({"key": key, "text": "", "timestamp": []})
-                logging.info("decoding, utt: {}, empty speech".format(key))
-                continue
-
-            if len(sorted_data) > 0 and len(sorted_data[0]) > 0:
-                batch_size = max(batch_size, sorted_data[0][0][1] - sorted_data[0][0][0])
-
-            if kwargs["device"] == "cpu":
-                batch_size = 0
-
-            beg_idx = 0
-            beg_asr_total = time.time()
-            time_speech_total_per_sample = speech_lengths / 16000
-            time_speech_total_all_samples += time_speech_total_per_sample
-
-            # pbar_sample = tqdm(colour="blue", total=n, dynamic_ncols=True)
-
-            all_segments = []
-            max_len_in_batch = 0
-            end_idx = 1
-            for j, _ in enumerate(range(0, n)):
-                # pbar_sample.update(1)
-                sample_length = sorted_data[j][0][1] - sorted_data[j][0][0]
-                potential_batch_length = max(max_len_in_batch, sample_length) * (j + 1 - beg_idx)
-                # batch_size_ms_cum += sorted_data[j][0][1] - sorted_data[j][0][0]
-                if (
-                    j < n - 1
-                    and sample_length < batch_size_threshold_ms
-                    and potential_batch_length < batch_size
-                ):
-                    max_len_in_batch = max(max_len_in_batch, sample_length)
+        try:
+            if kwargs.get("pack_inputs", False) and self.spk_model is None:
+                return self._inference_with_vad_packed(
+                    key_list,
+                    data_list,
+                    batch_size_threshold_ms,
+                    pbar_total,
+                    progress_callback,
+                    kwargs,
+                    cfg,
+                    input_len=input_len,
+                )
+
+            for i in range(len(data_list)):
+                # step.1: compute the vad model
+                key, vadsegments, speech = self._vad_segments(
+                    data_list[i], key_list[i], kwargs, cfg, input_len=input_len
+                )
+                speech_lengths = len(speech)
+
+                # step.2 compute asr model
+                n = len(vadsegments)
+                data_with_index = [(vadsegments[i], i) for i in range(n)]
+                sorted_data = sorted(data_with_index, key=lambda x: x[0][1] - x[0][0])
+                results_sorted = []
+
+                if not len(sorted_data):
+                    results_ret_list.append({"key": key, "text": "", "timestamp": []})
+                    logging.info("decoding, utt: {}, empty speech".format(key))
+                    report_progress(progress_callback, i + 1, len(data_list))
+                    continue
+
+                if len(sorted_data) > 0 and len(sorted_data[0]) > 0:
+                    batch_size = max(batch_size, sorted_data[0][0][1] - sorted_data[0][0][0])
+
+                if on_cpu:
+                    # padded audio per batch on cpu, 0 to decode the segments one by one
+                    batch_size = int(kwargs.get("cpu_batch_size_s", 60) * 1000)
+
+                beg_idx = 0
+                beg_asr_total = time.time()
+                time_speech_total_per_sample = speech_lengths / 16000
+                time_speech_total_all_samples += time_speech_total_per_sample
+
+                # pbar_sample = tqdm(colour="blue", total=n, dynamic_ncols=True)
+
+                all_segments = []
+                max_len_in_batch = 0
+                end_idx = 1
+                for j, _ in enumerate(range(0, n)):
+                    # pbar_sample.update(1)
+                    sample_length = sorted_data[j][0][1] - sorted_data[j][0][0]
+                    potential_batch_length = max(max_len_in_batch, sample_length) * (
+                        j + 1 - beg_idx
+                    )
+                    # batch_size_ms_cum += sorted_data[j][0][1] - sorted_data[j][0][0]
+                    if (
+                        j < n - 1
+                        and sample_length < batch_size_threshold_ms
+                        and potential_batch_length < batch_size
+                    ):
+                        max_len_in_batch = max(max_len_in_batch, sample_length)
+                        end_idx += 1
+                        continue
+
+                    speech_j, speech_lengths_j = slice_padding_audio_samples(
+                        speech, speech_lengths, sorted_data[beg_idx:end_idx]
+                    )
+                    if on_cpu:
+                        padded_ms = max(max_len_in_batch, sample_length) * (end_idx - beg_idx)
+                        torch.set_num_threads(
+                            cpu_batch_threads(
+                                padded_ms, num_threads, kwargs.get("cpu_ms_per_thread", 2000)
+                            )
+                        )
+                    results = self.inference(
+                        speech_j, input_len=None, model=model, kwargs=kwargs, **cfg
+                    )
+                    if self.spk_model is not None:
+                        # compose vad segments: [[start_time_sec, end_time_sec, speech], [...]]
+                        for _b in range(len(speech_j)):
+                            vad_segments = [
+                                [
+                                    sorted_data[beg_idx:end_idx][_b][0][0] / 1000.0,
+                                    sorted_data[beg_idx:end_idx][_b][0][1] / 1000.0,
+                                    np.array(speech_j[_b]),
+                                ]
+                            ]
+                            segments = sv_chunk(vad_segments)
+                            all_segments.extend(segments)
+                            speech_b = [i[2] for i in segments]
+                            spk_res = self.inference(
+                                speech_b, input_len=None, model=self.spk_model, kwargs=kwargs, **cfg
+                            )
+                            results[_b]["spk_embedding"] = spk_res[0]["spk_embedding"]
+                    beg_idx = end_idx
                     end_idx += 1
+                    max_len_in_batch = sample_length
+                    if len(results) < 1:
+                        continue
+                    results_sorted.extend(results)
+
+                # end_asr_total = time.time()
+                # time_escape_total_per_sample = end_asr_total - beg_asr_total
+                # pbar_sample.update(1)
+                # pbar_sample.set_description(f"rtf_avg_per_sample: {time_escape_total_per_sample / time_speech_total_per_sample:0.3f}, "
+                #                      f"time_speech_total_per_sample: {time_speech_total_per_sample: 0.3f}, "
+                #                      f"time_escape_total_per_sample: {time_escape_total_per_sample:0.3f}")
+
+                if len(results_sorted) != n:
+                    results_ret_list.append({"key": key, "text": "", "timestamp": []})
+                    logging.info("decoding, utt: {}, empty result".format(key))
+                    report_progress(progress_callback, i + 1, len(data_list))
+                    continue
+                restored_data = [0] * n
+                for j in range(n):
+                    index = sorted_data[j][1]
+                    restored_data[index] = results_sorted[j]
+                result = self._combine_vad_results(
+                    key, vadsegments, restored_data, all_segments, kwargs, cfg
+                )
+                report_progress(progress_callback, i + 1, len(data_list))
+                if result is None:
                     continue
+                results_ret_list.append(result)
+                end_asr_total = time.time()
+                time_escape_total_per_sample = end_asr_total - beg_asr_total
+                if pbar_total:
+                    pbar_total.update(1)
+                    pbar_total.set_description(
+                        f"rtf_avg: "
+                        f"{time_escape_total_per_sample / time_speech_total_per_sample:0.3f}, "
+                        f"time_speech: {time_speech_total_per_sample: 0.3f}, "
+                        f"time_escape: {time_escape_total_per_sample:0.3f}"
+                    )
+        finally:
+            if on_cpu:
+                # set_num_threads is process wide, restore it even if a batch raised
+                torch.set_num_threads(num_threads)
 
-                speech_j, speech_lengths_j = slice_padding_audio_samples(
-                    speech, speech_lengths, sorted_data[beg_idx:end_idx]
+        # end_total = time.time()
+        # time_escape_total_all_samples = end_total - beg_total
+        # print(f"rtf_avg_all: {time_escape_total_all_samples / time_speech_total_all_samples:0.3f}, "
+        #                      f"time_speech_all: {time_speech_total_all_samples: 0.3f}, "
+        #                      f"time_escape_all: {time_escape_total_all_samples:0.3f}")
+        return results_ret_list
+
+    def _vad_segments(self, input_i, key, kwargs, cfg, input_len=None):
+        """Decode one input and run the vad model on it, input_len is passed to the vad model.
+        Returns (key, vad segments in ms, waveform)."""
+        fs = kwargs["frontend"].fs if hasattr(kwargs["frontend"], "fs") else 16000
+        # decode each input once, the vad model gets the waveform of the asr model
+        speech = self.audio_cache.load(input_i, fs=fs, audio_fs=kwargs.get("fs", 16000))
+        vad_frontend = self.vad_kwargs.get("frontend")
+        vad_fs = vad_frontend.fs if hasattr(vad_frontend, "fs") else 16000
+        vad_input, vad_kwargs, vad_cfg = input_i, self.vad_kwargs, cfg
+        if kwargs.get("vad_audio_handoff", True) and vad_fs == fs:
+            # the waveform is already at fs, the vad model must not resample it from the input fs
+            vad_input, vad_kwargs, vad_cfg = speech, dict(self.vad_kwargs, fs=fs), dict(cfg, fs=fs)
+            if kwargs.get("fs", 16000) != fs:
+                # the length of the input does not hold for the resampled waveform
+                input_len = None
+        res = self.inference(
+            vad_input,
+            input_len=input_len,
+            model=self.vad_model,
+            kwargs=vad_kwargs,
+            key=key,
+            **vad_cfg,
+        )
+        vadsegments = res[0]["value"]
+        #  FIX(gcf): concat the vad clips for sense vocie model for better aed
+        if cfg.get("merge_vad", False):
+            vadsegments = merge_vad(vadsegments, kwargs.get("merge_length_s", 15) * 1000)
+        return res[0]["key"], vadsegments, speech
+
+    def _inference_with_vad_packed(
+        self,
+        key_list,
+        data_list,
+        batch_size_threshold_ms,
+        pbar_total,
+        progress_callback,
+        kwargs,
+        cfg,
+        input_len=None,
+    ):
+        """inference_with_vad for many short inputs: the vad segments of a window of inputs
+        are sorted by length together and packed into full batches, then the results are
+        reassembled per input in the input order."""
+        on_cpu = kwargs["device"] == "cpu"
+        if on_cpu:
+            batch_size = int(kwargs.get("cpu_batch_size_s", 60) * 1000)
+        else:
+            batch_size = max(int(kwargs.get("batch_size_s", 300)) * 1000, 1)
+        num_threads = torch.get_num_threads()
+        fs = kwargs["frontend"].fs if hasattr(kwargs["frontend"], "fs") else 16000
+        # decoded audio held at once, in ms
+        window_ms = kwargs.get("pack_window_s", 600) * 1000
+        results_ret_list = []
+        beg = 0
+        done = 0
+        while beg < len(data_list):
+            # step.1: compute the vad model on the inputs of the window
+            inputs = []  # [key, vadsegments, results]
+            segments = []  # (length in ms, input index, segment index, samples)
+            held_ms = 0
+            beg_window = time.time()
+            while beg < len(data_list) and held_ms < window_ms:
+                key, vadsegments, speech = self._vad_segments(
+                    data_list[beg], key_list[beg], kwargs, cfg, input_len=input_len
+                )
+                speech_j, _ = slice_padding_audio_samples(
+                    speech, len(speech), [(seg, k) for k, seg in enumerate(vadsegments)]
                 )
+                for k, seg in enumerate(vadsegments):
+                    segments.append((seg[1] - seg[0], len(inputs), k, speech_j[k]))
+                inputs.append([key, vadsegments, [None] * len(vadsegments)])
+                held_ms += len(speech) * 1000 / fs
+                beg += 1
+
+            # step.2: compute the asr model on the segments of all the inputs
+            segments.sort(key=lambda x: x[0])
+            lengths = [s[0] for s in segments]
+            for beg_idx, end_idx in pack_sorted_segments(lengths, batch_size, batch_size_threshold_ms):
+                batch = segments[beg_idx:end_idx]
+                if on_cpu:
+                    padded_ms = batch[-1][0] * len(batch)
+                    torch.set_num_threads(
+                        cpu_batch_threads(
+                            padded_ms, num_threads, kwargs.get("cpu_ms_per_thread", 2000)
+                        )
+                    )
                 results = self.inference(
-                    speech_j, input_len=None, model=model, kwargs=kwargs, **cfg
+                    [s[3] for s in batch], input_len=None, model=self.model, kwargs=kwargs, **cfg
                 )
-                if self.spk_model is not None:
-                    # compose vad segments: [[start_time_sec, end_time_sec, speech], [...]]
-                    for _b in range(len(speech_j)):
-                        vad_segments = [
-                            [
-                                sorted_data[beg_idx:end_idx][_b][0][0] / 1000.0,
-                                sorted_data[beg_idx:end_idx][_b][0][1] / 1000.0,
-                                np.array(speech_j[_b]),
-                            ]
-                        ]
-                        segments = sv_chunk(vad_segments)
-                        all_segments.extend(segments)
-                        speech_b = [i[2] for i in segments]
-                        spk_res = self.inference(
-                            speech_b, input_len=None, model=self.spk_model, kwargs=kwargs, **cfg
+                if len(results) != len(batch):
+                    # the results can not be matched to the segments, decode them one by one
+                    logging.warning(
+                        f"{len(results)} results for a batch of {len(batch)} segments, "
+                        f"decoding the segments one by one"
+                    )
+                    results = []
+                    for s in batch:
+                        res = self.inference(
+                            [s[3]], input_len=None, model=self.model, kwargs=kwargs, **cfg
                         )
-                        results[_b]["spk_embedding"] = spk_res[0]["spk_embedding"]
-                beg_idx = end_idx
-                end_idx += 1
-                max_len_in_batch = sample_length
-                if len(results) < 1:
+                        results.append(res[0] if len(res) == 1 else None)
+                for s, res in zip(batch, results):
+                    inputs[s[1]][2][s[2]] = res
+
+            # step.3: combine the results of every input
+            for key, vadsegments, restored_data in inputs:
+                done += 1
+                report_progress(progress_callback, done, len(data_list))
+                if pbar_total:
+                    pbar_total.update(1)
+                if not vadsegments:
+                    results_ret_list.append({"key": key, "text": "", "timestamp": []})
+                    logging.info("decoding, utt: {}, empty speech".format(key))
                     continue
-                results_sorted.extend(results)
-
-            # end_asr_total = time.time()
-            # time_escape_total_per_sample = end_asr_total - beg_asr_total
-            # pbar_sample.update(1)
-            # pbar_sample.set_description(f"rtf_avg_per_sample: {time_escape_total_per_sample / time_speech_total_per_sample:0.3f}, "
-            #                      f"time_speech_total_per_sample: {time_speech_total_per_sample: 0.3f}, "
-            #                      f"time_escape_total_per_sample: {time_escape_total_per_sample:0.3f}")
-
-            if len(results_sorted) != n:
-                results_ret_list.append({"key": key, "text": "", "timestamp": []})
-                logging.info("decoding, utt: {}, empty result".format(key))
-                continue
-            restored_data = [0] * n
-            for j in range(n):
-                index = sorted_data[j][1]
-                restored_data[index] = results_sorted[j]
-            result = {}
-
-            # results combine for texts, timestamps, speaker embeddings and others
-            # TODO: rewrite for clean code
-            for j in range(n):
-                for k, v in restored_data[j].items():
-                    if k.startswith("timestamp"):
-                        if k not in result:
-                            result[k] = []
-                        for t in restored_data[j][k]:
-                            t[0] += vadsegments[j][0]
-                            t[1] += vadsegments[j][0]
-                        result[k].extend(restored_data[j][k])
-                    elif k == "spk_embedding":
-                        if k not in result:
-                            result[k] = restored_data[j][k]
-                        else:
-                            result[k] = torch.cat([result[k], restored_data[j][k]], dim=0)
-                    elif "text" in k:
-                        if k not in result:
-                            result[k] = restored_data[j][k]
-                        else:
-                            result[k] += " " + restored_data[j][k]
-                    else:
-                        if k not in result:
-                            result[k] = restored_data[j][k]
-                        else:
-                            result[k] += restored_data[j][k]
-
-            if not len(result["text"].strip()):
-                continue
-            return_raw_text = kwargs.get("return_raw_text", False)
-            # step.3 compute punc model
-            raw_text = None
-            if self.punc_model is not None:
-                deep_update(self.punc_kwargs, cfg)
-                punc_res = self.inference(
-                    result["text"], model=self.punc_model, kwargs=self.punc_kwargs, **cfg
-                )
-                raw_text = copy.copy(result["text"])
-                if return_raw_text:
-                    result["raw_text"] = raw_text
-                result["text"] = punc_res[0]["text"]
-
-            # speaker embedding cluster after resorted
-            if self.spk_model is not None and kwargs.get("return_spk_res", True):
-                if raw_text is None:
-                    logging.error("Missing punc_model, which is required by spk_model.")
-                all_segments = sorted(all_segments, key=lambda x: x[0])
-                spk_embedding = result["spk_embedding"]
-                labels = self.cb_model(
-                    spk_embedding.cpu(), oracle_num=kwargs.get("preset_spk_num", None)
+                if any(res is None for res in restored_data):
+                    results_ret_list.append({"key": key, "text": "", "timestamp": []})
+                    logging.info("decoding, utt: {}, empty result".format(key))
+                    continue
+                result = self._combine_vad_results(key, vadsegments, restored_data, [], kwargs, cfg)
+                if result is not None:
+                    results_ret_list.append(result)
+            if pbar_total:
+                # the inputs of a window are decoded together, the rtf is per window
+                time_speech = held_ms / 1000
+                time_escape = time.time() - beg_window
+                pbar_total.set_description(
+                    f"rtf_avg: {time_escape / max(time_speech, 1e-6):0.3f}, "
+                    f"time_speech: {time_speech: 0.3f}, "
+                    f"time_escape: {time_escape:0.3f}"
                 )
-                # del result['spk_embedding']
-                sv_output = postprocess(all_segments, None, labels, spk_embedding.cpu())
-                if self.spk_mode == "vad_segment":  # recover sentence_list
-                    sentence_list = []
-                    for rest, vadsegment in zip(restored_data, vadsegments):
-                        if "timestamp" not in rest:
-                            logging.error(
-                                "Only 'iic/speech_paraformer-large-vad-punc_asr_nat-zh-cn-16k-common-vocab8404-pytorch' \
+        return results_ret_list
+
+    def _combine_vad_results(self, key, vadsegments, restored_data, all_segments, kwargs, cfg):
+        """Combine the results of the vad segments of one input, in time order, then run the
+        punc and spk models. Returns None when the input has no text."""
+        n = len(vadsegments)
+        result = {}
+
+        # results combine for texts, timestamps, speaker embeddings and others
+        # TODO: rewrite for clean code
+        for j in range(n):
+            for k, v in restored_data[j].items():
+                if k.startswith("timestamp"):
+                    if k not in result:
+                        result[k] = []
+                    for t in restored_data[j][k]:
+                        t[0] += vadsegments[j][0]
+                        t[1] += vadsegments[j][0]
+                    result[k].extend(restored_data[j][k])
+                elif k == "spk_embedding":
+                    if k not in result:
+                        result[k] = restored_data[j][k]
+                    else:
+                        result[k] = torch.cat([result[k], restored_data[j][k]], dim=0)
+                elif "text" in k:
+                    if k not in result:
+                        result[k] = restored_data[j][k]
+                    else:
+                        result[k] += " " + restored_data[j][k]
+                else:
+                    if k not in result:
+                        result[k] = restored_data[j][k]
+                    else:
+                        result[k] += restored_data[j][k]
+
+        if not len(result["text"].strip()):
+            return None
+        return_raw_text = kwargs.get("return_raw_text", False)
+        # step.3 compute punc model
+        raw_text = None
+        if self.punc_model is not None:
+            deep_update(self.punc_kwargs, cfg)
+            punc_res = self.inference(
+                result["text"], model=self.punc_model, kwargs=self.punc_kwargs, **cfg
+            )
+            raw_text = copy.copy(result["text"])
+            if return_raw_text:
+                result["raw_text"] = raw_text
+            result["text"] = punc_res[0]["text"]
+
+        # speaker embedding cluster after resorted
+        if self.spk_model is not None and kwargs.get("return_spk_res", True):
+            if raw_text is None:
+                logging.error("Missing punc_model, which is required by spk_model.")
+            all_segments = sorted(all_segments, key=lambda x: x[0])
+            spk_embedding = result["spk_embedding"]
+            labels = self.cb_model(
+                spk_embedding.cpu(), oracle_num=kwargs.get("preset_spk_num", None)
+            )
+            # del result['spk_embedding']
+            sv_output = postprocess(all_segments, None, labels, spk_embedding.cpu())
+            if self.spk_mode == "vad_segment":  # recover sentence_list
+                sentence_list = []
+                for rest, vadsegment in zip(restored_data, vadsegments):
+                    if "timestamp" not in rest:
+                        logging.error(
+                            "Only 'iic/speech_paraformer-large-vad-punc_asr_nat-zh-cn-16k-common-vocab8404-pytorch' \
                                            and 'iic/speech_seaco_paraformer_large_asr_nat-zh-cn-16k-common-vocab8404-pytorch'\
                                            can predict timestamp, and speaker diarization relies on timestamps."
-                            )
-                        sentence_list.append(
-                            {
-                                "start": vadsegment[0],
-                                "end": vadsegment[1],
-                                "sentence": rest["text"],
-                                "timestamp": rest["timestamp"],
-                            }
                         )
-                elif self.spk_mode == "punc_segment":
-                    if "timestamp" not in result:
-                        logging.error(
-                            "Only 'iic/speech_paraformer-large-vad-punc_asr_nat-zh-cn-16k-common-vocab8404-pytorch' \
+                    sentence_list.append(
+                        {
+                            "start": vadsegment[0],
+                            "end": vadsegment[1],
+                            "sentence": rest["text"],
+                            "timestamp": rest["timestamp"],
+                        }
+                    )
+            elif self.spk_mode == "punc_segment":
+                if "timestamp" not in result:
+                    logging.error(
+                        "Only 'iic/speech_paraformer-large-vad-punc_asr_nat-zh-cn-16k-common-vocab8404-pytorch' \
                                        and 'iic/speech_seaco_paraformer_large_asr_nat-zh-cn-16k-common-vocab8404-pytorch'\
                                        can predict timestamp, and speaker diarization relies on timestamps."
-                        )
-                    if kwargs.get("en_post_proc", False):
-                        sentence_list = timestamp_sentence_en(
-                            punc_res[0]["punc_array"],
-                            result["timestamp"],
-                            raw_text,
-                            return_raw_text=return_raw_text,
-                        )
-                    else:
-                        sentence_list = timestamp_sentence(
-                            punc_res[0]["punc_array"],
-                            result["timestamp"],
-                            raw_text,
-                            return_raw_text=return_raw_text,
-                        )
-                distribute_spk(sentence_list, sv_output)
-                result["sentence_info"] = sentence_list
-            elif kwargs.get("sentence_timestamp", False):
-                if not len(result["text"].strip()):
-                    sentence_list = []
+                    )
+                if kwargs.get("en_post_proc", False):
+                    sentence_list = timestamp_sentence_en(
+                        punc_res[0]["punc_array"],
+                        result["timestamp"],
+                        raw_text,
+                        return_raw_text=return_raw_text,
+                    )
                 else:
-                    if kwargs.get("en_post_proc", False):
-                        sentence_list = timestamp_sentence_en(
-                            punc_res[0]["punc_array"],
-                            result["timestamp"],
-                            raw_text,
-                            return_raw_text=return_raw_text,
-                        )
-                    else:
-                        sentence_list = timestamp_sentence(
-                            punc_res[0]["punc_array"],
-                            result["timestamp"],
-                            raw_text,
-                            return_raw_text=return_raw_text,
-                        )
-                result["sentence_info"] = sentence_list
-            if "spk_embedding" in result:
-                del result["spk_embedding"]
-
-            result["key"] = key
-            results_ret_list.append(result)
-            end_asr_total = time.time()
-            time_escape_total_per_sample = end_asr_total - beg_asr_total
-            if pbar_total:
-                pbar_total.update(1)
-                pbar_total.set_description(
-                    f"rtf_avg: {time_escape_total_per_sample / time_speech_total_per_sample:0.3f}, "
-                    f"time_speech: {time_speech_total_per_sample: 0.3f}, "
-                    f"time_escape: {time_escape_total_per_sample:0.3f}"
-                )
-
-        # end_total = time.time()
-        # time_escape_total_all_samples = end_total - beg_total
-        # print(f"rtf_avg_all: {time_escape_total_all_samples / time_speech_total_all_samples:0.3f}, "
-        #                      f"time_speech_all: {time_speech_total_all_samples: 0.3f}, "
-        #                      f"time_escape_all: {time_escape_total_all_samples:0.3f}")
-        return results_ret_list
+                    sentence_list = timestamp_sentence(
+                        punc_res[0]["punc_array"],
+                        result["timestamp"],
+                        raw_text,
+                        return_raw_text=return_raw_text,
+                    )
+            distribute_spk(sentence_list, sv_output)
+            result["sentence_info"] = sentence_list
+        elif kwargs.get("sentence_timestamp", False):
+            if not len(result["text"].strip()):
+                sentence_list = []
+            else:
+                if kwargs.get("en_post_proc", False):
+                    sentence_list = timestamp_sentence_en(
+                        punc_res[0]["punc_array"],
+                        result["timestamp"],
+                        raw_text,
+                        return_raw_text=return_raw_text,
+                    )
+                else:
+                    sentence_list = timestamp_sentence(
+                        punc_res[0]["punc_array"],
+                        result["timestamp"],
+                        raw_text,
+                        return_raw_text=return_raw_text,
+                    )
+            result["sentence_info"] = sentence_list
+        if "spk_embedding" in result:
+            del result["spk_embedding"]
+
+        result["key"] = key
+        return result
 
     def export(self, input=None, **cfg):
         """
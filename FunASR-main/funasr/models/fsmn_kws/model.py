@@ -192,7 +192,7 @@ class FsmnKWS(torch.nn.Module):
             if len(speech.shape) < 3:
                 speech = speech[None, :, :]
             if speech_lengths is not None:
-                speech_lengths = speech_lengths.squeeze(-1)
+                speech_lengths = speech_lengths.reshape(-1)
             else:
                 speech_lengths = speech.shape[1]
         else:
@@ -225,11 +225,11 @@ class FsmnKWS(torch.nn.Module):
             is_deted, det_keyword, det_score = detect_result[0], detect_result[1], detect_result[2]
 
             if is_deted:
-                self.writer["detect"][key[i]] = "detected " + det_keyword + " " + str(det_score)
                 det_info = "detected " + det_keyword + " " + str(det_score)
             else:
-                self.writer["detect"][key[i]] = "rejected"
                 det_info = "rejected"
+            if kwargs.get("output_dir") is not None:
+                self.writer["detect"][key[i]] = det_info
 
             result_i = {"key": key[i], "text": det_info}
             results.append(result_i)
@@ -230,7 +230,7 @@ class FsmnKWSMT(torch.nn.Module):
             if len(speech.shape) < 3:
                 speech = speech[None, :, :]
             if speech_lengths is not None:
-                speech_lengths = speech_lengths.squeeze(-1)
+                speech_lengths = speech_lengths.reshape(-1)
             else:
                 speech_lengths = speech.shape[1]
         else:
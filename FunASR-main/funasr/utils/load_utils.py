@@ -9,6 +9,8 @@ import librosa
 import torchaudio
 import time
 import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from torch.nn.utils.rnn import pad_sequence
 
 try:
@@ -144,6 +146,45 @@ def load_audio_text_image_video(
     return data_or_path_or_list
 
 
+class AudioCache:
+    """Decoded waveforms of audio files, keyed by path and bounded by their total duration.
+
+    The least recently used waveforms are dropped first. With max_seconds <= 0 nothing is
+    kept and load() is the same as load_audio_text_image_video().
+    """
+
+    def __init__(self, max_seconds: float = 0, fs: int = 16000):
+        self.max_samples = int(max_seconds * fs)
+        self.num_samples = 0
+        self.items = OrderedDict()
+
+    def load(self, data_or_path, fs: int = 16000, audio_fs: int = 16000, **kwargs):
+        if self.max_samples <= 0 or not (
+            isinstance(data_or_path, str) and os.path.exists(data_or_path)
+        ):
+            return load_audio_text_image_video(data_or_path, fs=fs, audio_fs=audio_fs, **kwargs)
+
+        # a rewritten file is decoded again
+        stat = os.stat(data_or_path)
+        key = (os.path.abspath(data_or_path), stat.st_mtime_ns, stat.st_size, fs)
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key]
+
+        speech = load_audio_text_image_video(data_or_path, fs=fs, audio_fs=audio_fs, **kwargs)
+        if len(speech) <= self.max_samples:
+            self.items[key] = speech
+            self.num_samples += len(speech)
+            while self.num_samples > self.max_samples:
+                _, dropped = self.items.popitem(last=False)
+                self.num_samples -= len(dropped)
+        return speech
+
+    def clear(self):
+        self.items.clear()
+        self.num_samples = 0
+
+
 def load_bytes(input):
     try:
         input = validate_frame_rate(input)
@@ -221,6 +262,94 @@ def extract_fbank(data, data_len=None, data_type: str = "sound", frontend=None,
     return data.to(torch.float32), data_len.to(torch.int32)
 
 
+def audio_duration(data, fs=16000):
+    """Duration in seconds of an input without decoding it, None if it is not cheap to know.
+
+    Audio files are measured from their header, waveforms from their number of samples at ``fs``.
+    """
+    if isinstance(data, str):
+        if not os.path.isfile(data):
+            return None
+        try:
+            import soundfile
+
+            return soundfile.info(data).duration
+        except Exception:
+            return None
+    if isinstance(data, (np.ndarray, torch.Tensor)) and data.ndim == 1:
+        return data.shape[0] / fs
+    return None
+
+
+class BatchPrefetcher:
+    """Load and extract the fbank of the batches of a data list ahead of the model, in a worker pool.
+
+    ``batch_ranges`` are the (beg, end) slices of the data list run by the model. At most
+    ``depth`` batches are in flight and get() returns them in the order of the ranges, so
+    batch k + 1 is decoded and featurized while batch k runs through the model. With
+    ``extract_feat=False`` only the audio is decoded and resampled to ``frontend.fs``, and
+    get() returns the list of waveforms with None lengths.
+    """
+
+    def __init__(
+        self,
+        data_list,
+        batch_ranges,
+        frontend,
+        audio_fs=16000,
+        num_workers=1,
+        depth=2,
+        extract_feat=True,
+    ):
+        self.data_list = data_list
+        self.frontend = frontend
+        self.audio_fs = audio_fs
+        self.extract_feat = extract_feat
+        self.depth = max(depth, 1)
+        self.ranges = deque(batch_ranges)
+        self.pending = deque()
+        self.executor = ThreadPoolExecutor(max_workers=max(num_workers, 1))
+        self._fill()
+
+    def _fill(self):
+        while self.ranges and len(self.pending) < self.depth:
+            self.pending.append(self.executor.submit(self._load, *self.ranges.popleft()))
+
+    def _load(self, beg, end):
+        time1 = time.perf_counter()
+        audio_sample_list = load_audio_text_image_video(
+            self.data_list[beg:end], fs=self.frontend.fs, audio_fs=self.audio_fs
+        )
+        time2 = time.perf_counter()
+        if not self.extract_feat:
+            return audio_sample_list, None, {"load_data": f"{time2 - time1:0.3f}"}
+        speech, speech_lengths = extract_fbank(audio_sample_list, frontend=self.frontend)
+        time3 = time.perf_counter()
+        meta_data = {
+            "load_data": f"{time2 - time1:0.3f}",
+            "extract_feat": f"{time3 - time2:0.3f}",
+            "batch_data_time": speech_lengths.sum().item()
+            * getattr(self.frontend, "frame_shift", 10)
+            * getattr(self.frontend, "lfr_n", 1)
+            / 1000,
+        }
+        return speech, speech_lengths, meta_data
+
+    def get(self):
+        """Returns (speech, speech_lengths, meta_data) of the next batch, speech_lengths is None
+        for waveforms."""
+        future = self.pending.popleft()
+        # keep the workers busy while the caller waits
+        self._fill()
+        return future.result()
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
+
+
 def _load_audio_ffmpeg(file: str, sr: int = 16000):
     """
     Open an audio file and read as mono waveform, resampling as necessary
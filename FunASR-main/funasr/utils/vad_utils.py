@@ -32,6 +32,29 @@ def slice_padding_audio_samples(speech, speech_lengths, vad_segments):
     return speech_list, speech_lengths_list
 
 
+def cpu_batch_threads(padded_ms, max_threads, ms_per_thread=2000):
+    """Intra-op threads for a batch on cpu, small batches do not pay for the fan-out of many threads."""
+    return max(1, min(max_threads, int(padded_ms // max(ms_per_thread, 1)) + 1))
+
+
+def pack_sorted_segments(lengths, batch_size, batch_size_threshold):
+    """Split segments sorted by length into batches of at most batch_size padded ms, a segment
+    of batch_size_threshold ms or more is decoded alone. Returns [(beg, end), ...]."""
+    batches = []
+    beg = 0
+    for j, length in enumerate(lengths):
+        if j > beg and (
+            length >= batch_size_threshold
+            or lengths[j - 1] >= batch_size_threshold
+            or length * (j + 1 - beg) > batch_size
+        ):
+            batches.append((beg, j))
+            beg = j
+    if beg < len(lengths):
+        batches.append((beg, len(lengths)))
+    return batches
+
+
 def merge_vad(vad_result, max_length=15000, min_length=0):
     new_result = []
     if len(vad_result) <= 1:
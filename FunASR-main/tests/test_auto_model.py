@@ -1,7 +1,13 @@
+import tempfile
 import unittest
+from unittest import mock
 import torch
 import numpy as np
 from funasr.auto.auto_model import AutoModel
+from funasr.frontends.wav_frontend import WavFrontend
+from funasr.utils import misc
+from funasr.utils.load_utils import AudioCache, BatchPrefetcher, load_audio_text_image_video
+from funasr.utils.vad_utils import pack_sorted_segments
 
 class TestAutoModel(unittest.TestCase):
 
@@ -55,6 +61,313 @@ class TestAutoModel(unittest.TestCase):
         self.assertEqual(len(progress), 2)
         self.assertEqual(progress, [(2, 3), (3, 3)])
 
+    def _vad_auto_model(self):
+        class DummyModel:
+            def __init__(self, vad):
+                self.vad = vad
+                self.batches = []
+                self.param = torch.nn.Parameter(torch.zeros(1))
+
+            def parameters(self):
+                return iter([self.param])
+
+            def eval(self):
+                pass
+
+            def inference(self, data_in=None, key=None, **kwargs):
+                speech = load_audio_text_image_video(
+                    data_in, fs=16000, audio_fs=kwargs.get("fs", 16000)
+                )
+                if self.vad:
+                    self.batches.append(len(speech[0]))
+                    return [{"key": key[0], "value": [[0, 500], [600, 1000]]}], {"batch_data_time": 1}
+                self.batches.append(len(speech))
+                return [{"text": str(len(s))} for s in speech], {"batch_data_time": 1}
+
+        am = AutoModel.__new__(AutoModel)
+        am.model = DummyModel(vad=False)
+        am.vad_model = DummyModel(vad=True)
+        am.punc_model = None
+        am.spk_model = None
+        am.kwargs = {"device": "cpu", "frontend": None, "disable_pbar": True}
+        am.vad_kwargs = {}
+        am.audio_cache = AudioCache()
+        return am
+
+    def test_inference_with_vad_decodes_input_once(self):
+        am = self._vad_auto_model()
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f, mock.patch(
+            "funasr.utils.load_utils.torchaudio.load", return_value=(torch.zeros(1, 16000), 16000)
+        ) as load:
+            res = am.inference_with_vad(f.name)
+            self.assertEqual(load.call_count, 1)
+            self.assertEqual(res[0]["text"], "8000 6400")
+
+            # the vad model decodes the file again without the handoff
+            res = am.inference_with_vad(f.name, vad_audio_handoff=False)
+            self.assertEqual(load.call_count, 3)
+            self.assertEqual(res[0]["text"], "8000 6400")
+
+    def test_inference_with_vad_handoff_at_input_fs(self):
+        am = self._vad_auto_model()
+        speech = np.zeros(8000, dtype=np.float32)
+
+        # the 8k input is resampled once, the vad model gets 1s at 16k in both modes
+        am.inference_with_vad(speech, fs=8000)
+        self.assertEqual(am.vad_model.batches, [16000])
+
+        am.inference_with_vad(speech, fs=8000, vad_audio_handoff=False)
+        self.assertEqual(am.vad_model.batches, [16000, 16000])
+
+    def test_inference_with_vad_passes_input_len(self):
+        am = self._vad_auto_model()
+        speech = np.zeros(16000, dtype=np.float32)
+        input_len = torch.tensor([16000])
+
+        def vad_input_lens():
+            return [
+                c.kwargs["input_len"]
+                for c in inference.call_args_list
+                if c.kwargs["model"] is am.vad_model
+            ]
+
+        for pack_inputs in (False, True):
+            with mock.patch.object(am, "inference", wraps=am.inference) as inference:
+                am.inference_with_vad(speech, input_len=input_len, pack_inputs=pack_inputs)
+                self.assertEqual(vad_input_lens(), [input_len])
+
+        # not for the waveform resampled from another fs
+        with mock.patch.object(am, "inference", wraps=am.inference) as inference:
+            am.inference_with_vad(np.zeros(8000, dtype=np.float32), input_len=input_len, fs=8000)
+            self.assertEqual(vad_input_lens(), [None])
+
+    def test_audio_cache_across_calls(self):
+        am = self._vad_auto_model()
+        am.audio_cache = AudioCache(max_seconds=2)
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f, mock.patch(
+            "funasr.utils.load_utils.torchaudio.load", return_value=(torch.zeros(1, 16000), 16000)
+        ) as load:
+            am.inference_with_vad(f.name)
+            am.inference_with_vad(f.name)
+            self.assertEqual(load.call_count, 1)
+            self.assertEqual(am.audio_cache.num_samples, 16000)
+
+
+    def test_cpu_segment_batching(self):
+        am = self._vad_auto_model()
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f, mock.patch(
+            "funasr.utils.load_utils.torchaudio.load", return_value=(torch.zeros(1, 16000), 16000)
+        ):
+            num_threads = torch.get_num_threads()
+            res = am.inference_with_vad(f.name)
+            self.assertEqual(am.model.batches, [2])
+            self.assertEqual(res[0]["text"], "8000 6400")
+            self.assertEqual(torch.get_num_threads(), num_threads)
+
+            # one segment per batch without a budget
+            am.model.batches = []
+            res = am.inference_with_vad(f.name, cpu_batch_size_s=0)
+            self.assertEqual(am.model.batches, [1, 1])
+            self.assertEqual(res[0]["text"], "8000 6400")
+
+    def test_cpu_threads_restored_on_error(self):
+        am = self._vad_auto_model()
+        num_threads = torch.get_num_threads()
+        torch.set_num_threads(4)
+        try:
+            with tempfile.NamedTemporaryFile(suffix=".wav") as f, mock.patch(
+                "funasr.utils.load_utils.torchaudio.load",
+                return_value=(torch.zeros(1, 16000), 16000),
+            ), mock.patch.object(am.model, "inference", side_effect=RuntimeError("asr")):
+                for pack_inputs in (False, True):
+                    with self.assertRaises(RuntimeError):
+                        am.inference_with_vad(f.name, pack_inputs=pack_inputs)
+                    self.assertEqual(torch.get_num_threads(), 4)
+        finally:
+            torch.set_num_threads(num_threads)
+
+    def test_inference_with_vad_packs_segments_across_inputs(self):
+        am = self._vad_auto_model()
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f1, tempfile.NamedTemporaryFile(
+            suffix=".wav"
+        ) as f2, mock.patch(
+            "funasr.utils.load_utils.torchaudio.load", return_value=(torch.zeros(1, 16000), 16000)
+        ):
+            res = am.inference_with_vad([f1.name, f2.name], pack_inputs=True)
+            # the 4 segments of the 2 inputs in one batch
+            self.assertEqual(am.model.batches, [4])
+            self.assertEqual([r["text"] for r in res], ["8000 6400", "8000 6400"])
+            self.assertEqual(
+                [r["key"] for r in res],
+                [misc.extract_filename_without_extension(f.name) for f in (f1, f2)],
+            )
+
+            # a window of one input, one batch per input
+            am.model.batches = []
+            res = am.inference_with_vad([f1.name, f2.name], pack_inputs=True, pack_window_s=0.5)
+            self.assertEqual(am.model.batches, [2, 2])
+            self.assertEqual(len(res), 2)
+
+            # the window counts the audio at the frontend fs, 1s per input at 8k
+            am.kwargs["frontend"] = mock.Mock(fs=8000)
+            am.model.batches = []
+            res = am.inference_with_vad([f1.name, f2.name], pack_inputs=True, pack_window_s=1)
+            self.assertEqual(am.model.batches, [2, 2])
+            self.assertEqual(len(res), 2)
+
+    def test_inference_with_vad_progress(self):
+        am = self._vad_auto_model()
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f, mock.patch(
+            "funasr.utils.load_utils.torchaudio.load", return_value=(torch.zeros(1, 16000), 16000)
+        ):
+            # the number of inputs decoded, in both modes
+            for pack_inputs in (False, True):
+                progress = []
+                am.generate(
+                    [f.name, f.name],
+                    pack_inputs=pack_inputs,
+                    progress_callback=lambda idx, total: progress.append((idx, total)),
+                )
+                self.assertEqual(progress, [(1, 2), (2, 2)])
+
+    def test_packed_batch_result_mismatch(self):
+        am = self._vad_auto_model()
+        inference = am.model.inference
+
+        def drop_last(data_in=None, **kwargs):
+            results, meta_data = inference(data_in, **kwargs)
+            return (results[:-1] if len(data_in) > 1 else results), meta_data
+
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f, mock.patch(
+            "funasr.utils.load_utils.torchaudio.load", return_value=(torch.zeros(1, 16000), 16000)
+        ), mock.patch.object(am.model, "inference", side_effect=drop_last):
+            with self.assertLogs(level="WARNING"):
+                res = am.inference_with_vad([f.name, f.name], pack_inputs=True)
+            # the segments of the batch are decoded one by one
+            self.assertEqual(am.model.batches, [4, 1, 1, 1, 1])
+            self.assertEqual([r["text"] for r in res], ["8000 6400", "8000 6400"])
+
+    def test_pack_sorted_segments(self):
+        self.assertEqual(pack_sorted_segments([100, 200, 300, 400], 600, 1000), [(0, 2), (2, 3), (3, 4)])
+        self.assertEqual(pack_sorted_segments([100, 200, 1000, 1200], 10000, 1000), [(0, 2), (2, 3), (3, 4)])
+        self.assertEqual(pack_sorted_segments([], 600, 1000), [])
+
+    def test_prefetch_batches(self):
+        # named like a model that takes fbank input
+        class Paraformer:
+            def __init__(self):
+                self.param = torch.nn.Parameter(torch.zeros(1))
+                self.data_types = []
+
+            def parameters(self):
+                return iter([self.param])
+
+            def eval(self):
+                pass
+
+            def inference(self, data_in=None, data_lengths=None, **kwargs):
+                self.data_types.append(kwargs.get("data_type"))
+                return [{"text": str(n)} for n in data_lengths.tolist()], {}
+
+        am = AutoModel.__new__(AutoModel)
+        am.model = Paraformer()
+        frontend = WavFrontend(dither=0.0)
+        am.kwargs = {"batch_size": 2, "disable_pbar": True, "frontend": frontend}
+        audio = [np.zeros(16000 * n // 10, dtype=np.float32) for n in (3, 10, 5, 7, 2)]
+
+        res = AutoModel.inference(am, audio, prefetch_batches=2, prefetch_workers=2)
+        # fbank frames of every input, in the input order
+        expected = [str(frontend(torch.from_numpy(a)[None, :], [len(a)])[1][0].item()) for a in audio]
+        self.assertEqual([r["text"] for r in res], expected)
+        self.assertEqual(am.model.data_types, ["fbank"] * 3)
+
+        # the pool is shut down when the model raises
+        with mock.patch.object(
+            am.model, "inference", side_effect=RuntimeError("asr")
+        ), mock.patch.object(
+            BatchPrefetcher, "close", autospec=True, side_effect=BatchPrefetcher.close
+        ) as close:
+            with self.assertRaises(RuntimeError):
+                AutoModel.inference(am, audio, prefetch_batches=2, prefetch_workers=2)
+            self.assertEqual(close.call_count, 1)
+
+    def test_prefetch_waveforms(self):
+        # overrides inference() and runs its frontend on the input, it must not get fbank
+        class SeacoParaformer:
+            def __init__(self):
+                self.param = torch.nn.Parameter(torch.zeros(1))
+                self.calls = []
+
+            def parameters(self):
+                return iter([self.param])
+
+            def eval(self):
+                pass
+
+            def inference(self, data_in=None, data_lengths=None, **kwargs):
+                self.calls.append((kwargs.get("data_type"), kwargs.get("fs"), data_lengths))
+                audio = load_audio_text_image_video(data_in, fs=16000, audio_fs=kwargs.get("fs"))
+                return [{"text": str(len(a))} for a in audio], {}
+
+        am = AutoModel.__new__(AutoModel)
+        am.model = SeacoParaformer()
+        am.kwargs = {"batch_size": 2, "disable_pbar": True, "frontend": WavFrontend(dither=0.0)}
+        audio = [np.zeros(8000 * n // 10, dtype=np.float32) for n in (3, 10, 5)]
+
+        res = AutoModel.inference(am, audio, fs=8000, prefetch_batches=2)
+        # decoded and resampled to the rate of the frontend once
+        self.assertEqual([r["text"] for r in res], ["4800", "16000", "8000"])
+        self.assertEqual(am.model.calls, [(None, 16000, None)] * 2)
+
+    def _sorting_auto_model(self):
+        class DummyModel:
+            def __init__(self):
+                self.param = torch.nn.Parameter(torch.zeros(1))
+                self.batches = []
+
+            def parameters(self):
+                return iter([self.param])
+
+            def eval(self):
+                pass
+
+            def inference(self, data_in=None, key=None, **kwargs):
+                self.batches.append(list(key))
+                return [{"key": k, "text": k} for k in key], {"batch_data_time": 1}
+
+        am = AutoModel.__new__(AutoModel)
+        am.model = DummyModel()
+        am.vad_model = None
+        am.kwargs = {"batch_size": 1, "disable_pbar": True, "device": "cpu"}
+        return am
+
+    def test_sort_by_length(self):
+        am = self._sorting_auto_model()
+        audio = [np.zeros(16000 * n // 10, dtype=np.float32) for n in (30, 5, 20, 6)]
+
+        res = AutoModel.inference(am, audio, key="k", sort_by_length=True, cpu_batch_size_s=4)
+        # keys are shared by raw waveforms, the batches follow the durations 0.5 0.6 | 2 | 3
+        self.assertEqual([len(b) for b in am.model.batches], [2, 1, 1])
+        self.assertEqual(len(res), 4)
+
+        am.model.batches.clear()
+        res = AutoModel.inference(am, audio, key="k", sort_by_length=False)
+        self.assertEqual([len(b) for b in am.model.batches], [1, 1, 1, 1])
+
+    def test_sort_by_length_restores_order(self):
+        am = self._sorting_auto_model()
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = f"{tmp}/list.jsonl"
+            with open(jsonl, "w") as f:
+                # source_len is in 10ms frames, the sources are not read to sort
+                for key, source_len in (("a", 300), ("b", 50), ("c", 200), ("d", 60)):
+                    f.write(f'{{"key": "{key}", "source": "{tmp}/{key}.wav", "source_len": {source_len}}}\n')
+
+            res = AutoModel.inference(am, jsonl, sort_by_length=True, cpu_batch_size_s=4)
+
+        self.assertEqual(am.model.batches, [["b", "d"], ["c"], ["a"]])
+        self.assertEqual([r["key"] for r in res], ["a", "b", "c", "d"])
+
 
 if __name__ == '__main__':
     unittest.main()
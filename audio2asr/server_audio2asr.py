@@ -7,6 +7,8 @@ ASR 语音识别服务 (仅 API 模式)
 import os
 import sys
 import time
+import json
+import asyncio
 from pathlib import Path
 
 # 添加项目根目录到 sys.path
@@ -15,12 +17,12 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 import uvicorn
-import requests
+import httpx
 import logging
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from asr.common import setup_logger
+from asr.common import setup_logger, join_texts
 
 # ================= 日志配置 =================
 logger = setup_logger("ASR")
@@ -33,54 +35,53 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 # ================= 配置 =================
 INTERACTION_API_URL = "http://localhost:8004"  # interaction.py 的 API 地址
 
+# 复用连接的异步客户端 (启动时创建)
+http_client: Optional[httpx.AsyncClient] = None
+
 # ================= 接口调用方法 =================
-def recognize_via_interaction(wait_time: float = 5.0) -> tuple:
+async def recognize_via_interaction(wait_time: float = 5.0) -> tuple:
     """
-    通过 interaction.py 的接口获取识别结果
-    使用非侵入式监听模式 (/listen_recent)，不占用主系统资源
+    通过 interaction.py 的推送接口获取识别结果
+    订阅 /transcripts/stream，收到一句话的最终结果 (VAD 判定说完) 即返回，
+    最多等待 wait_time 秒，超时则返回已识别的内容
     """
+    # 1. 记录开始等待的时间点 (这是我们想要截取音频的起点)
+    # 使用系统时间作为锚点
+    start_timestamp = time.time()
+    texts = {}  # 句子 id -> 文本, 同一句的新结果覆盖旧的
+
+    async def wait_for_final():
+        # 2. 订阅 start_timestamp 之后的识别结果，直到一句话结束
+        async with http_client.stream(
+            "GET",
+            f"{INTERACTION_API_URL}/transcripts/stream",
+            params={"since_time": start_timestamp},
+            timeout=httpx.Timeout(5.0, read=None),
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                texts[event["id"]] = event["text"]
+                if event["type"] == "final" and event["text"].strip():
+                    return
+
     try:
-        # 1. 记录开始等待的时间点 (这是我们想要截取音频的起点)
-        # 使用系统时间作为锚点
-        start_timestamp = time.time()
-        
-        # 2. 在本地等待，让音频流进入 Buffer (模拟录音过程)
-        if wait_time > 0:
-            logger.info(f"⏳ 本地等待 {wait_time}秒，让音频流进入 Buffer...")
-            time.sleep(wait_time)
-            
-        # 3. 调用监听接口，请求 start_timestamp 之后的内容
-        # 这样能确保我们只获取到本次调用之后产生的识别结果，而不是更早的历史记录
-        logger.info(f"📡 调用 interaction.py 监听接口 (since_time={start_timestamp})...")
-        response = requests.post(
-            f"{INTERACTION_API_URL}/listen_recent",
-            json={
-                "since_time": start_timestamp, # 🆕 传递精确的时间戳
-            },
-            timeout=5.0 # 快速返回
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            text = data.get("text", "")
-            success = data.get("success", False)
-            error = data.get("error")
-            
-            if success:
-                # 清理识别结果 (移除重复空格、特殊字符)
-                text = " ".join(text.split())
-                logger.info(f"✅ 接口返回成功: [{text}]")
-            else:
-                logger.warning(f"⚠️ 接口返回失败: {error}")
-            
-            return text, success, error
-        else:
-            error_msg = f"HTTP {response.status_code}"
-            logger.error(f"❌ 接口请求失败: {error_msg}")
-            return "", False, error_msg
-    
+        logger.info(f"📡 订阅 interaction.py 识别结果 (since_time={start_timestamp}, 最多 {wait_time}秒)...")
+        try:
+            await asyncio.wait_for(wait_for_final(), timeout=wait_time)
+        except asyncio.TimeoutError:
+            logger.info(f"⌛ 等待 {wait_time}秒 未检测到说话结束，返回已识别内容")
+
+        # 清理识别结果 (移除重复空格、特殊字符)，中文句子之间不加空格
+        text = join_texts(" ".join(texts[i].split()) for i in sorted(texts) if texts[i].strip())
+        logger.info(f"✅ 接口返回成功: [{text}]")
+        return text, True, None
+
     except Exception as e:
-        error_msg = str(e)
+        error_msg = str(e) or type(e).__name__
         logger.error(f"❌ 接口调用异常: {error_msg}")
         return "", False, error_msg
 
@@ -103,19 +104,25 @@ class RecognizeResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """服务启动时检查依赖"""
+    global http_client
+    # 所有请求共用一个连接池, 保持长连接
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+
     logger.info("🔧 正在检查 interaction.py 服务...")
     
     max_retry = 5
     for i in range(max_retry):
         try:
-            response = requests.get(f"{INTERACTION_API_URL}/status", timeout=2.0)
+            response = await http_client.get(f"{INTERACTION_API_URL}/status", timeout=2.0)
             if response.status_code == 200:
                 logger.info("✅ interaction.py 服务连接成功")
                 logger.info("✅ ASR 服务初始化完成 (API Only 模式)")
                 return
         except Exception as e:
             logger.warning(f"⚠️ 第 {i+1}/{max_retry} 次尝试失败: {e}")
-            time.sleep(2)
+            await asyncio.sleep(2)
     
     # 🆕 如果 interaction.py 不可用,则启动失败
     logger.error("❌ 错误: 无法连接到 interaction.py 服务")
@@ -123,6 +130,10 @@ async def startup_event():
     import os
     os._exit(1)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await http_client.aclose()
+
 @app.post("/recognize_live", response_model=RecognizeResponse)
 async def recognize_live(request: RecognizeLiveRequest):
     """
@@ -133,7 +144,8 @@ async def recognize_live(request: RecognizeLiveRequest):
     target_wait_time = request.wait_time if request.wait_time is not None else target_duration
     
     try:
-        text, success, error = recognize_via_interaction(
+        begin = time.time()
+        text, success, error = await recognize_via_interaction(
             wait_time=target_wait_time
         )
         
@@ -141,7 +153,7 @@ async def recognize_live(request: RecognizeLiveRequest):
             return RecognizeResponse(
                 text=text,
                 success=True,
-                duration_actual=target_wait_time,
+                duration_actual=time.time() - begin,
                 method="interaction_api"
             )
         else:
@@ -165,11 +177,11 @@ async def recognize_live(request: RecognizeLiveRequest):
         )
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """健康检查"""
     interaction_available = False
     try:
-        response = requests.get(f"{INTERACTION_API_URL}/status", timeout=1.0)
+        response = await http_client.get(f"{INTERACTION_API_URL}/status", timeout=1.0)
         interaction_available = response.status_code == 200
     except:
         pass
@@ -2,12 +2,18 @@
 共享工具模块
 包含跨模块使用的工具类和管理器
 """
-from .tts_client import TTSClient
+from .tts_client import TTSClient, SpeechQueue
 from .agent_client import AgentClient
 from .logger import setup_logger
+from .metrics import MetricsRegistry, metrics
+from .text import join_texts
 
 __all__ = [
     'TTSClient',
+    'SpeechQueue',
     'AgentClient',
-    'setup_logger'
+    'setup_logger',
+    'MetricsRegistry',
+    'metrics',
+    'join_texts'
 ]
\ No newline at end of file
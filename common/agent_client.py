@@ -1,17 +1,24 @@
 import uuid
-import requests
+import json
 import time
 import logging
 from .logger import setup_logger
+from .http_pool import Endpoint, request, arequest
+from .metrics import metrics
 
 # 配置日志
 logger = setup_logger("agent_client")
 
 # Agent 服务地址
 AGENT_SERVER_URL = "http://192.168.77.102:8602/v1/chat/completions"
+CHAT = Endpoint(AGENT_SERVER_URL, timeout=20.0, retries=1)
+
+# 耗时指标 (/metrics)
+AGENT_ROUND_TRIP = metrics.histogram("agent_round_trip_seconds", "Agent 请求到完整回答的耗时")
+AGENT_FIRST_DELTA = metrics.histogram("agent_first_delta_seconds", "流式请求到收到第一段回答的耗时")
 
 class AgentClient:
-    """Agent 对话客户端"""
+    """Agent 对话客户端 (复用共享连接池，chat_async 为协程版本，chat_stream 为流式版本)"""
     def __init__(self):
         self.reset_session()
 
@@ -22,6 +29,74 @@ class AgentClient:
         logger.info(f"🔄 会话重置: {self.session_id}")
 
     def chat(self, query):
+        try:
+            logger.info(f"🤔 思考中...")
+            begin = time.perf_counter()
+            resp = request("POST", CHAT, json=self._payload(query))
+            response = self._parse(resp)
+            AGENT_ROUND_TRIP.since(begin)
+            return response
+        except Exception as e:
+            logger.error(f"❌ Agent Request Error: {e}")
+            return "连接服务器失败。"
+
+    async def chat_async(self, query):
+        """chat 的协程版本"""
+        try:
+            logger.info(f"🤔 思考中...")
+            begin = time.perf_counter()
+            resp = await arequest("POST", CHAT, json=self._payload(query))
+            response = self._parse(resp)
+            AGENT_ROUND_TRIP.since(begin)
+            return response
+        except Exception as e:
+            logger.error(f"❌ Agent Request Error: {e}")
+            return "连接服务器失败。"
+
+    def chat_stream(self, query):
+        """
+        流式对话，逐段返回回答的增量文本
+
+        服务端以 SSE 返回 `data: {"delta": "...", "memory": ...}`，以 `data: [DONE]` 结束
+        (也兼容 OpenAI 格式的 choices[0].delta.content)；
+        服务端不支持流式而返回普通 JSON 时，一次返回完整回答
+        """
+        try:
+            logger.info(f"🤔 思考中...")
+            begin = time.perf_counter()
+            resp = request("POST", CHAT, json=self._payload(query, stream=True), stream=True)
+        except Exception as e:
+            logger.error(f"❌ Agent Request Error: {e}")
+            yield "连接服务器失败。"
+            return
+
+        with resp:
+            if resp.status_code != 200 or "text/event-stream" not in resp.headers.get("Content-Type", ""):
+                response = self._parse(resp)
+                AGENT_FIRST_DELTA.since(begin)
+                AGENT_ROUND_TRIP.since(begin)
+                yield response
+                return
+            first = True
+            try:
+                for line in resp.iter_lines():
+                    # SSE 按字节解析，避免响应头未声明 charset 时按 latin-1 解码
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    delta = self._parse_delta(json.loads(data))
+                    if delta:
+                        if first:
+                            AGENT_FIRST_DELTA.since(begin)
+                            first = False
+                        yield delta
+                AGENT_ROUND_TRIP.since(begin)
+            except Exception as e:
+                logger.error(f"❌ Agent 流式响应中断: {e}")
+
+    def _payload(self, query, stream=False):
         request_id = str(uuid.uuid4())
         payload = {
             "session_id": self.session_id,
@@ -30,20 +105,28 @@ class AgentClient:
             "voice": True,
             "memory_data": self.memory_data
         }
-        
-        try:
-            logger.info(f"🤔 思考中...")
-            resp = requests.post(AGENT_SERVER_URL, json=payload, timeout=20.0)
-            if resp.status_code == 200:
-                res_data = resp.json()
-                if res_data.get("response") == "【ERROR】":
-                    return "抱歉，我遇到了一些问题。"
-                
-                self.memory_data = res_data.get("memory")
-                return res_data.get("response", "")
-            else:
-                logger.error(f"❌ Agent Error Status: {resp.status_code}")
-                return "服务暂时不可用。"
-        except Exception as e:
-            logger.error(f"❌ Agent Request Error: {e}")
-            return "连接服务器失败。"
\ No newline at end of file
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _parse_delta(self, event):
+        if "memory" in event:
+            self.memory_data = event["memory"]
+        delta = event.get("delta")
+        if delta is None and event.get("choices"):
+            delta = event["choices"][0].get("delta", {}).get("content")
+        if delta == "【ERROR】":
+            return "抱歉，我遇到了一些问题。"
+        return delta
+
+    def _parse(self, resp):
+        if resp.status_code == 200:
+            res_data = resp.json()
+            if res_data.get("response") == "【ERROR】":
+                return "抱歉，我遇到了一些问题。"
+            
+            self.memory_data = res_data.get("memory")
+            return res_data.get("response", "")
+        else:
+            logger.error(f"❌ Agent Error Status: {resp.status_code}")
+            return "服务暂时不可用。"
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+连接池基准测试: 对本地桩服务模拟完整的交互轮次，比较每次请求新建连接
+(原先的 requests.post / requests.get) 与共享连接池的耗时和建连次数
+
+一轮 = 获取独占权 + 播报 "我在" + Agent 对话 + 播报回答 + 释放独占权
+
+```bash
+python common/benchmark_http_pool.py --turns 5 --connect-delay-ms 2
+```
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import requests
+from asr.common import http_pool, tts_client, agent_client, TTSClient, AgentClient
+from asr.common.stub_server import start_stub_server
+
+
+def point_to(base_url: str):
+    """把各接口指向桩服务"""
+    tts_client.SPEAK.url = f"{base_url}/speak_msg"
+    tts_client.MONITOR.url = f"{base_url}/monitor"
+    tts_client.EXCLUSIVE_MODE.url = f"{base_url}/control/exclusive_mode"
+    tts_client.STOP_CURRENT_PLAY.url = f"{base_url}/control/stop_current_playback"
+    tts_client.TASK_WAIT.url = f"{base_url}/monitor/wait"
+    agent_client.CHAT.url = f"{base_url}/v1/chat/completions"
+
+
+def unpooled_request(method, endpoint, **kwargs):
+    """原先的行为: 每个请求新建连接"""
+    kwargs.setdefault("timeout", endpoint.timeout)
+    return requests.request(method, endpoint.url, **kwargs)
+
+
+def run_turn(agent):
+    TTSClient.set_exclusive_mode(True)
+    TTSClient.speak("我在", wait=True)
+    response = agent.chat("今天天气怎么样")
+    TTSClient.speak(response, wait=True)
+    TTSClient.set_exclusive_mode(False)
+
+
+async def run_turn_async(agent):
+    await TTSClient.set_exclusive_mode_async(True)
+    await TTSClient.speak_async("我在", wait=True)
+    response = await agent.chat_async("今天天气怎么样")
+    await TTSClient.speak_async(response, wait=True)
+    await TTSClient.set_exclusive_mode_async(False)
+
+
+def measure(name, state, turns, run):
+    connections, requests_count = state.connections, state.requests
+    begin = time.perf_counter()
+    run(turns)
+    elapsed = (time.perf_counter() - begin) / turns
+    connections = (state.connections - connections) / turns
+    requests_count = (state.requests - requests_count) / turns
+    print(f"{name:>10}: {elapsed * 1000:8.1f} ms/turn, "
+          f"{requests_count:5.1f} requests/turn, {connections:5.1f} connections/turn")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--play-ms", type=float, default=300.0)
+    parser.add_argument("--chat-ms", type=float, default=50.0)
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0,
+                        help="模拟建立每个 TCP 连接的网络往返")
+    args = parser.parse_args()
+
+    _, state, base_url = start_stub_server(
+        play_ms=args.play_ms, chat_ms=args.chat_ms, connect_delay_ms=args.connect_delay_ms
+    )
+    point_to(base_url)
+    agent = AgentClient()
+
+    def sync_turns(turns):
+        for _ in range(turns):
+            run_turn(agent)
+
+    pooled_request = tts_client.request
+    tts_client.request = agent_client.request = unpooled_request
+    unpooled = measure("unpooled", state, args.turns, sync_turns)
+    tts_client.request = agent_client.request = pooled_request
+    pooled = measure("pooled", state, args.turns, sync_turns)
+
+    async def async_turns(turns):
+        for _ in range(turns):
+            await run_turn_async(agent)
+        await http_pool.get_async_client().aclose()
+
+    measure("async", state, args.turns, lambda turns: asyncio.run(async_turns(turns)))
+    print(f"connection setup saved: {(unpooled - pooled) * 1000:.1f} ms/turn")
+
+
+if __name__ == "__main__":
+    main()
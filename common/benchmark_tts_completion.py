@@ -0,0 +1,79 @@
+"""
+播放完成检测延迟基准测试: 对本地桩服务连续播报，统计 speak(wait=True) 返回时间
+与桩服务中任务实际结束时间的差值，以及每次播报发出的请求数
+
+- long-poll: 服务端长轮询 /monitor/wait
+- backoff:   服务端不支持长轮询，客户端自适应回退轮询 /monitor
+- fixed:     原先的固定 50 ms 轮询，连续 5 次未检测到任务才判定结束
+
+```bash
+python common/benchmark_tts_completion.py --speaks 20 --play-ms 300
+```
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from asr.common import tts_client, TTSClient
+from asr.common.stub_server import start_stub_server
+from asr.common.benchmark_http_pool import point_to
+
+
+def fixed_wait_for_completion(task_id, timeout=120):
+    """原先的实现: 固定间隔轮询"""
+    start_time = time.time()
+    task_seen = False
+    stable_checks = 0
+    while time.time() - start_time < timeout:
+        if TTSClient.is_task_running(task_id):
+            task_seen = True
+            stable_checks = 0
+        elif task_seen:
+            stable_checks += 1
+            if stable_checks >= 5:
+                return True
+        elif time.time() - start_time > 5.0:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run(name, state, speaks):
+    latencies = []
+    requests_count = state.requests
+    for i in range(speaks):
+        task_id = TTSClient.speak(f"第{i}句", wait=True)
+        latencies.append(time.time() - state.end_times[task_id])
+    requests_count = (state.requests - requests_count) / speaks
+    latencies = np.array(latencies) * 1000
+    print(f"{name:>9}: detection latency p50 {np.percentile(latencies, 50):6.1f} ms, "
+          f"p99 {np.percentile(latencies, 99):6.1f} ms, {requests_count:5.1f} requests/speak")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--speaks", type=int, default=20)
+    parser.add_argument("--play-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    for name, long_poll in (("long-poll", True), ("backoff", False), ("fixed", False)):
+        server, state, base_url = start_stub_server(play_ms=args.play_ms, long_poll=long_poll)
+        point_to(base_url)
+        TTSClient._long_poll_supported = None
+        wait = TTSClient._wait_for_completion
+        if name == "fixed":
+            TTSClient._wait_for_completion = staticmethod(fixed_wait_for_completion)
+        run(name, state, args.speaks)
+        TTSClient._wait_for_completion = staticmethod(wait)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
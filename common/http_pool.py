@@ -0,0 +1,123 @@
+"""
+共享 HTTP 连接池
+同步接口基于 requests.Session，异步接口基于 httpx.AsyncClient，均保持长连接复用，
+同一主机的接口共用一个连接池，每个接口有独立的超时和重试预算
+"""
+import asyncio
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+# 每个主机的连接池大小
+POOL_MAXSIZE = 8
+# 异步客户端的连接上限
+ASYNC_MAX_CONNECTIONS = 32
+# 重试退避基数 (秒)
+BACKOFF_FACTOR = 0.05
+
+
+class Endpoint:
+    """
+    接口地址及其超时、重试预算
+
+    只重试连接失败 (请求尚未发出) 和幂等的 GET 请求，避免 POST 被重复执行
+    """
+    def __init__(self, url: str, timeout: float, retries: int = 0):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+
+
+_session = None
+_mounted = set()
+_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """进程内共享的 requests.Session"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
+
+
+def _mount(session: requests.Session, url: str):
+    """每个 scheme + 主机挂载一个连接池，重试由 request() 按接口处理"""
+    parts = urlsplit(url)
+    prefix = f"{parts.scheme}://{parts.netloc}/".lower()
+    if prefix in _mounted:
+        return
+    with _lock:
+        if prefix not in _mounted:
+            session.mount(prefix, HTTPAdapter(pool_maxsize=POOL_MAXSIZE))
+            _mounted.add(prefix)
+
+
+def _connect_failed(e: requests.RequestException) -> bool:
+    """连接阶段失败 (连接被拒绝、建连超时)，请求尚未发出，对应 httpx.ConnectError / ConnectTimeout"""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(e, requests.exceptions.ConnectionError):
+        return False
+    # requests 把 urllib3 的 MaxRetryError 包装在 ConnectionError 中, 失败原因在 reason 上
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def request(method: str, endpoint: Endpoint, **kwargs) -> requests.Response:
+    """同步请求，复用连接，重试策略与异步请求一致"""
+    session = get_session()
+    url = endpoint.url
+    _mount(session, url)
+    kwargs.setdefault("timeout", endpoint.timeout)
+    attempt = 0
+    while True:
+        try:
+            return session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # 连接失败时请求尚未发出，可以安全重试；其余错误只重试 GET
+            retryable = _connect_failed(e) or method == "GET"
+            if attempt >= endpoint.retries or not retryable:
+                raise
+            time.sleep(BACKOFF_FACTOR * (2 ** attempt))
+            attempt += 1
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """当前事件循环共享的 httpx.AsyncClient"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_MAX_CONNECTIONS,
+            )
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def arequest(method: str, endpoint: Endpoint, **kwargs) -> httpx.Response:
+    """异步请求，复用连接，重试策略与同步请求一致"""
+    client = get_async_client()
+    kwargs.setdefault("timeout", endpoint.timeout)
+    attempt = 0
+    while True:
+        try:
+            return await client.request(method, endpoint.url, **kwargs)
+        except httpx.TransportError as e:
+            # 连接失败时请求尚未发出，可以安全重试；其余错误只重试 GET
+            retryable = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)) or method == "GET"
+            if attempt >= endpoint.retries or not retryable:
+                raise
+            await asyncio.sleep(BACKOFF_FACTOR * (2 ** attempt))
+            attempt += 1
@@ -0,0 +1,126 @@
+"""
+进程内指标 (直方图 / 计数器)，以 Prometheus 文本格式导出
+
+指标和标签值在初始化时创建，热路径上的 observe() / inc() 只做一次二分查找和加法，
+不格式化字符串、不加锁 (多线程同时更新同一指标时允许极少量计数丢失)
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+
+# 默认桶 (秒)，覆盖单帧处理 (毫秒级) 到 Agent / TTS 往返 (秒级)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels: dict, extra: str = "") -> str:
+    items = [f'{k}="{v}"' for k, v in labels.items()]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+class Histogram:
+    """固定桶的直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def since(self, start: float):
+        """记录从 start (time.perf_counter()) 到现在的耗时"""
+        self.observe(time.perf_counter() - start)
+
+    def render(self, name: str, labels: dict) -> list:
+        lines, total = [], 0
+        counts = list(self.counts)
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            total += count
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_format_labels(labels, le)} {total}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {total}")
+        return lines
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self, name: str, labels: dict) -> list:
+        return [f"{name}{_format_labels(labels)} {self.value}"]
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+    同名指标按标签值区分，histogram() / counter() 对相同的名称和标签返回同一个对象，
+    在初始化时取得后保存，热路径直接调用 observe() / inc()。计数器的名称以 _total 结尾
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._families = {}  # name -> (type, help, {labels tuple: metric})
+        self._collectors = []
+
+    def _get(self, kind: str, cls, name: str, help: str, labels: dict, **kwargs):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            if family[0] != kind:
+                raise ValueError(f"指标 {name} 已注册为 {family[0]}")
+            if key not in family[2]:
+                family[2][key] = cls(**kwargs)
+            return family[2][key]
+
+    def histogram(self, name: str, help: str, labels: dict = None, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get("histogram", Histogram, name, help, labels, buckets=buckets)
+
+    def counter(self, name: str, help: str, labels: dict = None) -> Counter:
+        return self._get("counter", Counter, name, help, labels)
+
+    def add_collector(self, collect):
+        """
+        注册导出时调用的回调，用于导出已有的统计 (例如音频采集状态)
+
+        Args:
+            collect: collect() -> [(名称, 类型, 说明, {标签}, 值), ...]，类型为 "gauge" 或 "counter"
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        """Prometheus 文本格式 (text/plain; version=0.0.4)"""
+        lines = []
+        with self._lock:
+            families = list(self._families.items())
+            collectors = list(self._collectors)
+        for name, (kind, help, metrics) in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in list(metrics.items()):
+                lines.extend(metric.render(name, dict(key)))
+
+        collected = {}
+        for collect in collectors:
+            for name, kind, help, labels, value in collect():
+                collected.setdefault(name, (kind, help, []))[2].append((labels, value))
+        for name, (kind, help, samples) in collected.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内全局注册表
+metrics = MetricsRegistry()
@@ -0,0 +1,208 @@
+"""
+本地 TTS / Agent 桩服务，用于基准测试，不依赖真实的语音与对话服务
+
+接口与真实服务一致: /speak_msg, /monitor, /control/exclusive_mode,
+/control/stop_current_playback, /v1/chat/completions，以及播放完成的长轮询
+/monitor/wait?task_id=...&timeout=... (long_poll=False 时返回 404)。
+每个 speak 任务合成 synth_ms_per_char * 字数 毫秒后开始 "播放"，播放 play_ms 毫秒
+(或 play_ms_per_char * 字数 毫秒) 后结束。
+对话接口在 chat_ms 毫秒后给出第一段回答，之后每 token_ms 毫秒一段 (每段 2 个字)；
+请求带 "stream": true 时以 SSE 逐段返回，否则生成完毕后一次返回。
+"""
+import json
+import time
+import uuid
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, play_ms: float = 300.0, chat_ms: float = 50.0, long_poll: bool = True,
+                 token_ms: float = 0.0, synth_ms_per_char: float = 0.0, play_ms_per_char: float = None,
+                 reply: str = None):
+        self.play_ms = play_ms
+        self.chat_ms = chat_ms
+        self.long_poll = long_poll
+        self.token_ms = token_ms
+        self.synth_ms_per_char = synth_ms_per_char
+        self.play_ms_per_char = play_ms_per_char
+        self.reply = reply  # 固定的回答，None 时回显问题
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.tasks = []  # [(task_id, 开始时间, 结束时间)] 按顺序播放
+        self.exclusive_source = None
+        self.connections = 0
+        self.requests = 0
+        self.end_times = {}  # task_id -> 实际结束时间
+        self.begin_times = {}  # task_id -> 开始播放时间
+
+    def add_task(self, text: str = "") -> str:
+        with self.lock:
+            task_id = str(uuid.uuid4())
+            ready = time.time() + len(text) * self.synth_ms_per_char / 1000
+            begin = max(ready, self.tasks[-1][2] if self.tasks else 0.0)
+            play_ms = self.play_ms if self.play_ms_per_char is None else len(text) * self.play_ms_per_char
+            self.tasks.append((task_id, begin, begin + play_ms / 1000))
+            self.begin_times[task_id] = begin
+            self.end_times[task_id] = begin + play_ms / 1000
+            return task_id
+
+    def chat_tokens(self, query: str) -> list:
+        reply = self.reply if self.reply is not None else f"收到: {query}"
+        return [reply[i:i + 2] for i in range(0, len(reply), 2)]
+
+    def wait_task(self, task_id: str, timeout: float) -> bool:
+        """阻塞到任务结束 (True) 或超时 (False)"""
+        deadline = time.time() + timeout
+        with self.changed:
+            while True:
+                now = time.time()
+                task = next((t for t in self.tasks if t[0] == task_id and t[2] > now), None)
+                if task is None:
+                    return True
+                if now >= deadline:
+                    return False
+                self.changed.wait(min(task[2], deadline) - now)
+
+    def monitor(self) -> dict:
+        with self.lock:
+            now = time.time()
+            self.tasks = [t for t in self.tasks if t[2] > now]
+            active = [{"id": t[0]} for t in self.tasks if t[1] <= now]
+            waiting = [{"id": t[0]} for t in self.tasks if t[1] > now]
+            return {
+                "active_task": active[0] if active else None,
+                "waiting_list": waiting,
+                "exclusive_mode": {"source": self.exclusive_source},
+            }
+
+    def stop_current(self):
+        with self.lock:
+            now = time.time()
+            for t in self.tasks:
+                if t[1] <= now:
+                    self.end_times[t[0]] = now
+            # 排队的任务依次提前
+            tasks, end = [], now
+            for task_id, begin, finish in self.tasks:
+                if begin > now:
+                    shift = max(begin - end, 0.0)
+                    begin, finish = begin - shift, finish - shift
+                    self.begin_times[task_id], self.end_times[task_id] = begin, finish
+                    tasks.append((task_id, begin, finish))
+                    end = finish
+            self.tasks = tasks
+            self.changed.notify_all()
+
+
+def make_handler(state: StubState, connect_delay_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持长连接
+        disable_nagle_algorithm = True  # 避免长连接上的响应被延迟确认拖慢
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+            # 模拟建立连接的网络往返
+            if connect_delay_ms > 0:
+                time.sleep(connect_delay_ms / 1000)
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, data: dict):
+            body = json.dumps(data).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream_chat(self, tokens: list):
+            # SSE，分块传输以保持长连接
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(state.chat_ms / 1000)
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(state.token_ms / 1000)
+                event = json.dumps({"delta": token}, ensure_ascii=False)
+                self._send_chunk(f"data: {event}\n\n".encode())
+            self._send_chunk(b'data: {"memory": null}\n\ndata: [DONE]\n\n')
+            self._send_chunk(b"")
+
+        def _read(self) -> dict:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+            url = urlparse(self.path)
+            if url.path == "/monitor/wait" and state.long_poll:
+                query = parse_qs(url.query)
+                task_id = query["task_id"][0]
+                done = state.wait_task(task_id, float(query.get("timeout", ["10"])[0]))
+                self._send({"task_id": task_id, "done": done})
+            elif url.path == "/monitor":
+                self._send(state.monitor())
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            with state.lock:
+                state.requests += 1
+            payload = self._read()
+            if self.path == "/speak_msg":
+                self._send({"data": {"task_id": state.add_task(payload.get("speak_msg", ""))}})
+            elif self.path == "/control/exclusive_mode":
+                with state.lock:
+                    state.exclusive_source = payload.get("allowed_source") if payload.get("active") else None
+                self._send({"is_granted": True})
+            elif self.path == "/control/stop_current_playback":
+                state.stop_current()
+                self._send({"success": True})
+            elif self.path == "/v1/chat/completions":
+                tokens = state.chat_tokens(payload.get("query", ""))
+                if payload.get("stream"):
+                    self._stream_chat(tokens)
+                    return
+                time.sleep((state.chat_ms + state.token_ms * max(len(tokens) - 1, 0)) / 1000)
+                self._send({"response": "".join(tokens), "memory": None})
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+def start_stub_server(port: int = 0, play_ms: float = 300.0, chat_ms: float = 50.0,
+                      connect_delay_ms: float = 0.0, long_poll: bool = True, **kwargs):
+    """在后台线程启动桩服务，返回 (server, state, base_url)；其余参数见 StubState"""
+    state = StubState(play_ms, chat_ms, long_poll, **kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state, connect_delay_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 TTS / Agent 桩服务")
+    parser.add_argument("--port", type=int, default=28001)
+    parser.add_argument("--play-ms", type=float, default=300.0)
+    parser.add_argument("--no-long-poll", action="store_true", help="不提供 /monitor/wait")
+    args = parser.parse_args()
+    server, _, base_url = start_stub_server(
+        args.port, args.play_ms, long_poll=not args.no_long_poll
+    )
+    print(f"stub server on {base_url}")
+    threading.Event().wait()
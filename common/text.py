@@ -0,0 +1,17 @@
+"""
+识别文本处理工具
+"""
+
+
+def _is_latin(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+def join_texts(texts) -> str:
+    """拼接多句识别结果, 只在两段拉丁字母 (英文/数字) 之间加空格, 中文直接相连"""
+    result = ""
+    for text in texts:
+        if result and _is_latin(result[-1]) and _is_latin(text[0]):
+            result += " "
+        result += text
+    return result
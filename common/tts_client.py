@@ -1,7 +1,11 @@
 import time
-import requests
+import queue
+import asyncio
 import logging
+import threading
 from .logger import setup_logger
+from .http_pool import Endpoint, request, arequest
+from .metrics import metrics
 
 # 配置日志
 logger = setup_logger("tts_client")
@@ -11,15 +15,68 @@ TTS_SERVER_URL = "http://192.168.77.103:28001/speak_msg"
 TTS_MONITOR_URL = "http://192.168.77.103:28001/monitor"
 TTS_EXCLUSIVE_MODE_URL = "http://192.168.77.103:28001/control/exclusive_mode"
 TTS_STOP_CURRENT_PLAY_URL = "http://192.168.77.103:28001/control/stop_current_playback"
+TTS_TASK_WAIT_URL = "http://192.168.77.103:28001/monitor/wait"
+
+# 各接口的超时与重试预算
+SPEAK = Endpoint(TTS_SERVER_URL, timeout=10.0, retries=1)  # 增加超时时间，防止长文本请求超时
+MONITOR = Endpoint(TTS_MONITOR_URL, timeout=0.5, retries=1)
+EXCLUSIVE_MODE = Endpoint(TTS_EXCLUSIVE_MODE_URL, timeout=2.0, retries=1)
+STOP_CURRENT_PLAY = Endpoint(TTS_STOP_CURRENT_PLAY_URL, timeout=7.0, retries=1)
+# 长轮询: 阻塞到任务结束或超时，返回 {"task_id": ..., "done": bool}; timeout 为超出等待时间的余量
+TASK_WAIT = Endpoint(TTS_TASK_WAIT_URL, timeout=2.0, retries=1)
+
+# 耗时指标 (/metrics)
+TTS_REQUEST = metrics.histogram("tts_request_seconds", "提交 TTS 播报任务的请求耗时")
+TTS_WAIT = metrics.histogram("tts_playback_wait_seconds", "等待 TTS 任务播放完成的耗时")
+
+
+class CompletionPoller:
+    """
+    回退轮询的状态机
+    任务运行中逐步放慢轮询；任务消失后按最小间隔持续确认 STABLE_WINDOW 秒，
+    防止任务在网关转发间隙“闪烁”导致误判
+    """
+    MIN_INTERVAL = 0.05
+    MAX_INTERVAL = 0.1
+    BACKOFF = 1.5
+    STABLE_WINDOW = 0.2
+    # 等待任务出现的最大时间。如果超过此时间任务仍未出现，假定任务已完成(过快)或失败
+    MAX_STARTUP_WAIT = 5.0
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.task_seen = False
+        self.gone_since = None
+        self.interval = self.MIN_INTERVAL
+
+    def update(self, running: bool):
+        """记录一次检查结果，返回 (是否已结束, 下次检查前的等待时间)"""
+        now = time.time()
+        if running:
+            self.task_seen = True
+            self.gone_since = None
+            delay = self.interval
+            self.interval = min(self.interval * self.BACKOFF, self.MAX_INTERVAL)
+            return False, delay
+        if self.task_seen:
+            if self.gone_since is None:
+                self.gone_since = now
+            return now - self.gone_since >= self.STABLE_WINDOW, self.MIN_INTERVAL
+        # 任务长时间未出现，假定已结束
+        return now - self.start_time > self.MAX_STARTUP_WAIT, self.MIN_INTERVAL
+
 class TTSClient:
-    """HTTP TTS 客户端"""
+    """
+    HTTP TTS 客户端
+    所有请求复用共享连接池；每个方法都有对应的 *_async 协程版本
+    """
     DEFAULT_SOURCE = "interaction"
-    
+
     @staticmethod
     def set_exclusive_mode(active: bool, allowed_source: str = None, max_wait_seconds=3):
         """
         控制语音服务的独占模式
-        
+
         Args:
             active: True 开启独占，False 关闭独占
             allowed_source: 独占时的允许源
@@ -33,47 +90,94 @@ class TTSClient:
                 "active": active,
                 "allowed_source": allowed_source
             }
-            
+
             if active:
                 start_time = time.time()
                 attempt = 0
-                
+
                 while time.time() - start_time < max_wait_seconds:
                     attempt += 1
-                    response = requests.post(TTS_EXCLUSIVE_MODE_URL, json=payload, timeout=2.0)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        is_granted = data.get("is_granted", False)
-                        
-                        if is_granted:
-                            logger.info(f"✅ [{allowed_source}] 成功获得TTS独占权 (第{attempt}次尝试)")
-                            return True
-                        else:
-                            current_source = data.get("current_source")
-                            logger.warning(f"⚠️ [{allowed_source}] 等待独占权... (当前持有者: {current_source})")
-                            time.sleep(0.3)
-                    else:
-                        logger.warning(f"⚠️ 设置TTS独占模式请求失败: HTTP {response.status_code}")
-                        return False
-                
+                    response = request("POST", EXCLUSIVE_MODE, json=payload)
+                    granted = TTSClient._check_grant(response, allowed_source, attempt)
+                    if granted is not None:
+                        return granted
+                    time.sleep(0.3)
+
                 logger.error(f"❌ [{allowed_source}] 获取独占权超时 ({max_wait_seconds}秒)")
                 return False
             else:
-                response = requests.post(TTS_EXCLUSIVE_MODE_URL, json=payload, timeout=2.0)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("is_granted", False):
-                        logger.info(f"🔓 [{allowed_source}] TTS独占模式已释放")
-                        return True
-                    else:
-                        logger.warning(f"⚠️ [{allowed_source}] 释放独占模式失败: {data.get('message', '未知错误')}")
-                        return False
+                response = request("POST", EXCLUSIVE_MODE, json=payload)
+                return TTSClient._check_release(response, allowed_source)
+
+        except Exception as e:
+            logger.error(f"⚠️ 设置TTS独占模式异常: {e}")
+            return False
+
+    @staticmethod
+    async def set_exclusive_mode_async(active: bool, allowed_source: str = None, max_wait_seconds=3):
+        """set_exclusive_mode 的协程版本"""
+        if allowed_source is None:
+            allowed_source = TTSClient.DEFAULT_SOURCE
+
+        try:
+            payload = {
+                "active": active,
+                "allowed_source": allowed_source
+            }
+
+            if active:
+                start_time = time.time()
+                attempt = 0
+
+                while time.time() - start_time < max_wait_seconds:
+                    attempt += 1
+                    response = await arequest("POST", EXCLUSIVE_MODE, json=payload)
+                    granted = TTSClient._check_grant(response, allowed_source, attempt)
+                    if granted is not None:
+                        return granted
+                    await asyncio.sleep(0.3)
+
+                logger.error(f"❌ [{allowed_source}] 获取独占权超时 ({max_wait_seconds}秒)")
                 return False
-                
+            else:
+                response = await arequest("POST", EXCLUSIVE_MODE, json=payload)
+                return TTSClient._check_release(response, allowed_source)
+
         except Exception as e:
             logger.error(f"⚠️ 设置TTS独占模式异常: {e}")
             return False
+
+    @staticmethod
+    def _check_grant(response, allowed_source, attempt):
+        """解析获取独占权的响应，返回 None 表示需要继续等待"""
+        if response.status_code == 200:
+            data = response.json()
+            is_granted = data.get("is_granted", False)
+
+            if is_granted:
+                logger.info(f"✅ [{allowed_source}] 成功获得TTS独占权 (第{attempt}次尝试)")
+                return True
+            else:
+                current_source = data.get("current_source")
+                logger.warning(f"⚠️ [{allowed_source}] 等待独占权... (当前持有者: {current_source})")
+                return None
+        else:
+            logger.warning(f"⚠️ 设置TTS独占模式请求失败: HTTP {response.status_code}")
+            return False
+
+    @staticmethod
+    def _check_release(response, allowed_source):
+        """解析释放独占权的响应"""
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("is_granted", False):
+                logger.info(f"🔓 [{allowed_source}] TTS独占模式已释放")
+                return True
+            else:
+                logger.warning(f"⚠️ [{allowed_source}] 释放独占模式失败: {data.get('message', '未知错误')}")
+                return False
+        return False
+
     # FIXED:增加播放暂停
     @staticmethod
     def stop_current_playback(source=None):
@@ -89,128 +193,364 @@ class TTSClient:
                 "allowed_source": source
             }
 
-            response = requests.post(TTS_STOP_CURRENT_PLAY_URL, json=payload, timeout=7.0)
-            if response.status_code == 200:
-                logger.info(f"🛑 [{source}] 已发送停止当前播放请求")
-                return True
-            else:
-                logger.warning(f"⚠️ 停止当前播放失败: {response.status_code}")
-                return False
+            response = request("POST", STOP_CURRENT_PLAY, json=payload)
+            return TTSClient._check_stop(response, source)
+        except Exception as e:
+            logger.error(f"❌ 停止当前播放请求异常: {e}")
+            return False
+
+    @staticmethod
+    async def stop_current_playback_async(source=None):
+        """stop_current_playback 的协程版本"""
+        if source is None:
+            source = TTSClient.DEFAULT_SOURCE
+
+        try:
+            payload = {
+                "allowed_source": source
+            }
+
+            response = await arequest("POST", STOP_CURRENT_PLAY, json=payload)
+            return TTSClient._check_stop(response, source)
         except Exception as e:
             logger.error(f"❌ 停止当前播放请求异常: {e}")
             return False
 
+    @staticmethod
+    def _check_stop(response, source):
+        if response.status_code == 200:
+            logger.info(f"🛑 [{source}] 已发送停止当前播放请求")
+            return True
+        else:
+            logger.warning(f"⚠️ 停止当前播放失败: {response.status_code}")
+            return False
+
     @staticmethod
     def speak(text, volume=100, wait=True, source=None):
         """发送TTS请求并可选等待播放完成"""
         if not text:
             return None
-        
+
         if source is None:
             source = TTSClient.DEFAULT_SOURCE
 
         try:
-            payload = {
-                "speak_msg": text,
-                "source": source,
-                "volume": volume
-            }
-            headers = {"Content-Type": "application/json"}
-            
             logger.info(f"🔊 {text}")
-            # 增加超时时间，防止长文本请求超时
-            response = requests.post(TTS_SERVER_URL, json=payload, headers=headers, timeout=10.0)
-            
-            if response.status_code != 200:
-                logger.warning(f"⚠️ TTS错误: {response.status_code}")
-                return None
-            
-            result = response.json()
-            data = result.get('data')
-            if not data or not isinstance(data, dict):
-                return None
-            
-            task_id = data.get('task_id')
-            
+            begin = time.perf_counter()
+            response = request("POST", SPEAK, json=TTSClient._speak_payload(text, volume, source))
+            TTS_REQUEST.since(begin)
+            task_id = TTSClient._parse_task_id(response)
+
             if wait and task_id:
+                begin = time.perf_counter()
                 TTSClient._wait_for_completion(task_id)
-            
+                TTS_WAIT.since(begin)
+
+            return task_id
+
+        except Exception as e:
+            logger.error(f"❌ TTS失败: {e}")
+            return None
+
+    @staticmethod
+    async def speak_async(text, volume=100, wait=True, source=None):
+        """speak 的协程版本"""
+        if not text:
+            return None
+
+        if source is None:
+            source = TTSClient.DEFAULT_SOURCE
+
+        try:
+            logger.info(f"🔊 {text}")
+            begin = time.perf_counter()
+            response = await arequest("POST", SPEAK, json=TTSClient._speak_payload(text, volume, source))
+            TTS_REQUEST.since(begin)
+            task_id = TTSClient._parse_task_id(response)
+
+            if wait and task_id:
+                begin = time.perf_counter()
+                await TTSClient._wait_for_completion_async(task_id)
+                TTS_WAIT.since(begin)
+
             return task_id
-                
+
         except Exception as e:
             logger.error(f"❌ TTS失败: {e}")
             return None
 
+    @staticmethod
+    def _speak_payload(text, volume, source):
+        return {
+            "speak_msg": text,
+            "source": source,
+            "volume": volume
+        }
+
+    @staticmethod
+    def _parse_task_id(response):
+        if response.status_code != 200:
+            logger.warning(f"⚠️ TTS错误: {response.status_code}")
+            return None
+
+        result = response.json()
+        data = result.get('data')
+        if not data or not isinstance(data, dict):
+            return None
+
+        return data.get('task_id')
+
     @staticmethod
     def is_task_running(task_id):
         """检查任务是否正在运行 (非阻塞)"""
         if not task_id:
             return False
-            
+
         try:
-            response = requests.get(TTS_MONITOR_URL, timeout=0.5)
-            if response.status_code == 200:
-                data = response.json()
-                active_task = data.get('active_task')
-                waiting_list = data.get('waiting_list', [])
-                
-                if active_task and active_task.get('id') == task_id:
-                    return True
-                
-                for t in waiting_list:
-                    if t.get('id') == task_id:
-                        return True
-                
-                return False
+            response = request("GET", MONITOR)
+            return TTSClient._task_in_monitor(response, task_id)
+        except:
+            pass
+        return False
+
+    @staticmethod
+    async def is_task_running_async(task_id):
+        """is_task_running 的协程版本"""
+        if not task_id:
+            return False
+
+        try:
+            response = await arequest("GET", MONITOR)
+            return TTSClient._task_in_monitor(response, task_id)
         except:
             pass
         return False
 
+    @staticmethod
+    def _task_in_monitor(response, task_id):
+        if response.status_code == 200:
+            data = response.json()
+            active_task = data.get('active_task')
+            waiting_list = data.get('waiting_list', [])
+
+            if active_task and active_task.get('id') == task_id:
+                return True
+
+            for t in waiting_list:
+                if t.get('id') == task_id:
+                    return True
+
+        return False
+
+    # 播放完成检测: 优先使用服务端长轮询 (/monitor/wait)，不支持时回退为自适应轮询 /monitor
+    LONG_POLL_TIMEOUT = 10.0  # 单次长轮询的最长等待 (秒)
+    _long_poll_supported = None  # None: 尚未探测
+
     @staticmethod
     def _wait_for_completion(task_id, timeout=120):
         """等待任务完成 (基于任务不在活动与队列中)"""
-        start_time = time.time()
-        check_interval = 0.05 # ⚡ 优化: 缩短轮询间隔，提高响应速度 (原0.2s)
-        task_seen = False
-        stable_checks = 0
-        REQUIRED_STABLE_CHECKS = 5  # 增加到 5 次 (1秒)，防止任务在网关转发间隙“闪烁”导致误判
-        
-        # 新增: 等待任务出现的最大时间。如果超过此时间任务仍未出现，假定任务已完成(过快)或失败
-        MAX_STARTUP_WAIT = 5.0 
-        
-        while time.time() - start_time < timeout:
+        deadline = time.time() + timeout
+        if TTSClient._long_poll_supported is not False:
+            done = TTSClient._long_poll(task_id, deadline)
+            if done is not None:
+                return done
+
+        poller = CompletionPoller()
+        while time.time() < deadline:
             try:
                 # 复用 is_task_running 判断任务是否存在
-                if TTSClient.is_task_running(task_id):
-                    task_seen = True
-                    stable_checks = 0
-                else:
-                    if task_seen:
-                        stable_checks += 1
-                        if stable_checks >= REQUIRED_STABLE_CHECKS:
-                            return True
-                    elif time.time() - start_time > MAX_STARTUP_WAIT:
-                        # 任务长时间未出现，假定已结束
-                        return True
+                done, delay = poller.update(TTSClient.is_task_running(task_id))
+                if done:
+                    return True
+            except:
+                delay = CompletionPoller.MIN_INTERVAL
+            time.sleep(delay)
+        return False
+
+    @staticmethod
+    async def _wait_for_completion_async(task_id, timeout=120):
+        """_wait_for_completion 的协程版本"""
+        deadline = time.time() + timeout
+        if TTSClient._long_poll_supported is not False:
+            done = await TTSClient._long_poll_async(task_id, deadline)
+            if done is not None:
+                return done
+
+        poller = CompletionPoller()
+        while time.time() < deadline:
+            try:
+                done, delay = poller.update(await TTSClient.is_task_running_async(task_id))
+                if done:
+                    return True
             except:
-                pass
-            time.sleep(check_interval)
+                delay = CompletionPoller.MIN_INTERVAL
+            await asyncio.sleep(delay)
         return False
 
+    @staticmethod
+    def _long_poll(task_id, deadline):
+        """长轮询直到任务结束，返回 None 表示服务端不支持或出错，需要回退为轮询"""
+        while True:
+            wait = min(TTSClient.LONG_POLL_TIMEOUT, deadline - time.time())
+            if wait <= 0:
+                return False
+            try:
+                response = request(
+                    "GET", TASK_WAIT, params={"task_id": task_id, "timeout": wait},
+                    timeout=wait + TASK_WAIT.timeout,
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ 长轮询失败，改用轮询: {e}")
+                return None
+            done = TTSClient._parse_long_poll(response)
+            if done is not False:
+                return done
+
+    @staticmethod
+    async def _long_poll_async(task_id, deadline):
+        """_long_poll 的协程版本"""
+        while True:
+            wait = min(TTSClient.LONG_POLL_TIMEOUT, deadline - time.time())
+            if wait <= 0:
+                return False
+            try:
+                response = await arequest(
+                    "GET", TASK_WAIT, params={"task_id": task_id, "timeout": wait},
+                    timeout=wait + TASK_WAIT.timeout,
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ 长轮询失败，改用轮询: {e}")
+                return None
+            done = TTSClient._parse_long_poll(response)
+            if done is not False:
+                return done
+
+    @staticmethod
+    def _parse_long_poll(response):
+        """返回 True 任务已结束，False 需要继续等待，None 需要回退为轮询"""
+        if response.status_code in (404, 405):
+            if TTSClient._long_poll_supported is not False:
+                logger.info("ℹ️ TTS 服务不支持长轮询 (/monitor/wait)，改用轮询")
+            TTSClient._long_poll_supported = False
+            return None
+        if response.status_code != 200:
+            logger.warning(f"⚠️ 长轮询请求失败: HTTP {response.status_code}")
+            return None
+        TTSClient._long_poll_supported = True
+        return bool(response.json().get("done", False))
+
     @staticmethod
     def check_exclusive_ownership():
         """检查是否仍持有独占权"""
         try:
-            response = requests.get(TTS_MONITOR_URL, timeout=0.5)
-            if response.status_code == 200:
-                data = response.json()
-                exclusive_mode = data.get("exclusive_mode", {})
-                current_source = exclusive_mode.get("source")
-                
-                if current_source == TTSClient.DEFAULT_SOURCE:
-                    return True
-                else:
-                    return False
+            response = request("GET", MONITOR)
+            return TTSClient._check_ownership(response)
+        except:
+            pass
+        return False
+
+    @staticmethod
+    async def check_exclusive_ownership_async():
+        """check_exclusive_ownership 的协程版本"""
+        try:
+            response = await arequest("GET", MONITOR)
+            return TTSClient._check_ownership(response)
         except:
             pass
         return False
+
+    @staticmethod
+    def _check_ownership(response):
+        if response.status_code == 200:
+            data = response.json()
+            exclusive_mode = data.get("exclusive_mode", {})
+            current_source = exclusive_mode.get("source")
+
+            if current_source == TTSClient.DEFAULT_SOURCE:
+                return True
+            else:
+                return False
+        return False
+
+
+class SpeechQueue:
+    """
+    句子级流水线播报
+
+    回答的句子陆续到达时立即提交 TTS，不必等完整回答；服务端最多同时排队 MAX_PENDING 个任务，
+    打断时 cancel() 丢弃尚未提交的句子，并逐个停止已提交的任务
+    """
+    MAX_PENDING = 2
+    CANCEL_WAIT = 1.0     # 停止一个任务后等待其结束的最长时间 (秒)
+    CANCEL_ATTEMPTS = 3
+
+    def __init__(self, source=None, volume=100):
+        self.source = source or TTSClient.DEFAULT_SOURCE
+        self.volume = volume
+        self.task_ids = []
+        self._sentences = queue.Queue()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def put(self, text):
+        """提交一句 (非阻塞)"""
+        if text and not self.cancelled:
+            self._sentences.put(text)
+
+    def close(self):
+        """没有更多句子了"""
+        self._sentences.put(None)
+
+    def wait(self, timeout=None) -> bool:
+        """等待全部句子播报完成或取消完成"""
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """打断: 不再提交新句子，并停止正在播放的任务"""
+        if self.cancelled:
+            return
+        self._cancelled.set()
+        self._sentences.put(None)  # 唤醒等待句子的工作线程
+        TTSClient.stop_current_playback(self.source)
+
+    def _run(self):
+        pending = []  # 已提交、未播完的任务，按播放顺序
+        try:
+            while not self.cancelled:
+                text = self._sentences.get()
+                if text is None:
+                    break
+                while len(pending) >= self.MAX_PENDING and not self.cancelled:
+                    begin = time.perf_counter()
+                    TTSClient._wait_for_completion(pending.pop(0))
+                    TTS_WAIT.since(begin)
+                if self.cancelled:
+                    break
+                task_id = TTSClient.speak(text, self.volume, wait=False, source=self.source)
+                if task_id:
+                    pending.append(task_id)
+                    self.task_ids.append(task_id)
+
+            while pending and not self.cancelled:
+                begin = time.perf_counter()
+                TTSClient._wait_for_completion(pending[0])
+                TTS_WAIT.since(begin)
+                pending.pop(0)
+
+            if self.cancelled:
+                # stop_current_playback 只停止当前任务，排队的任务需要逐个停止
+                for task_id in pending:
+                    for _ in range(self.CANCEL_ATTEMPTS):
+                        if not TTSClient.is_task_running(task_id):
+                            break
+                        TTSClient.stop_current_playback(self.source)
+                        TTSClient._wait_for_completion(task_id, timeout=self.CANCEL_WAIT)
+        except Exception as e:
+            logger.error(f"❌ 流水线播报异常: {e}")
+        finally:
+            self._done.set()
@@ -1,11 +1,14 @@
 import time
+import json
+import asyncio
 import logging
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from asr.common import setup_logger
+from asr.common import setup_logger, metrics
 from asr.interaction.utils.buffer import recognition_buffer
-from asr.interaction.context import get_system
+from asr.interaction.context import get_system, get_systems
 
 # 配置日志
 logger = setup_logger("api_server")
@@ -15,6 +18,7 @@ api_app = FastAPI(title="Interaction Recognition API")
 class RecognitionRequest(BaseModel):
     duration: float = 5.0
     since_time: float = None # 🆕 支持指定起始时间戳
+    channel: str = None      # 多麦克风时的通道名，不指定为默认通道
 
 class RecognitionResponse(BaseModel):
     text: str
@@ -23,11 +27,21 @@ class RecognitionResponse(BaseModel):
 
 class PauseRequest(BaseModel):
     source: str = "api"
+    channel: str = None
 
 class PauseResponse(BaseModel):
     success: bool
     message: str
 
+def get_buffer(channel: str = None):
+    """通道对应的识别结果缓冲区，未指定通道时为默认通道"""
+    system = get_system(channel)
+    if system is None:
+        if channel is None:
+            return recognition_buffer  # 系统尚未初始化
+        raise KeyError(f"Unknown channel: {channel}")
+    return system.buffer
+
 @api_app.post("/listen_recent", response_model=RecognitionResponse)
 async def listen_recent(request: RecognitionRequest):
     """
@@ -38,7 +52,7 @@ async def listen_recent(request: RecognitionRequest):
     try:
         # 强制 clear=False, 避免影响主流程
         # 如果 request.since_time 存在，则忽略 duration，返回该时间点之后的内容
-        text = recognition_buffer.get_recent(
+        text = get_buffer(request.channel).get_recent(
             duration=request.duration, 
             start_time=request.since_time   
         )
@@ -47,41 +61,99 @@ async def listen_recent(request: RecognitionRequest):
         return RecognitionResponse(text="", success=False, error=str(e))
 
 
-@api_app.get("/status")
-def get_status():
-    system = get_system()
-    status = {
-        "buffer_active": recognition_buffer.is_active,
+@api_app.get("/transcripts/stream")
+async def stream_transcripts(request: Request, since_time: float = None, channel: str = None):
+    """
+    识别结果推送接口 (SSE):
+    每次中间结果更新推送一条 partial 事件，VAD 判定一句结束时推送 final 事件。
+    同一句 (id 相同) 的新事件覆盖旧的；指定 since_time 时先补发该时间点之后已有的句子，
+    且只保留该时间点之后的文本。
+    """
+    try:
+        buffer = get_buffer(channel)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def on_update(utterance):
+        # 在音频线程中调用，转交给事件循环
+        loop.call_soon_threadsafe(queue.put_nowait, utterance.to_event(since_time))
+
+    # 先订阅再补发，补发与推送重复的事件按 id 覆盖即可
+    buffer.subscribe(on_update)
+
+    async def events():
+        try:
+            if since_time is not None:
+                for utterance in buffer.get_utterances(since_time):
+                    queue.put_nowait(utterance.to_event(since_time))
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            buffer.unsubscribe(on_update)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def channel_status(system) -> dict:
+    return {
+        "buffer_active": system.buffer.is_active if system else recognition_buffer.is_active,
         "system_state": system.state if system else "unknown",
         "wake_paused": system.wake_detection_paused if system else False,
-        "pause_source": system.pause_source if system else None
+        "pause_source": system.pause_source if system else None,
+        "audio": system.capture.stats() if system and system.capture else None
     }
+
+@api_app.get("/status")
+def get_status(channel: str = None):
+    """系统状态: 指定 channel 时返回该通道，否则返回默认通道，多麦克风时附带全部通道"""
+    if channel is not None:
+        system = get_system(channel)
+        if system is None:
+            return {"error": f"Unknown channel: {channel}"}
+        return channel_status(system)
+
+    status = channel_status(get_system())
+    systems = get_systems()
+    if len(systems) > 1:
+        status["channels"] = {name: channel_status(s) for name, s in systems.items()}
     return status
 
+@api_app.get("/metrics")
+def get_metrics():
+    """各阶段耗时直方图和计数器 (Prometheus 文本格式)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @api_app.post("/wake/pause", response_model=PauseResponse)
 async def pause_wake_detection(request: PauseRequest):
     """暂停唤醒词检测"""
-    system = get_system()
+    system = get_system(request.channel)
     if not system:
-        return PauseResponse(success=False, message="System not initialized")
+        return PauseResponse(success=False, message=f"Unknown channel: {request.channel}" if request.channel else "System not initialized")
     
     success = system.pause_wake_detection(request.source)
     msg = "Wake detection paused" if success else f"Failed to pause (already paused by {system.pause_source})"
     
-    logger.info(f"⏸️ 唤醒暂停请求 ({request.source}): {'成功' if success else '失败'}")
+    logger.info(f"⏸️ 唤醒暂停请求 ({system.channel}/{request.source}): {'成功' if success else '失败'}")
     return PauseResponse(success=success, message=msg)
 
 @api_app.post("/wake/resume", response_model=PauseResponse)
 async def resume_wake_detection(request: PauseRequest):
     """恢复唤醒词检测"""
-    system = get_system()
+    system = get_system(request.channel)
     if not system:
-        return PauseResponse(success=False, message="System not initialized")
+        return PauseResponse(success=False, message=f"Unknown channel: {request.channel}" if request.channel else "System not initialized")
         
     success = system.resume_wake_detection(request.source)
     msg = "Wake detection resumed" if success else f"Failed to resume (locked by {system.pause_source})"
     
-    logger.info(f"▶️ 唤醒恢复请求 ({request.source}): {'成功' if success else '失败'}")
+    logger.info(f"▶️ 唤醒恢复请求 ({system.channel}/{request.source}): {'成功' if success else '失败'}")
     return PauseResponse(success=success, message=msg)
 
 def run_api_server():
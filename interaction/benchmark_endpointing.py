@@ -0,0 +1,172 @@
+"""
+说话结束判定基准测试: 按 InteractionSystem.run 的节奏 (每 100 ms 一帧) 回放 VAD 与识别事件，
+测量从用户说完最后一个字到发出 Agent 请求的延迟
+
+- polling:  原先的 _process_one_turn，每 100 ms 检查 is_speech_active，VAD 结束后再等 1.0 s 静音
+- endpoint: Endpointer 事件驱动，VAD 结束事件 (最终结果已写入) 到达即判定
+
+VAD 按 min_silence_duration_ms=1000 模拟: 停顿不少于 1 s 时在说完 1 s 后给出结束事件，
+更短的停顿并入同一句。--script 可以指定回放脚本 (jsonl，每行一轮: [[说话秒数, 停顿秒数], ...])。
+
+```bash
+python interaction/benchmark_endpointing.py --turns 2
+```
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from asr.interaction.utils.endpoint import Endpointer
+
+CHUNK = 0.1           # 与 InteractionSystem.run 一致，每次读取 100 ms
+VAD_SILENCE = 1.0     # VADIterator(min_silence_duration_ms=1000)
+TEXT_INTERVAL = 0.3   # 识别中间结果的更新间隔
+LEAD = 0.5            # 每轮开始后用户开口前的时间
+MAX_TURN_DURATION = 20.0
+# 默认回放脚本: 一句短指令、中途停顿 0.6 s 的一句、两句之间停顿 1.3 s、一段长句
+SCRIPT = [
+    [[1.5, 0.0]],
+    [[1.2, 0.6], [1.0, 0.0]],
+    [[1.4, 1.3], [1.6, 0.0]],
+    [[5.0, 0.0]],
+]
+
+
+class ReplayState:
+    """音频线程写、交互线程读的共享状态 (对应 InteractionSystem 的相关属性)"""
+
+    def __init__(self, endpointer: Endpointer = None):
+        self.is_speech_active = False
+        self.endpointer = endpointer
+        self.texts = []              # 各句的识别结果 (对应 recognition_buffer)
+        self.speech_end_time = None  # 最后一个字说完的时刻
+        self.vad_end_time = None     # 最后一次 VAD 结束事件的时刻
+        self.segments = 0            # 本轮的 VAD 片段数
+        self.done = threading.Event()
+
+
+def play(state: ReplayState, turn: list, begin: float):
+    """音频线程: 按帧推进，在帧边界上产生 VAD / 识别事件"""
+    # 合并短于 VAD 静音时长的停顿，得到 VAD 片段 (起点, 说完, 结束事件)
+    segments, t = [], LEAD
+    for speech, pause in turn:
+        if segments and segments[-1][1] + VAD_SILENCE > t:
+            segments[-1][1] = t + speech
+        else:
+            segments.append([t, t + speech])
+        t += speech + pause
+    state.segments = len(segments)
+    events = []
+    for i, (start, end) in enumerate(segments):
+        events.append((start, "start", i))
+        events.extend((x, "text", i) for x in np.arange(start + TEXT_INTERVAL, end, TEXT_INTERVAL))
+        events.append((end + VAD_SILENCE, "end", i))
+    events.sort()
+
+    endpointer = state.endpointer
+    frame = 0
+    while events and not state.done.is_set():
+        frame += 1
+        now = begin + frame * CHUNK
+        time.sleep(max(0.0, now - time.monotonic()))
+        while events and begin + events[0][0] <= now:
+            _, kind, i = events.pop(0)
+            if kind == "start":
+                state.is_speech_active = True
+                state.texts.append("")
+                if endpointer:
+                    endpointer.on_speech_start()
+            elif kind == "text":
+                state.texts[i] += "字字"
+                if endpointer:
+                    endpointer.on_text(state.texts[i])
+            else:
+                state.is_speech_active = False
+                state.texts[i] += "。"
+                state.speech_end_time = begin + segments[i][1]
+                state.vad_end_time = time.monotonic()
+                if endpointer:
+                    endpointer.on_speech_end()
+
+
+def polling_turn(state: ReplayState) -> str:
+    """原先的实现 (_process_one_turn 的等待部分)"""
+    listen_duration = 8.0
+    silence_timeout = 1.0
+    start_time = time.time()
+    last_speech_end = time.time()
+    has_spoken = False
+    while time.time() - start_time < listen_duration:
+        if has_spoken and (time.time() - last_speech_end > silence_timeout):
+            break
+        if state.is_speech_active:
+            has_spoken = True
+            last_speech_end = time.time()
+            if time.time() - start_time > listen_duration - 2.0:
+                if listen_duration < MAX_TURN_DURATION:
+                    listen_duration = min(listen_duration + 1.0, MAX_TURN_DURATION)
+                else:
+                    break
+        time.sleep(0.1)
+    return " ".join(state.texts)
+
+
+def endpoint_turn(state: ReplayState) -> str:
+    state.endpointer.wait()
+    return " ".join(state.texts)
+
+
+def replay(turn: list, name: str, trailing_silence: float = 0.0):
+    endpointer = None
+    if name == "endpoint":
+        endpointer = Endpointer(trailing_silence=trailing_silence, max_turn=MAX_TURN_DURATION)
+        endpointer.start()
+    state = ReplayState(endpointer)
+    begin = time.monotonic()
+    audio = threading.Thread(target=play, args=(state, turn, begin), daemon=True)
+    audio.start()
+    query = polling_turn(state) if name == "polling" else endpoint_turn(state)
+    request_time = time.monotonic()
+    state.done.set()
+    audio.join()
+    # 请求应包含本轮的全部句子，否则后面的句子被截断到下一轮
+    complete = query.count("。") == state.segments
+    return request_time - state.speech_end_time, request_time - state.vad_end_time, complete
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--script", help="回放脚本 (jsonl)")
+    parser.add_argument("--turns", type=int, default=2, help="每个脚本回放次数")
+    parser.add_argument("--trailing-silence", type=float, default=0.0, help="Endpointer 在 VAD 结束后再等待的静音 (秒)")
+    args = parser.parse_args()
+
+    script = SCRIPT
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = [json.loads(line) for line in f if line.strip()]
+
+    for name in ("polling", "endpoint"):
+        results, incomplete = [], 0
+        for _ in range(args.turns):
+            for turn in script:
+                from_speech, from_vad, complete = replay(turn, name, args.trailing_silence)
+                results.append((from_speech, from_vad))
+                incomplete += not complete
+        results = np.array(results) * 1000
+        print(f"{name:>9}: end of speech -> request p50 {np.median(results[:, 0]):7.1f} ms, "
+              f"max {results[:, 0].max():7.1f} ms; VAD end -> request p50 {np.median(results[:, 1]):6.1f} ms, "
+              f"max {results[:, 1].max():6.1f} ms; {incomplete} truncated")
+
+
+if __name__ == "__main__":
+    main()
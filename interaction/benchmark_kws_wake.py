@@ -0,0 +1,163 @@
+"""
+唤醒流程基准测试: 回放一组录音，比较两种等待唤醒流程的 CPU 占用和误唤醒 / 漏唤醒
+
+- sensevoice: 原先的流程，SenseVoice 识别全部语音后匹配唤醒词
+- kws:        两级流程，KWS 命中后由 SenseVoice 从句首补算并确认
+
+positive 目录下每条录音含一次唤醒词，negative 目录下为不含唤醒词的环境语音 (闲聊、电视等)。
+空闲 CPU 以 negative 集上处理单位时长音频所用的 CPU 时间计 (100% = 一个核心)。
+
+```bash
+python interaction/benchmark_kws_wake.py --positive data/wake/pos --negative data/wake/neg \\
+    --kws-model iic/speech_charctc_kws_phone-xiaoyun
+```
+"""
+import sys
+import os
+import time
+import argparse
+import importlib.util
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+os.environ['MODELSCOPE_OFFLINE'] = '1'
+
+# 修复 pysilero 路径问题 (同 interaction.py)
+try:
+    spec = importlib.util.find_spec("pysilero")
+    if spec and spec.submodule_search_locations:
+        pkg_path = spec.submodule_search_locations[0]
+        if pkg_path not in sys.path:
+            sys.path.insert(0, pkg_path)
+except Exception:
+    pass
+
+import numpy as np
+import soundfile as sf
+import torch
+from scipy import signal
+from pysilero import VADIterator
+from asr.streaming_sensevoice_master.streaming_sensevoice import StreamingSenseVoice
+from asr.interaction.utils.kws import KeywordSpotter, DEFAULT_KWS_MODEL
+from asr.interaction.utils.wake_word import WakeWordMatcher
+
+SAMPLE_RATE = 16000
+CHUNK = int(0.1 * SAMPLE_RATE)  # 与 InteractionSystem.run 一致，每次读取 100 ms
+
+
+def load_audio(path: Path) -> np.ndarray:
+    audio, sr = sf.read(str(path), dtype="float32", always_2d=True)
+    audio = audio[:, 0]
+    if sr != SAMPLE_RATE:
+        audio = signal.resample_poly(audio, SAMPLE_RATE, sr).astype(np.float32)
+    return audio
+
+
+def list_audio(directory: str) -> list:
+    if not directory:
+        return []
+    return sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in (".wav", ".flac"))
+
+
+class WakePipeline:
+    """按 InteractionSystem.run 的等待唤醒逻辑回放一条录音，返回唤醒次数"""
+
+    def __init__(self, model, wake_word: str, kws: KeywordSpotter = None):
+        self.model = model
+        self.wake_matcher = WakeWordMatcher([wake_word])
+        self.kws = kws
+        self.kws_hits = 0
+
+    def run(self, audio: np.ndarray) -> int:
+        vad = VADIterator(min_silence_duration_ms=1000, speech_pad_ms=100)
+        self.model.reset()
+        wakes = 0
+        asr_active = True
+        woke = False  # 本句已唤醒，后续音频不再检测
+        for offset in range(0, len(audio), CHUNK):
+            for speech_dict, speech_samples in vad(audio[offset:offset + CHUNK]):
+                is_final = "end" in speech_dict
+                if "start" in speech_dict:
+                    woke = False
+                    self.model.reset()
+                    if self.kws:
+                        self.kws.reset()
+                        asr_active = False
+
+                if woke:
+                    continue
+                if not asr_active:
+                    hit = self.kws.feed(speech_samples, is_final)
+                    if hit is None:
+                        continue
+                    self.kws_hits += 1
+                    asr_active = True
+                    speech_samples = self.kws.segment
+
+                for res in self.model.streaming_inference(speech_samples * 32768, is_final):
+                    text = res.get("text", "")
+                    if text and self.wake_matcher.update(text):
+                        wakes += 1
+                        woke = True
+                        break
+                if is_final:
+                    self.model.reset()
+        return wakes
+
+
+def evaluate(name: str, pipeline: WakePipeline, positives: list, negatives: list):
+    missed = 0
+    for audio in positives:
+        if pipeline.run(audio) == 0:
+            missed += 1
+
+    false_wakes, negative_seconds = 0, 0.0
+    cpu_begin, wall_begin = time.process_time(), time.perf_counter()
+    for audio in negatives:
+        negative_seconds += len(audio) / SAMPLE_RATE
+        false_wakes += pipeline.run(audio)
+    cpu = time.process_time() - cpu_begin
+    wall = time.perf_counter() - wall_begin
+
+    line = f"{name:>10}:"
+    if positives:
+        line += f" FR {missed}/{len(positives)} ({missed / len(positives):.1%}),"
+    if negatives:
+        hours = negative_seconds / 3600
+        line += (f" FA {false_wakes} ({false_wakes / hours:.2f}/h),"
+                 f" idle CPU {cpu / negative_seconds:.1%}, RTF {wall / negative_seconds:.3f}")
+    if pipeline.kws:
+        line += f", KWS hits {pipeline.kws_hits}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positive", help="含唤醒词的录音目录")
+    parser.add_argument("--negative", help="不含唤醒词的录音目录")
+    parser.add_argument("--wake-word", default="小安")
+    parser.add_argument("--model", default="iic/SenseVoiceSmall")
+    parser.add_argument("--kws-model", default=DEFAULT_KWS_MODEL)
+    parser.add_argument("--kws-threshold", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=1, help="torch 线程数")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    positives = [load_audio(p) for p in list_audio(args.positive)]
+    negatives = [load_audio(p) for p in list_audio(args.negative)]
+    print(f"positive: {len(positives)} files, negative: "
+          f"{sum(len(a) for a in negatives) / SAMPLE_RATE / 60:.1f} min")
+
+    model = StreamingSenseVoice(contexts=[args.wake_word, "变"], model=args.model, device="cpu")
+    kws = KeywordSpotter(args.wake_word, model=args.kws_model, threshold=args.kws_threshold)
+
+    evaluate("sensevoice", WakePipeline(model, args.wake_word), positives, negatives)
+    evaluate("kws", WakePipeline(model, args.wake_word, kws), positives, negatives)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+流式回答基准测试: 对本地 Agent / TTS 桩服务比较首句出声时间 (time to first audio)
+
+- blocking:  原先的流程，等待完整回答 -> 整段规范化 -> 一次 speak(wait=True)
+- streaming: 流式获取回答，流式规范化后逐句提交 SpeechQueue 流水线播报
+- barge-in:  全部句子已提交后打断，检查已在服务端排队的句子是否全部停止
+
+首句出声时间 = 桩服务中第一个播报任务开始播放的时间 - 发出问题的时间
+
+```bash
+python interaction/benchmark_streaming_reply.py --turns 5 --chat-ms 800 --token-ms 40
+```
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from asr.common import TTSClient, AgentClient, SpeechQueue
+from asr.common.stub_server import start_stub_server
+from asr.common.benchmark_http_pool import point_to
+from asr.interaction.utils.text_preprocess import process_agent_response, StreamingNormalizer, SentenceSplitter
+
+REPLY = (
+    "根据查询结果，今天负载率最高的变电站有两个。\n"
+    "1. 变电站名称：孙岗变，最大负载率为83.7252%，发生在2026-01-06 10:54:47。\n"
+    "2. 变电站名称：鹤岗变，最大负载率为83.1157%，发生在2026-01-06 11:24:47。\n"
+    "其中#2主变最大负荷为26.0337MW，额定容量为31.5MVA，建议关注。请问还需要查询其他设备吗？"
+)
+
+
+def blocking_turn(agent, state):
+    begin = time.time()
+    response = process_agent_response(agent.chat("今天哪个变电站负载最高"))
+    task_id = TTSClient.speak(response, wait=True)
+    return state.begin_times[task_id] - begin, time.time() - begin
+
+
+def streaming_turn(agent, state):
+    begin = time.time()
+    speech = SpeechQueue()
+    normalizer = StreamingNormalizer()
+    splitter = SentenceSplitter()
+
+    def submit(sentence):
+        sentence = sentence.strip()
+        if sentence:
+            speech.put(sentence)
+
+    for delta in agent.chat_stream("今天哪个变电站负载最高"):
+        for sentence in splitter.feed(normalizer.feed(delta)):
+            submit(sentence)
+    for sentence in splitter.feed(normalizer.flush()):
+        submit(sentence)
+    submit(splitter.flush())
+    speech.close()
+    speech.wait()
+    return state.begin_times[speech.task_ids[0]] - begin, time.time() - begin
+
+
+def barge_in_turn(state):
+    speech = SpeechQueue()
+    splitter = SentenceSplitter()
+    for sentence in splitter.feed(REPLY) + [splitter.flush()]:
+        speech.put(process_agent_response(sentence).strip())
+    speech.close()
+    # 第一句开始播放 100 ms 后打断
+    while len(speech.task_ids) < SpeechQueue.MAX_PENDING:
+        time.sleep(0.005)
+    while time.time() < state.begin_times[speech.task_ids[0]] + 0.1:
+        time.sleep(0.005)
+    begin = time.time()
+    speech.cancel()
+    speech.wait()
+    return speech, time.time() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--chat-ms", type=float, default=800.0, help="Agent 首个 token 的延迟")
+    parser.add_argument("--token-ms", type=float, default=40.0, help="之后每段 (2 个字) 的间隔")
+    parser.add_argument("--synth-ms-per-char", type=float, default=8.0, help="TTS 每字合成耗时")
+    parser.add_argument("--play-ms-per-char", type=float, default=25.0, help="每字播放时长 (缩短以加快测试)")
+    args = parser.parse_args()
+
+    _, state, base_url = start_stub_server(
+        chat_ms=args.chat_ms, token_ms=args.token_ms, synth_ms_per_char=args.synth_ms_per_char,
+        play_ms_per_char=args.play_ms_per_char, reply=REPLY,
+    )
+    point_to(base_url)
+    agent = AgentClient()
+
+    for name, run in (("blocking", lambda: blocking_turn(agent, state)),
+                      ("streaming", lambda: streaming_turn(agent, state))):
+        results = np.array([run() for _ in range(args.turns)]) * 1000
+        print(f"{name:>10}: first audio p50 {np.median(results[:, 0]):7.1f} ms, "
+              f"turn p50 {np.median(results[:, 1]):7.1f} ms")
+
+    speech, elapsed = barge_in_turn(state)
+    still_playing = [t for t in speech.task_ids if state.end_times[t] > time.time()]
+    print(f"{'barge-in':>10}: {len(speech.task_ids)} sentences submitted, "
+          f"{len(still_playing)} still playing after cancel, cancel took {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+文本规范化基准测试: 在一组 Agent 回答上比较规范化吞吐量
+
+- legacy:    原先的实现，完整回答上依次执行 7 次 re.sub
+- single:    StreamingNormalizer.normalize()，合并后的正则单次扫描
+- streaming: StreamingNormalizer.feed() 按流式增量 (默认 2 个字) 逐段输入
+
+同时检查三种方式在语料上的输出是否一致。
+--corpus 可以指定真实回答语料 (jsonl，每行为字符串或含 "text" / "answer" 字段的对象)，
+未指定时按常见的查询回答模板生成。
+
+```bash
+python interaction/benchmark_text_normalizer.py --replies 2000 --chunk 2
+python interaction/benchmark_text_normalizer.py --corpus data/agent_replies.jsonl
+```
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from asr.interaction.utils.text_preprocess import StreamingNormalizer
+
+STATIONS = ["孙岗变", "鹤岗变", "东津变", "樊城变", "襄州变", "宜城变", "谷城变", "老河口变", "枣阳变", "南漳变"]
+TEMPLATES = [
+    "根据查询结果，今天负载率最高的变电站有{n}个。\n{items}\n请问还需要查询其他设备吗？",
+    "{station}当前运行正常。\n- 设备名称：#{no}主变\n- 当前负荷：{load}MW\n- 额定容量：{cap} MVA\n- 数据时间：{datetime}",
+    "已为您查询到{station}的告警记录，最近一次告警发生在{datetime}，告警设备为WXH-813A保护装置，已于{time}复归。",
+    "{station}#{no}主变在{date}的最大负荷为{load}mw，出现在{time}，负载率为{rate}%。",
+]
+ITEM = "{i}. 变电站名称：{station}，最大负载率为{rate}%，发生在{datetime}。"
+
+
+def legacy_process_agent_response(text):
+    """原先的实现 (逐条 re.sub)"""
+    if not text:
+        return text
+    text = re.sub(r'#(\d+)主变', r'\1号主变', text)
+
+    def replace_datetime(match):
+        year, month, day, hour, minute, second = match.groups()
+        return f"{year}年{int(month)}月{int(day)}日{int(hour)}点{int(minute)}分{int(second)}秒"
+    text = re.sub(r'(\d{4})-(\d{1,2})-(\d{1,2})[\sT]+(\d{1,2})[:：](\d{1,2})[:：](\d{1,2})', replace_datetime, text)
+
+    def replace_date(match):
+        year, month, day = match.groups()
+        return f"{year}年{int(month)}月{int(day)}日"
+    text = re.sub(r'(\d{4})-(\d{1,2})-(\d{1,2})', replace_date, text)
+
+    def replace_time(match):
+        hour, minute, second = match.groups()
+        return f"{int(hour)}点{int(minute)}分{int(second)}秒"
+    text = re.sub(r'(?<!\d)(\d{1,2})[:：](\d{1,2})[:：](\d{1,2})(?!\d)', replace_time, text)
+
+    text = re.sub(r'(^|\n)\s*-\s+', r'\1', text)
+    text = re.sub(r'(^|\n)\s*\d+\.\s*', r'\1', text)
+    text = re.sub(r'(?i)(\d+(?:\.\d+)?)\s*(?:MW|MVA)', r'\1兆瓦', text)
+    return text
+
+
+def make_corpus(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+
+    def fields():
+        return {
+            "station": rng.choice(STATIONS),
+            "no": rng.randint(1, 3),
+            "load": f"{rng.uniform(5, 60):.4f}",
+            "cap": rng.choice(["31.5", "50", "63"]),
+            "rate": f"{rng.uniform(30, 95):.4f}",
+            "date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            "datetime": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                        f"{rng.choice([' ', 'T'])}{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+        }
+
+    corpus = []
+    for _ in range(count):
+        n = rng.randint(1, 5)
+        items = "\n".join(ITEM.format(i=i + 1, **fields()) for i in range(n))
+        corpus.append(rng.choice(TEMPLATES).format(n=n, items=items, **fields()))
+    return corpus
+
+
+def load_corpus(path: str) -> list:
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict):
+                item = item.get("text") or item.get("answer") or ""
+            corpus.append(item)
+    return corpus
+
+
+def stream(normalizer: StreamingNormalizer, text: str, chunk: int) -> str:
+    out = [normalizer.feed(text[i:i + chunk]) for i in range(0, len(text), chunk)]
+    out.append(normalizer.flush())
+    return "".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="真实回答语料 (jsonl)")
+    parser.add_argument("--replies", type=int, default=2000, help="未指定语料时生成的回答数")
+    parser.add_argument("--chunk", type=int, default=2, help="流式输入每段的字数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else make_corpus(args.replies)
+    chars = sum(len(t) for t in corpus)
+    normalizer = StreamingNormalizer()
+
+    runs = (
+        ("legacy", lambda: [legacy_process_agent_response(t) for t in corpus]),
+        ("single", lambda: [normalizer.normalize(t) for t in corpus]),
+        ("streaming", lambda: [stream(normalizer, t, args.chunk) for t in corpus]),
+    )
+
+    # 输出一致性检查
+    outputs = {name: run() for name, run in runs}
+    for name in ("single", "streaming"):
+        diff = [i for i, (a, b) in enumerate(zip(outputs["legacy"], outputs[name])) if a != b]
+        print(f"{name:>10}: {len(corpus) - len(diff)}/{len(corpus)} replies identical to legacy")
+        for i in diff[:3]:
+            print(f"    legacy: {outputs['legacy'][i]!r}\n    {name}: {outputs[name][i]!r}")
+
+    for name, run in runs:
+        begin = time.perf_counter()
+        for _ in range(args.repeat):
+            run()
+        elapsed = (time.perf_counter() - begin) / args.repeat
+        print(f"{name:>10}: {len(corpus) / elapsed:9.0f} replies/s, {chars / elapsed / 1e6:6.2f} M chars/s")
+        if name == "legacy":
+            baseline = elapsed
+        else:
+            print(f"{'':>10}  speedup {baseline / elapsed:.2f}x")
+    print(f"{len(corpus)} replies, {chars / len(corpus):.0f} chars/reply, chunk {args.chunk} chars")
+
+
+if __name__ == "__main__":
+    main()
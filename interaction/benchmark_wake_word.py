@@ -0,0 +1,81 @@
+"""
+唤醒词匹配基准测试: 模拟流式识别的中间结果逐字增长，比较每个中间结果的匹配耗时
+
+- check_wake_word: 原先的实现，每个中间结果整段转拼音并逐个唤醒词滑动比较
+- matcher:         WakeWordMatcher 增量匹配，只处理新增的后缀，全部短语一次扫描
+
+```bash
+python interaction/benchmark_wake_word.py --length 200 --phrases 10
+```
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 sys.path
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from pypinyin import lazy_pinyin
+from asr.interaction.utils.wake_word import check_wake_word, WakeWordMatcher
+
+PHRASES = ["小安", "结束对话", "停止交互", "关闭对话", "退出", "再见", "结束", "暂停播放", "音量调大", "音量调小",
+           "打开灯光", "关闭灯光", "下一首", "上一首", "小安同学", "取消", "确认", "返回首页", "打开空调", "关闭空调"]
+TEXT = "今天的天气怎么样明天会不会下雨我们下午三点在会议室讨论一下项目的进展情况顺便把报告整理好发给大家"
+
+
+def make_partials(length: int, seed: int = 0) -> list:
+    """生成逐字增长的中间结果，偶尔修改末尾一个字 (模拟识别结果修正)，最后出现唤醒词"""
+    rng = random.Random(seed)
+    text, partials = "", []
+    while len(text) < length:
+        if text and rng.random() < 0.1:
+            text = text[:-1] + rng.choice(TEXT)
+        else:
+            text += rng.choice(TEXT)
+        partials.append(text)
+    partials.append(text + "小安")
+    return partials
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--length", type=int, default=200, help="中间结果的最终长度 (字)")
+    parser.add_argument("--phrases", type=int, default=10, help="唤醒词 / 指令短语数量")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    phrases = PHRASES[:args.phrases]
+    phrases_pinyin = [lazy_pinyin(p) for p in phrases]
+    partials = make_partials(args.length)
+
+    def run_check():
+        return [[p for p, py in zip(phrases, phrases_pinyin) if check_wake_word(text, p, py)]
+                for text in partials]
+
+    matcher = WakeWordMatcher(phrases)
+
+    def run_matcher():
+        matcher.reset()
+        return [matcher.update(text) for text in partials]
+
+    # 结果一致性检查
+    for old, new in zip(run_check(), run_matcher()):
+        assert set(old) == set(new), (old, new)
+
+    for name, run in (("check_wake_word", run_check), ("matcher", run_matcher)):
+        begin = time.perf_counter()
+        for _ in range(args.repeat):
+            run()
+        elapsed = (time.perf_counter() - begin) / args.repeat / len(partials)
+        print(f"{name:>16}: {elapsed * 1e6:9.1f} us/partial")
+        if name == "check_wake_word":
+            baseline = elapsed
+    print(f"{len(partials)} partials, {len(phrases)} phrases, speedup {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,27 @@ from asr.common import setup_logger
 # 配置日志
 logger = setup_logger("context")
 
+# 单麦克风时的通道名
+DEFAULT_CHANNEL = "default"
+
 # 全局系统实例持有者，用于解决循环引用
 _system_instance = None
+# 多麦克风时各通道的实例: 通道名 -> InteractionSystem
+_systems = {}
 
 def set_system(system):
     global _system_instance
-    _system_instance = system
+    channel = getattr(system, "channel", DEFAULT_CHANNEL)
+    _systems[channel] = system
+    # 未指定通道时使用默认通道，没有默认通道时使用第一个注册的通道
+    if _system_instance is None or channel == DEFAULT_CHANNEL:
+        _system_instance = system
+
+def get_system(channel: str = None):
+    if channel is None:
+        return _system_instance
+    return _systems.get(channel)
 
-def get_system():
-    return _system_instance
\ No newline at end of file
+def get_systems() -> dict:
+    """全部通道的实例"""
+    return dict(_systems)
\ No newline at end of file
@@ -9,12 +9,14 @@ import threading
 from pathlib import Path
 import numpy as np
 import torch
-from asr.common import TTSClient, AgentClient, setup_logger
-from asr.interaction.utils.buffer import recognition_buffer
-from asr.interaction.utils.audio import get_audio_device, get_audio_config, create_input_stream
-from asr.interaction.utils.wake_word import check_wake_word
-from asr.interaction.context import set_system
-from asr.interaction.utils.text_preprocess import process_agent_response
+from asr.common import TTSClient, AgentClient, SpeechQueue, setup_logger, metrics
+from asr.interaction.utils.buffer import RecognitionBuffer, recognition_buffer
+from asr.interaction.utils.audio import get_audio_device, get_audio_config, AudioCapture
+from asr.interaction.utils.wake_word import WakeWordMatcher
+from asr.interaction.utils.kws import KeywordSpotter
+from asr.interaction.utils.endpoint import Endpointer
+from asr.interaction.context import set_system, DEFAULT_CHANNEL
+from asr.interaction.utils.text_preprocess import StreamingNormalizer, SentenceSplitter
 
 # 配置日志
 logger = setup_logger("core")
@@ -23,7 +25,6 @@ logger = setup_logger("core")
 try:
     from asr.streaming_sensevoice_master.streaming_sensevoice import StreamingSenseVoice
     from pysilero import VADIterator
-    from pypinyin import lazy_pinyin
 except ImportError:
     pass # 由主程序处理
 
@@ -36,13 +37,38 @@ class InteractionSystem:
 
     # 配置参数
     MAX_TURN_DURATION = 20.0        # 单轮对话最大时长（秒），防止无限录音
+    NO_SPEECH_TIMEOUT = 8.0         # 每轮开始后无人说话的等待时长（秒）
+    TRAILING_SILENCE = 0.0          # VAD 判定一句结束后再等待的静音（秒），VAD 已等待 min_silence_duration_ms
+    STABLE_TIMEOUT = None           # 说话中识别结果持续不变多久即结束本轮（秒），None 为不启用
+    # 唤醒词检测模型 (fsmn_kws / sanm_kws_streaming)，例如 "iic/speech_charctc_kws_phone-xiaoyun"
+    # 为 None 时等待唤醒阶段直接用 SenseVoice 识别全部语音并匹配唤醒词
+    KWS_MODEL = None
+    KWS_THRESHOLD = 0.0             # KWS 命中得分阈值
+    # 播报中的打断指令及其置信度阈值，直接在 CTC 输出上打分，不做完整解码
+    BARGE_IN_KEYWORDS = {"结束": 0.5}
+
+    def __init__(self, channel: str = DEFAULT_CHANNEL, device_name: str = "Newmine Mic", engine=None):
+        """
+        Args:
+            channel: 通道名，多麦克风时每个麦克风一个通道，接口按通道名区分
+            device_name: 麦克风设备名
+            engine: 多通道共用的 BatchedStreamingEngine，各通道的编码器前向合并为批量执行；
+                    None 时直接在本线程推理
+        """
+        self.channel = channel
+        self.device_name = device_name
+        self.engine = engine
+        # 默认通道沿用全局缓冲区，其他通道的识别结果各自独立
+        self.buffer = recognition_buffer if channel == DEFAULT_CHANNEL else RecognitionBuffer(max_duration=10.0)
+        # TTS 来源标识 (独占模式按来源区分)
+        self.tts_source = "interaction" if channel == DEFAULT_CHANNEL else f"interaction-{channel}"
 
-    def __init__(self):
         # 注册自身到全局上下文
         set_system(self)
         
         self.wake_word = "小安"
-        self.wake_word_pinyin = lazy_pinyin(self.wake_word) if lazy_pinyin else None
+        # 增量匹配: 同一句的中间结果只处理新增部分
+        self.wake_matcher = WakeWordMatcher([self.wake_word])
         
         self.state = self.STATE_WAIT_WAKE
         self.is_running = True
@@ -54,6 +80,10 @@ class InteractionSystem:
         self.is_speech_active = False
         self.last_speech_time = 0
         self.current_text_buffer = ""
+        self.utterance_id = 0           # 当前句子 (VAD 片段) 编号
+        self.utterance_start_time = 0.0
+        self.utterance_start_sample = 0
+        self.asr_active = True          # 当前句是否运行 SenseVoice (启用 KWS 时命中后才运行)
         
         # 1. 初始化模型
         self._init_model()
@@ -67,9 +97,26 @@ class InteractionSystem:
         # 4. 唤醒暂停控制
         self.pause_source = None
         self.pause_lock = threading.Lock()
+
+        # 音频采集 (run 中创建)
+        self.capture = None
+
+        # 当前回答的流水线播报 (打断时取消)
+        self.speech = None
+
+        # 5. 每轮说话结束判定 (由音频线程推送 VAD / 识别事件)
+        self.endpointer = Endpointer(
+            trailing_silence=self.TRAILING_SILENCE,
+            max_turn=self.MAX_TURN_DURATION,
+            no_speech_timeout=self.NO_SPEECH_TIMEOUT,
+            stable_timeout=self.STABLE_TIMEOUT,
+        )
+
+        # 6. 各阶段耗时指标 (/metrics)
+        self._init_metrics()
         
-        print(f"✅ 系统初始化完成 (唤醒词: {self.wake_word})")
-        logger.info(f"✅ 系统初始化完成 (唤醒词: {self.wake_word})")
+        print(f"✅ 系统初始化完成 (通道: {self.channel}, 唤醒词: {self.wake_word})")
+        logger.info(f"✅ 系统初始化完成 (通道: {self.channel}, 唤醒词: {self.wake_word})")
 
 
     def _init_model(self):
@@ -83,13 +130,68 @@ class InteractionSystem:
         logger.info(f"正在加载 StreamingSenseVoice 模型: {model_id}")
         contexts = [self.wake_word, "变"]
         
+        # 模型权重按 (模型, 设备) 在进程内共享，每个通道只持有自己的特征、缓存和解码状态
         self.model = StreamingSenseVoice(
             contexts=contexts,
             model=model_id,
             device=device,
         )
+        self.model.set_keywords(self.BARGE_IN_KEYWORDS)
         logger.info("✅ 模型加载成功")
 
+        self.kws = None
+        if self.KWS_MODEL:
+            logger.info(f"正在加载唤醒词检测模型: {self.KWS_MODEL}")
+            self.kws = KeywordSpotter(
+                self.wake_word, model=self.KWS_MODEL, device=device, threshold=self.KWS_THRESHOLD
+            )
+            logger.info("✅ 唤醒词检测模型加载成功")
+
+    def _init_metrics(self):
+        """创建本通道的指标，热路径只调用 observe() / inc()"""
+        labels = {"channel": self.channel}
+        self.read_wait_time = metrics.histogram(
+            "interaction_audio_read_wait_seconds", "处理线程等待一帧音频的耗时", labels)
+        self.vad_time = metrics.histogram(
+            "interaction_vad_seconds", "每帧 VAD 耗时", labels)
+        self.encoder_time = metrics.histogram(
+            "interaction_encoder_seconds", "每个 chunk 的编码器前向耗时", labels)
+        self.decode_time = metrics.histogram(
+            "interaction_decode_seconds", "每个 chunk 的 CTC 解码 (beam search) 耗时", labels)
+        self.keyword_scan_time = metrics.histogram(
+            "interaction_keyword_scan_seconds", "播报中每段音频的打断指令检测耗时 (编码 + 关键词打分)", labels)
+        self.engine_wait_time = metrics.histogram(
+            "interaction_engine_wait_seconds", "多通道时等待共用引擎完成编码和解码的耗时", labels)
+        self.wake_delay = metrics.histogram(
+            "interaction_wake_delay_seconds", "从 VAD 起点到检测到唤醒词的时长", labels)
+        self.endpoint_delay = metrics.histogram(
+            "interaction_endpoint_seconds", "从识别结果最后一次变化到判定本轮说话结束的时长", labels)
+        self.turns = {
+            reason: metrics.counter("interaction_turns_total", "按结束原因统计的对话轮数", dict(labels, reason=reason))
+            for reason in (Endpointer.SILENCE, Endpointer.STABLE, Endpointer.NO_SPEECH,
+                           Endpointer.MAX_TURN, Endpointer.CANCELLED)
+        }
+        metrics.add_collector(self._collect_metrics)
+
+    def _collect_metrics(self) -> list:
+        """导出音频采集状态"""
+        if self.capture is None:
+            return []
+        stats = self.capture.stats()
+        labels = {"channel": self.channel}
+        return [
+            ("interaction_audio_queue_depth_seconds", "gauge", "采集缓冲区中等待处理的音频时长",
+             labels, stats["queue_depth_ms"] / 1000),
+            ("interaction_audio_overruns_total", "counter", "采集缓冲区满导致音频被丢弃的次数",
+             labels, stats["overruns"]),
+            ("interaction_audio_dropped_samples_total", "counter", "累计丢弃的样本数",
+             labels, stats["dropped_samples"]),
+            ("interaction_audio_underruns_total", "counter", "等待音频超时的次数",
+             labels, stats["underruns"]),
+            ("interaction_audio_input_overflows_total", "counter", "设备驱动报告的输入溢出次数",
+             labels, stats["input_overflows"]),
+        ]
+
     def pause_wake_detection(self, source: str) -> bool:
         """暂停唤醒检测 (带来源记录)"""
         with self.pause_lock:
@@ -146,6 +248,59 @@ class InteractionSystem:
         self.current_text_buffer = ""
         self.is_speech_active = False
 
+    def _bypass_active(self) -> bool:
+        """旁路监听是否在使用识别结果 (外部录音、推送订阅、外部暂停唤醒后使用 Buffer)"""
+        return (
+            self.buffer.is_active
+            or self.buffer.has_subscribers
+            or self.wake_detection_paused
+        )
+
+    def _infer(self, samples, is_last: bool) -> list:
+        """流式识别一段音频，返回各 chunk 的识别结果"""
+        if self.engine is not None:
+            # 提交共用引擎，与其他通道同时到达的 chunk 合并编码
+            begin = time.perf_counter()
+            results = self.engine.submit(self.model, samples, is_last).result()
+            self.engine_wait_time.since(begin)
+            return results
+
+        # 同 StreamingSenseVoice.streaming_inference，分别记录编码和解码耗时
+        results = []
+        for window, cur_size, last_chunk in self.model.get_chunks(samples, is_last):
+            begin = time.perf_counter()
+            probs = self.model.inference(window, cur_size, last_chunk)
+            encoded = time.perf_counter()
+            self.encoder_time.observe(encoded - begin)
+            results.append(self.model.decode_chunk(probs, last_chunk))
+            self.decode_time.since(encoded)
+        return results
+
+    def _run_vad(self, audio_chunk) -> list:
+        """对一帧音频运行 VAD，返回 [(speech_dict, speech_samples), ...]"""
+        begin = time.perf_counter()
+        # VADIterator 逐段产出结果，全部取出后才是本帧完整的 VAD 耗时
+        vad_outs = list(self.vad(audio_chunk))
+        self.vad_time.since(begin)
+        return vad_outs
+
+    def _begin_utterance(self, speech_dict, speech_samples):
+        """VAD 检测到新的一句, 记录起点供识别结果缓冲区使用"""
+        self.utterance_id += 1
+        self.utterance_start_sample = speech_dict["start"]
+        # 起点时返回的样本从 VAD 起点开始, 据此推算起点的时间戳
+        self.utterance_start_time = time.time() - len(speech_samples) / 16000
+
+    def _record_text(self, text: str, res: dict):
+        """记录当前句子的中间结果 (覆盖同一句之前的结果)"""
+        self.buffer.add(
+            text,
+            self.utterance_id,
+            start_time=self.utterance_start_time,
+            start_sample=self.utterance_start_sample,
+            timestamps=res.get("timestamps", ()),
+        )
+
     def handle_wake_up(self):
         """处理唤醒事件"""
         logger.info("💡 触发唤醒逻辑...")
@@ -160,14 +315,14 @@ class InteractionSystem:
         """交互流程执行线程 (支持连续对话)"""
         try:
             # 1. 唤醒后立即申请独占权，直到对话彻底结束才释放
-            TTSClient.set_exclusive_mode(True, allowed_source="interaction")
+            TTSClient.set_exclusive_mode(True, allowed_source=self.tts_source)
             
             # 🆕 重置 Agent 会话 (Session ID)，开启新的对话上下文
             # 这样可以确保每次唤醒都是一次全新的对话，只有在本次连续交互中才保留记忆
             self.agent.reset_session()
             
             # 播放唤醒音效/语音
-            TTSClient.speak("我在", wait=True, source="interaction")
+            TTSClient.speak("我在", wait=True, source=self.tts_source)
             # time.sleep(0.2) # ⚡ 优化: 移除额外等待，加速进入监听状态
             
             # min_silence_duration_ms : 决定了 “等多久才算完”
@@ -196,7 +351,7 @@ class InteractionSystem:
             self.vad = VADIterator(min_silence_duration_ms=1000, speech_pad_ms=100)
             
             # 确保释放独占权
-            TTSClient.set_exclusive_mode(False, allowed_source="interaction")
+            TTSClient.set_exclusive_mode(False, allowed_source=self.tts_source)
             logger.info("💤 回到等待唤醒模式")
 
     def _process_one_turn(self) -> bool:
@@ -208,52 +363,37 @@ class InteractionSystem:
         
         logger.info("\n🎤 请说话...")
         
-        # 录音参数
-        listen_duration = 8.0  # 最大聆听时间
-        silence_timeout = 1.0  # 沉默超时 (VAD已确认静音，应用层无需久等)
-        
-        recognition_buffer.start_recording()
+        self.buffer.start_recording()
+        self.endpointer.start()
         
         final_query = ""
         try:
-            start_time = time.time()
-            last_speech_end = time.time()
-            has_spoken = False
-            
-            while time.time() - start_time < listen_duration:
-                # 检查是否超时（说完后沉默了一段时间）
-                if has_spoken and (time.time() - last_speech_end > silence_timeout):
-                    logger.info("⚡ 说话结束判定")
-                    break
-                
-                # 更新说话状态
-                if self.is_speech_active:
-                    has_spoken = True
-                    last_speech_end = time.time()
-                    # 如果正在说话，延长总聆听时间，但不能超过最大时长
-                    if time.time() - start_time > listen_duration - 2.0:
-                        if listen_duration < self.MAX_TURN_DURATION:
-                            listen_duration = min(listen_duration + 1.0, self.MAX_TURN_DURATION)
-                            logger.debug(f"⏳ 延长聆听时间至: {listen_duration}s")
-                        else:
-                            logger.info("⚡ 达到最大聆听时长，强制结束录音")
-                            break
-                
-                time.sleep(0.1)
+            # 等待结束判定: VAD 结束事件到达 (最终识别结果已写入 Buffer) 即返回，无需轮询
+            reason = self.endpointer.wait()
+            self.turns[reason].inc()
+            if self.endpointer.has_spoken:
+                self.endpoint_delay.observe(self.endpointer.end_time - self.endpointer.text_time)
+            if reason == Endpointer.CANCELLED:
+                return False
+            if reason == Endpointer.MAX_TURN:
+                logger.info("⚡ 达到最大聆听时长，强制结束录音")
+            elif reason != Endpointer.NO_SPEECH:
+                logger.info(f"⚡ 说话结束判定 ({reason})")
             
             # 获取识别结果
             # 注意: 在 start_recording() 状态下，get_recent 会自动获取从录音开始到现在的所有内容，duration 参数会被忽略
-            final_query = recognition_buffer.get_recent()
+            final_query = self.buffer.get_recent()
             logger.info(f"\n📝 识别结果: {final_query}")
             
         finally:
-            recognition_buffer.stop_recording()
+            self.endpointer.stop()
+            self.buffer.stop_recording()
 
         # 1. 超时检测 (无语音)
         if not final_query:
             logger.info("⌛ 交互超时 (无语音)")
             self.state = self.STATE_THINKING # 避免回声，且无需打断
-            TTSClient.speak("再见", wait=True, source="interaction")
+            TTSClient.speak("再见", wait=True, source=self.tts_source)
             return False
 
         # 2. 退出指令检测
@@ -261,36 +401,70 @@ class InteractionSystem:
         if any(kw in final_query for kw in exit_keywords):
             logger.info(f"🛑 用户请求退出: {final_query}")
             self.state = self.STATE_THINKING # 避免回声，且无需打断
-            TTSClient.speak("好的，再见", wait=True, source="interaction")
+            TTSClient.speak("好的，再见", wait=True, source=self.tts_source)
             return False
 
         # 3. Agent 交互
         self.state = self.STATE_THINKING
         try:
-            response = self.agent.chat(final_query)
-            logger.info(f"🤖 Agent: {response}")
-            # FIXED: 测试agent文本处理结果
-            # 回答处理模块：优化文本以适应 TTS 播报 (处理日期、编号等)
-            response = process_agent_response(response)
-            logger.info(f"📝 处理后的回答: {response}")
-            # 进入播报模式
-            self.state = self.STATE_SPEAKING
-            # 直接播报 (独占权已在 _run_interaction 统一管理)
-            TTSClient.speak(response, wait=True, source="interaction")
+            self._speak_streaming_reply(final_query)
             # FIXED: 根据识别到的语音增加 播放暂停模块
             # time.sleep(0.5) # 等待尾音结束
                     
         except Exception as e:
             logger.error(f"❌ 交互异常: {e}")
-            TTSClient.speak("我出错了", wait=True, source="interaction")
+            TTSClient.speak("我出错了", wait=True, source=self.tts_source)
         
         # 准备下一轮，切换回监听状态
         self.state = self.STATE_LISTENING
         return True
 
+    def _speak_streaming_reply(self, query: str):
+        """
+        流式获取回答并逐句播报: 增量文本先流式规范化，每凑成一个完整的句子就提交 TTS，
+        后续内容仍在生成时前面的句子已经开始播放 (独占权已在 _run_interaction 统一管理)
+        """
+        speech = SpeechQueue(source=self.tts_source)
+        self.speech = speech
+        # 回答处理模块：优化文本以适应 TTS 播报 (处理日期、编号等)，跨增量切开的日期、数值会被扣留到完整后再处理
+        normalizer = StreamingNormalizer()
+        splitter = SentenceSplitter()
+        response = ""
+
+        def submit(sentence):
+            sentence = sentence.strip()
+            if sentence:
+                # 第一句提交后进入播报模式 (启用打断检测)
+                self.state = self.STATE_SPEAKING
+                speech.put(sentence)
+
+        try:
+            for delta in self.agent.chat_stream(query):
+                response += delta
+                for sentence in splitter.feed(normalizer.feed(delta)):
+                    submit(sentence)
+                if speech.cancelled:
+                    break
+            for sentence in splitter.feed(normalizer.flush()):
+                submit(sentence)
+            submit(splitter.flush())
+            logger.info(f"🤖 Agent: {response}")
+        finally:
+            speech.close()
+            speech.wait()
+            self.speech = None
+
+    def _barge_in(self):
+        """打断播报: 取消剩余句子并停止当前播放"""
+        speech = self.speech
+        if speech:
+            speech.cancel()
+        else:
+            TTSClient.stop_current_playback(self.tts_source)
+
     def run(self):
         # 1. 获取音频设备
-        target_device_idx = get_audio_device("Newmine Mic")
+        target_device_idx = get_audio_device(self.device_name)
 
         # 2. 获取音频配置
         target_sample_rate = 16000
@@ -308,15 +482,20 @@ class InteractionSystem:
         self.current_text_buffer = "" 
         self.is_speech_active = False 
         
-        stream = create_input_stream(target_device_idx, stream_sample_rate)
-        stream.start()
+        # 回调采集写入环形缓冲区，主循环作为处理线程按帧读取，推理变慢时不会丢失音频
+        self.capture = AudioCapture(target_device_idx, stream_sample_rate, samples_per_read)
+        self.capture.start()
         logger.info(f"\n🚀 系统就绪,请说 '{self.wake_word}' 唤醒")
 
         try:
-            while True:
+            while self.is_running:
                 # 统一读取音频
-                samples, _ = stream.read(samples_per_read)
-                audio_chunk = samples[:, 0]
+                begin = time.perf_counter()
+                audio_chunk = self.capture.read()
+                self.read_wait_time.since(begin)
+                if audio_chunk is None:
+                    logger.warning("⚠️ 读取音频超时，等待设备恢复...")
+                    continue
                 
                 if use_resample:
                     if resampler:
@@ -330,7 +509,7 @@ class InteractionSystem:
                     # 即使暂停唤醒，也要继续处理音频以更新 Buffer，供旁路监听使用
                     # 但在暂停期间，不进行唤醒词匹配
                     
-                    vad_outs = self.vad(audio_chunk)
+                    vad_outs = self._run_vad(audio_chunk)
                         
                     for speech_dict, speech_samples in vad_outs:
                         if "start" in speech_dict:
@@ -338,9 +517,25 @@ class InteractionSystem:
                             self.model.reset()
                             self.current_text_buffer = ""
                             self.last_speech_time = time.time()
-                        
+                            self._begin_utterance(speech_dict, speech_samples)
+                            if self.kws:
+                                self.kws.reset()
+                                self.asr_active = False
+
+                        if not self.asr_active:
+                            # 第一阶段: 轻量 KWS，命中或旁路监听开启后才启动 SenseVoice
+                            bypass = self._bypass_active()
+                            hit = self.kws.feed(speech_samples, "end" in speech_dict, detect=not bypass)
+                            if hit is None and not bypass:
+                                continue
+                            if hit:
+                                logger.info(f"\n🔔 KWS 命中: {hit[0]} ({hit[1]:.2f})，SenseVoice 确认中")
+                            self.asr_active = True
+                            # 从句首补算本句已缓存的音频
+                            speech_samples = self.kws.segment
+
                         text = ""
-                        for res in self.model.streaming_inference(speech_samples * 32768, "end" in speech_dict):
+                        for res in self._infer(speech_samples * 32768, "end" in speech_dict):
                             text = res.get("text", "")
                             if text:
                                 if len(text) < 2 or len(set(text)) == 1:
@@ -352,11 +547,15 @@ class InteractionSystem:
                                     sys.stdout.write(f"\r👂 识别中: {text}")
                                     sys.stdout.flush()
                                     self.current_text_buffer = text
-                                    recognition_buffer.add(text)
+                                    self._record_text(text, res)
+
+                        if "end" in speech_dict:
+                            self.buffer.finalize(self.utterance_id, speech_dict["end"])
                     
                         # 只有在未暂停唤醒检测时，才检查唤醒词
-                        if not self.wake_detection_paused and text and check_wake_word(text, self.wake_word, self.wake_word_pinyin):
-                            if not recognition_buffer.is_active:
+                        if not self.wake_detection_paused and text and self.wake_matcher.update(text):
+                            if not self.buffer.is_active:
+                                self.wake_delay.observe(time.time() - self.utterance_start_time)
                                 logger.info(f"\n🚀 检测到唤醒词！")
                                 self.handle_wake_up()
                                 self.current_text_buffer = ""
@@ -364,7 +563,7 @@ class InteractionSystem:
                                 break
                             else:
                                 logger.info(f"👂 识别中: {text} (外部录音中,暂不响应唤醒)")
-                        elif not recognition_buffer.is_active and "end" in speech_dict:
+                        elif not self.buffer.is_active and "end" in speech_dict:
                             self.model.reset()
                             self.current_text_buffer = ""
                 else:
@@ -374,42 +573,43 @@ class InteractionSystem:
                         time.sleep(0.01)
                         continue
 
-                    # 如果正在播报，启用打断检测 (仅识别特定关键词)
+                    # 如果正在播报，启用打断检测 (仅对打断指令打分，不做 beam search)
                     if self.state == self.STATE_SPEAKING:
-                        vad_outs = self.vad(audio_chunk)
+                        vad_outs = self._run_vad(audio_chunk)
                         for speech_dict, speech_samples in vad_outs:
                             if "start" in speech_dict:
                                 self.model.reset()
                                 self.current_text_buffer = ""
                             
-                            for res in self.model.streaming_inference(speech_samples * 32768, "end" in speech_dict):
-                                text = res.get("text", "")
-                                if text and text != self.current_text_buffer:
-                                    sys.stdout.write(f"\r👂 播报中识别: {text}")
-                                    sys.stdout.flush()
-                                    self.current_text_buffer = text
-                                    
-                                    # 关键词打断检测
-                                    if "结束" in text:
-                                        logger.info(f"\n🛑 检测到打断指令: {text}")
-                                        threading.Thread(target=TTSClient.stop_current_playback).start()
-                                        
-                                        # 🆕 优化: 调用统一的重置模块，带 0.5s 延迟以消除尾音
-                                        self._reset_audio_state(delay=0.5)
+                            # 关键词打断检测 (多通道时也在本线程执行，不经过共用引擎)
+                            begin = time.perf_counter()
+                            hits = self.model.keyword_scan(speech_samples * 32768, "end" in speech_dict)
+                            self.keyword_scan_time.since(begin)
+                            if hits:
+                                hit = max(hits, key=lambda h: h["score"])
+                                logger.info(f"\n🛑 检测到打断指令: {hit['keyword']} (置信度 {hit['score']:.2f})")
+                                threading.Thread(target=self._barge_in).start()
+                                
+                                # 🆕 优化: 调用统一的重置模块，带 0.5s 延迟以消除尾音
+                                self._reset_audio_state(delay=0.5)
+                                # VAD 已重置，本帧剩余的输出不再处理
+                                break
                         continue
 
                     # VAD 仍然运行以检测说话结束
-                    vad_outs = self.vad(audio_chunk)
+                    vad_outs = self._run_vad(audio_chunk)
                     for speech_dict, speech_samples in vad_outs:
                         if "start" in speech_dict:
                             self.is_speech_active = True
                             self.model.reset() # 🆕 修复: 新的一句开始时，必须重置模型状态
                             self.last_speech_time = time.time()
+                            self._begin_utterance(speech_dict, speech_samples)
+                            self.endpointer.on_speech_start()
                         if "end" in speech_dict:
                             self.is_speech_active = False
                             self.last_speech_time = time.time()
                         
-                        for res in self.model.streaming_inference(speech_samples * 32768, "end" in speech_dict):
+                        for res in self._infer(speech_samples * 32768, "end" in speech_dict):
                             text = res.get("text", "")
                             if text and text != self.current_text_buffer:
                                     # logger.debug(f"🎤 交互识别: {text}")
@@ -417,7 +617,13 @@ class InteractionSystem:
                                     sys.stdout.write(f"\r🎤 交互识别: {text}")
                                     sys.stdout.flush()
                                     self.current_text_buffer = text
-                                    recognition_buffer.add(text)
+                                    self._record_text(text, res)
+                                    self.endpointer.on_text(text)
+
+                        if "end" in speech_dict:
+                            self.buffer.finalize(self.utterance_id, speech_dict["end"])
+                            # 最终结果写入后再通知，交互线程立即取走完整的识别结果
+                            self.endpointer.on_speech_end()
                 
                 time.sleep(0.001)
 
@@ -427,15 +633,17 @@ class InteractionSystem:
             logger.error(f"❌ 系统主循环发生未捕获异常: {e}", exc_info=True)
         finally:
             logger.info("🧹 正在清理资源...")
+            # 唤醒阻塞在结束判定上的交互线程
+            self.is_running = False
+            self.endpointer.cancel()
             try:
-                stream.stop()
-                stream.close()
+                self.capture.close()
             except:
                 pass
             
             # 确保释放独占权
             try:
-                TTSClient.set_exclusive_mode(False, allowed_source="interaction")
+                TTSClient.set_exclusive_mode(False, allowed_source=self.tts_source)
                 logger.info("🔓 已释放独占模式")
             except Exception as e:
                 logger.error(f"⚠️ 释放独占模式失败: {e}")
@@ -1,5 +1,6 @@
 import sys
 import os
+import argparse
 import threading
 import importlib.util
 from pathlib import Path
@@ -35,11 +36,47 @@ except Exception:
 from asr.interaction.core import InteractionSystem
 from asr.interaction.api_server import run_api_server
 
+
+def run_channels(mics: list):
+    """多麦克风模式: 每个麦克风一个通道 (独立的采集、VAD、状态机和解码状态)，共用一份模型"""
+    from asr.streaming_sensevoice_master.streaming_sensevoice import BatchedStreamingEngine
+
+    # 各通道的编码器前向由引擎合并为批量执行
+    engine = BatchedStreamingEngine(max_batch_size=len(mics))
+    systems = []
+    for mic in mics:
+        channel, _, device_name = mic.partition("=")
+        systems.append(InteractionSystem(channel=channel, device_name=device_name or channel, engine=engine))
+
+    threads = [threading.Thread(target=s.run, name=f"channel-{s.channel}", daemon=True) for s in systems]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        logger.info("🛑 停止服务...")
+        for system in systems:
+            system.is_running = False
+        for thread in threads:
+            thread.join(timeout=2.0)
+    finally:
+        engine.close()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mic", action="append", default=[], metavar="CHANNEL=DEVICE",
+                        help="多麦克风模式，每个麦克风一个通道，可重复指定，例如 --mic room1='Newmine Mic' --mic room2='USB Mic'")
+    args = parser.parse_args()
+
     # 启动 API 服务 (后台线程)
     api_thread = threading.Thread(target=run_api_server, daemon=True)
     api_thread.start()
     
-    # 启动交互系统 (主线程)
-    system = InteractionSystem()
-    system.run()
\ No newline at end of file
+    if args.mic:
+        run_channels(args.mic)
+    else:
+        # 启动交互系统 (主线程)
+        system = InteractionSystem()
+        system.run()
\ No newline at end of file
@@ -2,17 +2,24 @@
 交互模块工具库
 包含音频处理、缓冲管理、文本处理和唤醒检测等工具
 """
-from .audio import get_audio_device, get_audio_config, create_input_stream
+from .audio import get_audio_device, get_audio_config, create_input_stream, AudioCapture
 from .buffer import RecognitionBuffer, recognition_buffer
-from .text_preprocess import process_agent_response
-from .wake_word import check_wake_word
+from .text_preprocess import process_agent_response, StreamingNormalizer
+from .wake_word import check_wake_word, WakeWordMatcher
+from .kws import KeywordSpotter
+from .endpoint import Endpointer
 
 __all__ = [
     'get_audio_device',
     'get_audio_config',
     'create_input_stream',
+    'AudioCapture',
     'RecognitionBuffer',
     'recognition_buffer',
     'process_agent_response',
-    'check_wake_word'
+    'StreamingNormalizer',
+    'check_wake_word',
+    'WakeWordMatcher',
+    'KeywordSpotter',
+    'Endpointer'
 ]
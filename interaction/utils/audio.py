@@ -2,6 +2,8 @@ import sounddevice as sd
 import sys
 import logging
 import time
+import threading
+import numpy as np
 from asr.common import setup_logger
 
 # 配置日志
@@ -65,11 +67,130 @@ def get_audio_config(device_idx, target_sample_rate=16000, chunk_duration=0.1):
 
     return stream_sample_rate, samples_per_read, use_resample, resampler
 
-def create_input_stream(device_idx, sample_rate):
-    """创建输入流"""
+def create_input_stream(device_idx, sample_rate, callback=None, blocksize=0):
+    """创建输入流 (传入 callback 时为回调模式)"""
     return sd.InputStream(
         device=device_idx,
         channels=1,
         dtype="float32",
-        samplerate=sample_rate
-    )
\ No newline at end of file
+        samplerate=sample_rate,
+        callback=callback,
+        blocksize=blocksize,
+    )
+
+
+class AudioCapture:
+    """
+    回调模式音频采集
+
+    sounddevice 回调线程把音频写入预分配的环形缓冲区，处理线程通过 read() 按固定帧长读取，
+    推理偶尔变慢时由缓冲区吸收，不再阻塞采集。
+    单生产者 / 单消费者: 写指针只由回调修改，读指针只由处理线程修改，两边都不加锁。
+    """
+    def __init__(self, device_idx, sample_rate, frame_size, capacity_seconds=10.0):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+        self._write = 0  # 累计写入样本数
+        self._read = 0   # 累计读取样本数
+        self._ready = threading.Event()
+
+        # 统计
+        self.overruns = 0          # 缓冲区满，新到的音频被丢弃的次数
+        self.dropped_samples = 0
+        self.underruns = 0         # 读取超时 (采集停滞) 的次数
+        self.input_overflows = 0   # 设备层 (PortAudio) 报告的溢出
+        self.input_underflows = 0
+        self.max_depth = 0         # 缓冲区最大积压样本数
+        self._reported_overruns = 0
+
+        self.stream = create_input_stream(device_idx, sample_rate, callback=self._callback)
+
+    def _callback(self, indata, frames, time_info, status):
+        # 运行在 PortAudio 线程，不能阻塞或打印日志
+        if status.input_overflow:
+            self.input_overflows += 1
+        if status.input_underflow:
+            self.input_underflows += 1
+
+        samples = indata[:, 0]
+        free = self.capacity - (self._write - self._read)
+        if len(samples) > free:
+            self.overruns += 1
+            self.dropped_samples += len(samples) - free
+            samples = samples[:free]
+
+        n = len(samples)
+        pos = self._write % self.capacity
+        first = min(n, self.capacity - pos)
+        self._buffer[pos:pos + first] = samples[:first]
+        self._buffer[:n - first] = samples[first:]
+        # 先写数据再移动写指针，读取方看到的样本一定已写完
+        self._write += n
+        self.max_depth = max(self.max_depth, self._write - self._read)
+        self._ready.set()
+
+    def start(self):
+        self.stream.start()
+
+    def close(self):
+        try:
+            self.stream.stop()
+            self.stream.close()
+        finally:
+            self._ready.set()
+
+    @property
+    def depth(self) -> int:
+        """缓冲区中待处理的样本数"""
+        return self._write - self._read
+
+    def read(self, frame_size=None, timeout=1.0):
+        """
+        读取一帧音频，缓冲区不足一帧时等待
+
+        Returns:
+            float32 数组 (长度 frame_size)，超时返回 None
+        """
+        size = frame_size or self.frame_size
+        deadline = time.monotonic() + timeout
+        while self._write - self._read < size:
+            self._ready.clear()
+            # clear 之后再检查一次，避免错过回调在两步之间的 set
+            if self._write - self._read >= size:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._ready.wait(remaining):
+                self.underruns += 1
+                return None
+
+        if self.overruns != self._reported_overruns:
+            logger.warning(f"⚠️ 音频缓冲区溢出 {self.overruns} 次，累计丢弃 {self.dropped_samples} 个样本")
+            self._reported_overruns = self.overruns
+
+        pos = self._read % self.capacity
+        first = min(size, self.capacity - pos)
+        frame = np.empty(size, dtype=np.float32)
+        frame[:first] = self._buffer[pos:pos + first]
+        frame[first:] = self._buffer[:size - first]
+        self._read += size
+        return frame
+
+    def stats(self) -> dict:
+        """采集状态，供 /status 查询"""
+        depth = self.depth
+        to_ms = 1000.0 / self.sample_rate
+        return {
+            "sample_rate": self.sample_rate,
+            "frame_size": self.frame_size,
+            "queue_depth": depth // self.frame_size,
+            "queue_depth_ms": round(depth * to_ms, 1),
+            "max_queue_depth_ms": round(self.max_depth * to_ms, 1),
+            "capacity_ms": round(self.capacity * to_ms, 1),
+            "overruns": self.overruns,
+            "dropped_samples": self.dropped_samples,
+            "underruns": self.underruns,
+            "input_overflows": self.input_overflows,
+            "input_underflows": self.input_underflows,
+        }
\ No newline at end of file
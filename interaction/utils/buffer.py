@@ -1,161 +1,213 @@
 import time
 import logging
-from collections import deque
+from bisect import bisect_left
 from threading import Lock
-from asr.common import setup_logger
+from asr.common import setup_logger, metrics, join_texts
 
 # 配置日志
 logger = setup_logger("buffer")
 
+# 耗时指标 (/metrics)
+QUERY_TIME = metrics.histogram("interaction_buffer_query_seconds", "识别结果缓冲区查询 (get_recent) 耗时")
+
+
+class Utterance:
+    """一句话 (一个 VAD 片段) 的识别结果, 创建后不再修改"""
+
+    def __init__(self, utterance_id: int, text: str, start_time: float, update_time: float,
+                 start_sample: int = None, end_sample: int = None,
+                 timestamps=(), is_final: bool = False):
+        self.id = utterance_id
+        self.text = text
+        self.start_time = start_time      # VAD 起点对应的时间戳
+        self.update_time = update_time    # 最后一次更新的时间戳
+        self.start_sample = start_sample  # VAD 起点 (采样点)
+        self.end_sample = end_sample      # VAD 终点 (采样点), 未结束时为 None
+        self.timestamps = tuple(timestamps)  # 各 token 相对 VAD 起点的时间 (ms)
+        self.is_final = is_final
+
+    def text_after(self, start_time: float) -> str:
+        """start_time 之后说出的部分"""
+        if self.start_time >= start_time:
+            return self.text
+        offset_ms = (start_time - self.start_time) * 1000
+        chars = [i for i, c in enumerate(self.text) if not c.isspace()]
+        if len(chars) != len(self.timestamps):
+            # token 与字符无法一一对应 (如英文子词), 保留整句
+            return self.text
+        k = bisect_left(self.timestamps, offset_ms)
+        return self.text[chars[k]:] if k < len(chars) else ""
+
+    def to_event(self, start_time: float = None) -> dict:
+        """转换为推送给订阅方的事件, 指定 start_time 时只保留其后的文本"""
+        return {
+            "type": "final" if self.is_final else "partial",
+            "id": self.id,
+            "text": self.text if start_time is None else self.text_after(start_time),
+            "start_time": self.start_time,
+            "update_time": self.update_time,
+            "start_sample": self.start_sample,
+            "end_sample": self.end_sample,
+            "timestamps": list(self.timestamps),
+        }
+
+
 class RecognitionBuffer:
-    """识别结果缓冲区 (线程安全)"""
+    """
+    识别结果缓冲区 (线程安全)
+
+    按句子 (VAD 片段) 保存结构化结果, 同一句的新中间结果原地覆盖旧的, 内存只随
+    句子数增长。查询时按起点二分定位, 再用 token 时间戳截取时间范围内的文本。
+    写入方持锁更新后发布只读快照, 读取方 (API 线程) 不加锁, 不会阻塞音频线程的 add()。
+    每次更新都会推送给 subscribe() 注册的回调。
+    """
     def __init__(self, max_duration=60.0):
         # 🆕 将缓冲区大小增加到 60 秒，以支持旁路监听回溯
         self.max_duration = max_duration
-        self.buffer = deque()
-        self.lock = Lock()
+        self.lock = Lock()  # 仅写入方使用
         self.is_active = False
         self.active_lock = Lock()
         self.recording_start_time = None  # 🆕 记录开始时间
-    
-    def add(self, text: str):
-        """添加识别结果"""
+
+        # 只追加的列表, 过期数据只移动 first, 积累到一定量后整体重建
+        # 下标均为绝对序号, 列表下标 = 序号 - base
+        self._starts = []  # 各句起点时间, 有序
+        self._utterances = []
+        self._base = 0
+        self._first = 0
+        self._index = {}  # utterance id -> 序号
+        self._subscribers = []  # 更新回调, 在写入线程中调用
+        # 读取方使用的快照: (starts, utterances, base, first, end)
+        self._view = (self._starts, self._utterances, 0, 0, 0)
+
+    def add(self, text: str, utterance_id: int, start_time: float = None,
+            start_sample: int = None, timestamps=()):
+        """添加识别结果, 同一句的中间结果覆盖之前的"""
         with self.lock:
             current_time = time.time()
-            self.buffer.append((current_time, text))
-            
-            # 清理过期数据 (物理删除)
-            while self.buffer and (current_time - self.buffer[0][0] > self.max_duration):
-                self.buffer.popleft()
-    
+            index = self._index.get(utterance_id)
+            if index is not None:
+                old = self._utterances[index - self._base]
+                utterance = Utterance(
+                    utterance_id, text, old.start_time, current_time,
+                    old.start_sample, old.end_sample, timestamps, old.is_final,
+                )
+                self._utterances[index - self._base] = utterance
+            else:
+                start_time = current_time if start_time is None else start_time
+                if self._starts and start_time < self._starts[-1]:
+                    start_time = self._starts[-1]  # 保持起点有序
+                self._index[utterance_id] = self._base + len(self._utterances)
+                self._starts.append(start_time)
+                utterance = Utterance(
+                    utterance_id, text, start_time, current_time, start_sample,
+                    timestamps=timestamps,
+                )
+                self._utterances.append(utterance)
+            self._evict(current_time)
+            self._publish(utterance)
+
+    def finalize(self, utterance_id: int, end_sample: int = None):
+        """VAD 判定一句结束, 标记为最终结果"""
+        with self.lock:
+            index = self._index.get(utterance_id)
+            if index is None:
+                return
+            old = self._utterances[index - self._base]
+            utterance = Utterance(
+                old.id, old.text, old.start_time, time.time(), old.start_sample,
+                end_sample, old.timestamps, is_final=True,
+            )
+            self._utterances[index - self._base] = utterance
+            self._publish(utterance)
+
+    def _evict(self, current_time: float):
+        # 清理过期数据
+        end = self._base + len(self._utterances)
+        while self._first < end:
+            utterance = self._utterances[self._first - self._base]
+            if current_time - utterance.update_time <= self.max_duration:
+                break
+            if self._index.get(utterance.id) == self._first:
+                del self._index[utterance.id]
+            self._first += 1
+
+        if self._first - self._base > max(1024, len(self._utterances) // 2):
+            # 新建列表, 不修改读取方可能仍在使用的旧列表
+            offset = self._first - self._base
+            self._starts = self._starts[offset:]
+            self._utterances = self._utterances[offset:]
+            self._base = self._first
+
+    def _publish(self, utterance: Utterance = None):
+        end = self._base + len(self._utterances)
+        self._view = (self._starts, self._utterances, self._base, self._first, end)
+        if utterance is not None:
+            for callback in self._subscribers:
+                try:
+                    callback(utterance)
+                except Exception as e:
+                    logger.error(f"❌ 订阅回调异常: {e}")
+
+    def subscribe(self, callback):
+        """
+        订阅识别结果更新
+
+        Args:
+            callback: callback(utterance)，在音频线程中持锁调用，必须立即返回
+                      (例如转交给 loop.call_soon_threadsafe)
+        """
+        with self.lock:
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        """取消订阅"""
+        with self.lock:
+            self._subscribers = [c for c in self._subscribers if c is not callback]
+
+    @property
+    def has_subscribers(self) -> bool:
+        """是否有订阅方在等待识别结果"""
+        return bool(self._subscribers)
+
+    def get_utterances(self, start_time: float) -> list:
+        """start_time 之后仍有内容的句子"""
+        starts, utterances, base, first, end = self._view
+        i = bisect_left(starts, start_time, first - base, end - base)
+        # 起点在 start_time 之前但仍在说话的句子
+        while i > first - base and utterances[i - 1].update_time >= start_time:
+            i -= 1
+        return utterances[i:end - base]
+
     def get_recent(self, duration: float = 5.0, start_time: float = None) -> str:
         """
         获取识别文本
-        
+
         Args:
             duration: 如果 start_time 为 None，则获取最近 duration 秒的内容
             start_time: 如果指定了 start_time，则获取该时间戳之后的所有内容(忽略 duration)
         """
-        with self.lock:
-            # 🆕 捕获当前的 start_time 到局部变量，防止并发修改导致 NoneType 错误
-            current_start_time = self.recording_start_time
-            
-            # 优先使用传入的 start_time，否则使用 recording_start_time，最后回退到 duration
-            target_start_time = start_time if start_time is not None else current_start_time
-            
-            result_texts = []
-            # FIXED 修改获取最新的识别结果
-            last_pre_text = ""  # 🆕 用于记录时间点之前的最后一条文本
-            current_time = time.time()
-            
-            for timestamp, text in self.buffer:
-                if target_start_time is not None:
-                    # 使用精确时间戳过滤
-                    if timestamp >= target_start_time:
-                        result_texts.append(text)
-                    else:
-                        # 记录最新的历史文本，用于后续去重
-                        last_pre_text = text
-                else:
-                    # 使用 duration 回溯
-                    if current_time - timestamp <= duration:
-                        result_texts.append(text)
-                    else:
-                        last_pre_text = text
-            
-            # 🆕 历史重叠去除 (History Overlap Removal) - 升级版: 最大后缀-前缀匹配
-            # 解决 ASR 修正导致的历史文本不完全匹配问题 (例如: 历史="测试", 新="试是否...")
-            if last_pre_text and result_texts:
-                cleaned_texts = []
-                for text in result_texts:
-                    # 1. 尝试完全前缀匹配 (最快)
-                    if text.startswith(last_pre_text):
-                        cleaned_text = text[len(last_pre_text):]
-                        if cleaned_text.strip():
-                            cleaned_texts.append(cleaned_text)
-                        continue
-                    
-                    # 2. 尝试部分重叠匹配 (滑动窗口)
-                    # 从 last_pre_text 的完整长度开始，逐渐缩短，看它的后缀是否是 text 的前缀
-                    # 最小匹配长度设为 1 (虽然有风险，但能切除单字残留)
-                    overlap_len = 0
-                    min_match_len = 1 
-                    
-                    # 为了性能，限制最大回溯长度（比如只看历史文本的最后 10 个字符）
-                    # 但这里为了准确性，先全量匹配
-                    check_len = len(last_pre_text)
-                    
-                    for l in range(check_len, min_match_len - 1, -1):
-                        suffix = last_pre_text[-l:]
-                        if text.startswith(suffix):
-                            overlap_len = l
-                            break
-                    
-                    if overlap_len > 0:
-                        # 切除重叠部分
-                        cleaned_text = text[overlap_len:]
-                        if cleaned_text.strip():
-                            cleaned_texts.append(cleaned_text)
-                    else:
-                        # 没有任何重叠，说明是全新的内容（或者差异太大无法识别）
-                        cleaned_texts.append(text)
-                        
-                result_texts = cleaned_texts
-            
-            # 🆕 智能合并策略 (Smart Merge)
-            # 1. 增量合并 (Prefix Merge) - 消除流式识别的中间结果
-            # 例如: "需要" -> "需要许可" -> "需要许可..."
-            merged_texts = []
-            if result_texts:
-                current_phrase = result_texts[0]
-                
-                for i in range(1, len(result_texts)):
-                    next_phrase = result_texts[i]
-                    
-                    # 如果 next_phrase 是 current_phrase 的延续 (包含关系)
-                    if len(next_phrase) >= len(current_phrase) and next_phrase.startswith(current_phrase):
-                        current_phrase = next_phrase
-                    # 或者 current_phrase 是 next_phrase 的一部分 (修正/包含)
-                    elif current_phrase in next_phrase:
-                         current_phrase = next_phrase
-                    else:
-                        # 这是一个新的片段(或者完全不同的修正)，先保存旧的
-                        merged_texts.append(current_phrase)
-                        current_phrase = next_phrase
-                
-                merged_texts.append(current_phrase)
-            
-            # 2. 重叠拼接 (Overlap Stitching) - 消除 VAD 切分导致的重复
-            # 例如: "需要许可" + "许可是" -> "需要许可是"
-            final_text = ""
-            if merged_texts:
-                final_text = merged_texts[0]
-                for i in range(1, len(merged_texts)):
-                    next_t = merged_texts[i]
-                    
-                    # 尝试找到重叠部分
-                    overlap_found = False
-                    max_overlap = min(len(final_text), len(next_t))
-                    
-                    # 从最大重叠开始匹配，最小重叠 2 个字符
-                    # for k in range(max_overlap, 1, -1): 
-                    # 从最大重叠开始匹配，最小重叠 1 个字符
-                    for k in range(max_overlap, 0, -1): 
-                        if final_text.endswith(next_t[:k]):
-                            final_text += next_t[k:]
-                            overlap_found = True
-                            break
-                    
-                    if not overlap_found:
-                        final_text += " " + next_t
-            
-            # 🆕 升级为"软清理": 不再物理删除 Buffer 中的数据，而是依赖 max_duration 自动滚动淘汰。
-            # 这样做的目的是：
-            # 1. 允许 server_audio2asr.py 等旁路服务在主程序交互期间也能读取到完整的历史数据。
-            # 2. 主程序通过 recording_start_time 依然可以准确获取本次会话的内容，不受旧数据干扰。
-            
-            return final_text.strip()
-    
+        begin = time.perf_counter()
+        # 🆕 捕获当前的 start_time 到局部变量，防止并发修改导致 NoneType 错误
+        current_start_time = self.recording_start_time
+
+        # 优先使用传入的 start_time，否则使用 recording_start_time，最后回退到 duration
+        target_start_time = start_time if start_time is not None else current_start_time
+        if target_start_time is None:
+            target_start_time = time.time() - duration
+
+        # 🆕 升级为"软清理": 不再物理删除 Buffer 中的数据，而是依赖 max_duration 自动滚动淘汰。
+        # 这样做的目的是：
+        # 1. 允许 server_audio2asr.py 等旁路服务在主程序交互期间也能读取到完整的历史数据。
+        # 2. 主程序通过 recording_start_time 依然可以准确获取本次会话的内容，不受旧数据干扰。
+        texts = []
+        for utterance in self.get_utterances(target_start_time):
+            text = utterance.text_after(target_start_time).strip()
+            if text:
+                texts.append(text)
+        QUERY_TIME.since(begin)
+        return join_texts(texts)
+
     def start_recording(self) -> bool:
         """标记开始录音 (互斥锁)"""
         with self.active_lock:
@@ -164,7 +216,7 @@ class RecognitionBuffer:
             self.is_active = True
             self.recording_start_time = time.time()  # 🆕 记录开始时间,不清空缓冲区
             return True
-    
+
     def stop_recording(self):
         """结束录音"""
         with self.active_lock:
@@ -172,4 +224,4 @@ class RecognitionBuffer:
             self.recording_start_time = None
 
 # 🆕 全局缓冲区实例
-recognition_buffer = RecognitionBuffer(max_duration=10.0)
\ No newline at end of file
+recognition_buffer = RecognitionBuffer(max_duration=10.0)
@@ -0,0 +1,140 @@
+"""
+对话轮次结束判定 (Endpointing)
+由音频线程推送 VAD 起止和识别结果事件，交互线程在 wait() 中等待，
+策略满足的时刻立即返回，不再轮询 is_speech_active
+"""
+import time
+import threading
+from asr.common import setup_logger
+
+# 配置日志
+logger = setup_logger("endpoint")
+
+
+class Endpointer:
+    """
+    一轮对话的结束判定，线程安全
+
+    判定规则 (任一满足即结束):
+    - silence:   VAD 判定一句结束后，再静音 trailing_silence 秒仍未开始新的一句
+                 (VAD 自身已等待 min_silence_duration_ms，默认不再额外等待)
+    - stable:    正在说话但识别结果连续 stable_timeout 秒不变 (例如背景噪声使 VAD 无法结束)，None 为不启用
+    - no_speech: 开始后 no_speech_timeout 秒内没有说话
+    - max_turn:  本轮总时长超过 max_turn 秒
+    """
+    SILENCE = "silence"
+    STABLE = "stable"
+    NO_SPEECH = "no_speech"
+    MAX_TURN = "max_turn"
+    CANCELLED = "cancelled"
+
+    def __init__(self, trailing_silence: float = 0.0, max_turn: float = 20.0,
+                 no_speech_timeout: float = 8.0, stable_timeout: float = None):
+        self.trailing_silence = trailing_silence
+        self.max_turn = max_turn
+        self.no_speech_timeout = no_speech_timeout
+        self.stable_timeout = stable_timeout
+        self._cond = threading.Condition()
+        self._listening = False
+        self._cancelled = False
+        self._reset()
+
+    def _reset(self):
+        now = time.monotonic()
+        self._start_time = now
+        self._speaking = False
+        self._has_spoken = False
+        self._speech_end_time = None    # 最近一次 VAD 结束的时间
+        self._text = ""
+        self._text_time = now           # 识别结果最近一次变化的时间
+        self.reason = None
+        self.end_time = None            # 满足结束条件的时刻 (time.monotonic)
+
+    def start(self):
+        """开始新的一轮，之后的事件才会被处理"""
+        with self._cond:
+            self._reset()
+            self._listening = True
+            self._cond.notify_all()
+
+    def stop(self):
+        """本轮结束，之后的事件被忽略"""
+        with self._cond:
+            self._listening = False
+
+    def cancel(self):
+        """立即结束等待 (例如系统退出)，之后的每一轮 wait() 都立即返回 CANCELLED"""
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def on_speech_start(self):
+        """VAD 检测到新的一句"""
+        with self._cond:
+            if not self._listening:
+                return
+            self._speaking = True
+            self._has_spoken = True
+            self._speech_end_time = None
+            self._text_time = time.monotonic()
+            self._cond.notify_all()
+
+    def on_text(self, text: str):
+        """当前句的识别结果更新"""
+        with self._cond:
+            if not self._listening or text == self._text:
+                return
+            self._text = text
+            self._text_time = time.monotonic()
+            self._cond.notify_all()
+
+    def on_speech_end(self):
+        """VAD 判定当前句结束 (最终识别结果已写入缓冲区)"""
+        with self._cond:
+            if not self._listening:
+                return
+            self._speaking = False
+            self._speech_end_time = time.monotonic()
+            self._cond.notify_all()
+
+    def _check(self, now: float):
+        """返回 (结束原因, 满足时刻)，未满足时返回 (None, 下一个可能满足的时刻)"""
+        if self._cancelled:
+            return self.CANCELLED, now
+        deadlines = [(self.MAX_TURN, self._start_time + self.max_turn)]
+        if not self._has_spoken:
+            deadlines.append((self.NO_SPEECH, self._start_time + self.no_speech_timeout))
+        elif not self._speaking:
+            deadlines.append((self.SILENCE, self._speech_end_time + self.trailing_silence))
+        elif self.stable_timeout is not None and self._text:
+            deadlines.append((self.STABLE, self._text_time + self.stable_timeout))
+
+        reason, deadline = min(deadlines, key=lambda d: d[1])
+        if deadline <= now:
+            return reason, deadline
+        return None, deadline
+
+    def wait(self) -> str:
+        """阻塞直到本轮结束，返回结束原因"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                reason, deadline = self._check(now)
+                if reason:
+                    break
+                # 事件到达时被唤醒重新判定，否则在最近的截止时刻醒来
+                self._cond.wait(deadline - now)
+            self.reason = reason
+            self.end_time = now
+            self._listening = False
+        logger.debug(f"⚡ 本轮结束: {reason}")
+        return reason
+
+    @property
+    def has_spoken(self) -> bool:
+        return self._has_spoken
+
+    @property
+    def text_time(self) -> float:
+        """识别结果最近一次变化的时刻 (time.monotonic)，近似最后一个字说完的时刻"""
+        return self._text_time
@@ -0,0 +1,119 @@
+"""
+轻量唤醒词检测 (KWS)
+基于 FunASR 的 fsmn_kws / sanm_kws_streaming 模型，在等待唤醒阶段代替 SenseVoice 常驻解码，
+命中后再交给 SenseVoice 确认
+"""
+import numpy as np
+from asr.common import setup_logger
+
+# 配置日志
+logger = setup_logger("kws")
+
+try:
+    from funasr import AutoModel
+except ImportError:
+    AutoModel = None
+
+SAMPLE_RATE = 16000
+# 音素建模的 CTC 唤醒模型，可以通过 keywords 指定任意中文唤醒词
+DEFAULT_KWS_MODEL = "iic/speech_charctc_kws_phone-xiaoyun"
+
+# 进程内共享的 KWS 模型 (多麦克风时各通道共用): (模型, 唤醒词, 设备, 其他参数) -> AutoModel
+# 检测时每次传入新的 cache，模型本身不保存检测状态
+kws_models = {}
+
+
+class KeywordSpotter:
+    """
+    在 VAD 片段上做滑动窗口唤醒词检测
+
+    每累积 HOP 秒新音频，对最近 WINDOW 秒做一次检测 (片段结束时补测一次)；
+    同时缓存本句从 VAD 起点开始的音频，命中后由 SenseVoice 从句首补算
+    """
+    WINDOW = 1.6        # 检测窗口 (秒)，需覆盖完整的唤醒词
+    HOP = 0.3           # 检测间隔 (秒)
+    MIN_DURATION = 0.3  # 少于该时长的音频不检测
+    MAX_SEGMENT = 30.0  # 句首音频最多缓存的时长 (秒)
+
+    def __init__(self, keywords, model: str = DEFAULT_KWS_MODEL, device: str = "cpu",
+                 threshold: float = 0.0, **kwargs):
+        """
+        Args:
+            keywords: 唤醒词，字符串 (多个用逗号分隔) 或列表
+            model: 模型名或本地路径，fsmn_kws 或 sanm_kws_streaming
+                   (后者需传入 chunk_size 等参数，见 FunASR 示例)
+            threshold: 命中得分阈值，低于该值视为未命中
+        """
+        if AutoModel is None:
+            raise ImportError("唤醒词检测需要安装 funasr")
+        if not isinstance(keywords, str):
+            keywords = ",".join(keywords)
+        self.keywords = keywords
+        self.threshold = threshold
+        key = (model, keywords, device, tuple(sorted(kwargs.items())))
+        if key not in kws_models:
+            kws_models[key] = AutoModel(
+                model=model,
+                keywords=keywords,
+                device=device,
+                disable_update=True,
+                disable_pbar=True,
+                **kwargs,
+            )
+        self.model = kws_models[key]
+        self.reset()
+
+    def reset(self):
+        """新的一句开始时调用"""
+        self._chunks = []
+        self._length = 0
+        self._pending = 0  # 上次检测之后新到的样本数
+
+    @property
+    def segment(self) -> np.ndarray:
+        """本句从 VAD 起点开始缓存的音频"""
+        if len(self._chunks) != 1:
+            self._chunks = [np.concatenate(self._chunks)] if self._chunks else [np.zeros(0, dtype=np.float32)]
+        return self._chunks[0]
+
+    def feed(self, samples: np.ndarray, is_final: bool = False, detect: bool = True):
+        """
+        追加一段音频 (float32, 范围 [-1, 1])
+
+        Args:
+            is_final: VAD 判定本句结束
+            detect: False 时只缓存音频不检测 (例如唤醒检测已暂停)
+
+        Returns:
+            (唤醒词, 得分)，未命中返回 None
+        """
+        self._chunks.append(np.asarray(samples, dtype=np.float32))
+        self._length += len(samples)
+        self._pending += len(samples)
+
+        max_samples = int(self.MAX_SEGMENT * SAMPLE_RATE)
+        if self._length > max_samples:
+            self._chunks = [self.segment[-max_samples:]]
+            self._length = max_samples
+
+        if not detect or not self._pending:
+            return None
+        if not is_final and self._pending < self.HOP * SAMPLE_RATE:
+            return None
+        self._pending = 0
+        return self.detect(self.segment[-int(self.WINDOW * SAMPLE_RATE):])
+
+    def detect(self, samples: np.ndarray):
+        """对一段音频做一次检测，返回 (唤醒词, 得分) 或 None"""
+        if len(samples) < self.MIN_DURATION * SAMPLE_RATE:
+            return None
+        res = self.model.generate(input=samples, cache={}, is_final=True)
+        # 结果文本为 "detected <唤醒词> <得分>" 或 "rejected"
+        parts = res[0]["text"].split() if res else []
+        if len(parts) != 3 or parts[0] != "detected":
+            return None
+        keyword, score = parts[1], float(parts[2])
+        if score < self.threshold:
+            logger.debug(f"唤醒词得分过低: {keyword} {score:.3f}")
+            return None
+        return keyword, score
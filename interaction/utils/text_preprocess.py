@@ -4,50 +4,180 @@ from asr.common import setup_logger
 
 logger = setup_logger("text_processing")
 
+def replace_datetime(year, month, day, hour, minute, second):
+    # 2026-01-01 00:06:18 -> 2026年1月1日0点6分18秒
+    return f"{year}年{int(month)}月{int(day)}日{int(hour)}点{int(minute)}分{int(second)}秒"
+
+
+def replace_date(year, month, day):
+    return f"{year}年{int(month)}月{int(day)}日"
+
+
+def replace_time(hour, minute, second):
+    return f"{int(hour)}点{int(minute)}分{int(second)}秒"
+
+
+# 规范化规则表: (名称, 正则, 替换)，同一位置按表中顺序优先匹配
+# 替换为字符串时直接替换，为函数时以正则的各分组为参数调用
+NORMALIZE_RULES = [
+    # 1. 修正主变编号 (#2主变 -> 2号主变)
+    ("main_transformer", r'#(\d+)主变', lambda no: f"{no}号主变"),
+    # 2. 处理日期时间，支持多种分隔符(空格或T)和全角半角冒号
+    ("datetime", r'(\d{4})-(\d{1,2})-(\d{1,2})[\sT]+(\d{1,2})[:：](\d{1,2})[:：](\d{1,2})', replace_datetime),
+    # 注意：这里要避免误伤 WXH-813A 这种格式，所以限定年份为4位数字
+    ("date", r'(\d{4})-(\d{1,2})-(\d{1,2})', replace_date),
+    # 3. 单独处理时间 (00:06:18 -> 0点6分18秒)
+    ("time", r'(?<!\d)(\d{1,2})[:：](\d{1,2})[:：](\d{1,2})(?!\d)', replace_time),
+    # 4.1 处理 "- 设备名称" -> "设备名称" (行首匹配但不消耗换行，相邻的列表行都能处理)
+    ("list_dash", r'(?m:^)\s*-[^\S\n]+', ''),
+    # 4.2 处理 "1. 变电站" -> "变电站" (数字序号)
+    ("list_number", r'(?m:^)\s*\d+\.[^\S\n]*', ''),
+]
+
+# 全部规则可能的首字符，扫描时先用它过滤，新增规则以其他字符开头时需要补充
+RULE_FIRST_CHARS = r'#\d\s\-'
+
+# 5. 电力单位读法表 (忽略大小写，数字后紧跟或带空格)，追加条目即可支持更多单位
+UNIT_READINGS = {
+    "MW": "兆瓦",
+    "MVA": "兆瓦",
+}
+
+
+class StreamingNormalizer:
+    """
+    流式文本规范化: 全部规则合并为一个正则，单次扫描完成替换
+
+    feed() 接收任意切分的文本块，只扣留末尾可能尚未完整的部分 (例如 "2026-01-0"、"26.03M"、
+    "#2主"、行首的 "- ")，其余部分立即规范化输出；flush() 输出剩余部分
+    """
+
+    def __init__(self, rules=None, units=None, first_chars: str = RULE_FIRST_CHARS):
+        rules = list(NORMALIZE_RULES if rules is None else rules)
+        units = UNIT_READINGS if units is None else units
+        if units:
+            self._units = {k.lower(): v for k, v in units.items()}
+            names = sorted(units, key=len, reverse=True)  # 长的单位优先 (MVA 先于 MV)
+            unit_pattern = "|".join(re.escape(n) for n in names)
+            rules.append(("unit", rf'(\d+(?:\.\d+)?)\s*(?i:({unit_pattern}))', self._replace_unit))
+
+        # 合并为一个正则，记录每条规则的外层分组和其内部分组的位置，匹配后直接取出分组调用替换
+        self._pattern = re.compile(f"(?=[{first_chars}])(?:"
+                                   + "|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in rules) + ")")
+        self._rules = {}
+        for name, pattern, replace in rules:
+            index = self._pattern.groupindex[name]
+            self._rules[name] = (index, index + re.compile(pattern).groups, replace)
+        self._first = re.compile(f"[{first_chars}]")
+
+        # 末尾可能未完整的部分: 数字串 (日期、时间、数值及其后的空白)、未写完的单位、主变编号
+        number = r'\d[\d\-:：.\sT]*'
+        tails = [number, r'#\d*主?']
+        prefixes = {n[:i] for n in units for i in range(1, len(n) + 1)} - {""}
+        # 完整的单位如果是更长单位的前缀 (kW / kWh)，也需要扣留
+        prefixes = {p for p in prefixes if p not in units or any(len(u) > len(p) and u.startswith(p) for u in units)}
+        if prefixes:
+            prefix_pattern = "|".join(re.escape(p) for p in sorted(prefixes, key=len, reverse=True))
+            tails.append(rf'{number}(?i:{prefix_pattern})')
+        self._tail = re.compile(f"(?:{'|'.join(tails)})\\Z")
+        # 扣留部分之前的行首空白和列表符号，列表规则需要和后文一起匹配
+        self._line_start = re.compile(r'(?m:^)\s*-?[^\S\n]*\Z')
+        self.reset()
+
+    def reset(self):
+        self._text = ""   # 本次回答的原文 (保留已输出部分，供行首和后顾判断)
+        self._done = 0    # 已输出的原文长度
+
+    def _replace_unit(self, number, unit):
+        return number + self._units[unit.lower()]
+
+    def _normalize(self, text: str, start: int, end: int) -> str:
+        # 不修改实例状态，normalize() 可以在多个线程中共用
+        out = []
+        last = start
+        for match in self._pattern.finditer(text, start, end):
+            first, stop, replace = self._rules[match.lastgroup]
+            out.append(text[last:match.start()])
+            out.append(replace(*match.groups()[first:stop]) if callable(replace) else replace)
+            last = match.end()
+        out.append(text[last:end])
+        return "".join(out)
+
+    def feed(self, chunk: str) -> str:
+        """追加一段文本，返回可以确定的规范化结果"""
+        if self._done == len(self._text) and not self._first.search(chunk):
+            # 没有扣留的内容且新文本不可能命中任何规则，直接输出
+            self._text += chunk
+            self._done = len(self._text)
+            return chunk
+        self._text += chunk
+        tail = self._tail.search(self._text, self._done)
+        end = tail.start() if tail else len(self._text)
+        line_start = self._line_start.search(self._text, self._done, end)
+        if line_start:
+            end = line_start.start()
+        out = self._normalize(self._text, self._done, end)
+        self._done = end
+        return out
+
+    def flush(self) -> str:
+        """文本结束，输出剩余部分"""
+        out = self._normalize(self._text, self._done, len(self._text))
+        self.reset()
+        return out
+
+    def normalize(self, text: str) -> str:
+        """一次性规范化完整文本"""
+        return self._normalize(text, 0, len(text))
+
+
+_normalizer = None
+
+
 def process_agent_response(text):
     """
     处理 Agent 返回的文本，使其更适合 TTS 播报。
     包括：主变编号修正、日期时间格式化、列表符号处理等。
     """
+    global _normalizer
     if not text:
         return text
+    if _normalizer is None:
+        _normalizer = StreamingNormalizer()
+    return _normalizer.normalize(text)
 
-    # 1. 修正主变编号 (#2主变 -> 2号主变)
-    text = re.sub(r'#(\d+)主变', r'\1号主变', text)
-
-    # 2. 处理日期时间 (2026-01-01 00:06:18 -> 2026年1月1日0点6分18秒)
-    def replace_datetime(match):
-        year, month, day, hour, minute, second = match.groups()
-        return f"{year}年{int(month)}月{int(day)}日{int(hour)}点{int(minute)}分{int(second)}秒"
-    
-    # 增强正则：支持多种分隔符(空格或T)和全角半角冒号，防止漏网
-    text = re.sub(r'(\d{4})-(\d{1,2})-(\d{1,2})[\sT]+(\d{1,2})[:：](\d{1,2})[:：](\d{1,2})', replace_datetime, text)
-
-    def replace_date(match):
-        year, month, day = match.groups()
-        return f"{year}年{int(month)}月{int(day)}日"
-    
-    # 注意：这里要避免误伤 WXH-813A 这种格式，所以限定年份为4位数字
-    text = re.sub(r'(\d{4})-(\d{1,2})-(\d{1,2})', replace_date, text)
 
-    # 3. 单独处理时间 (00:06:18 -> 0点6分18秒)
-    def replace_time(match):
-        hour, minute, second = match.groups()
-        return f"{int(hour)}点{int(minute)}分{int(second)}秒"
-    
-    text = re.sub(r'(?<!\d)(\d{1,2})[:：](\d{1,2})[:：](\d{1,2})(?!\d)', replace_time, text)
-
-    # 4. 处理列表符号 
-    # 4.1 处理 "- 设备名称" -> "设备名称"
-    text = re.sub(r'(^|\n)\s*-\s+', r'\1', text)
-    # 4.2 处理 "1. 变电站" -> "变电站" (数字序号)
-    text = re.sub(r'(^|\n)\s*\d+\.\s*', r'\1', text)
+# 句末标点 (含换行)，流式回答在这些位置切分为句子
+SENTENCE_ENDINGS = "。！？；!?;\n"
+
+
+class SentenceSplitter:
+    """
+    把流式到达的回答文本切分为完整的句子，供逐句规范化并提交 TTS
+    过短的句子 (例如 "好。") 与下一句合并，避免 TTS 请求过碎
+    """
+    MIN_LENGTH = 4
+
+    def __init__(self):
+        self._buffer = ""
 
-    # 5. 处理电力单位 (MW/MVA -> 兆瓦)
-    # 忽略大小写，支持数字后紧跟或带空格
-    text = re.sub(r'(?i)(\d+(?:\.\d+)?)\s*(?:MW|MVA)', r'\1兆瓦', text)
+    def feed(self, delta: str) -> list:
+        """追加增量文本，返回已完整的句子"""
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for i, char in enumerate(self._buffer):
+            if char in SENTENCE_ENDINGS and len(self._buffer[start:i + 1].strip()) >= self.MIN_LENGTH:
+                sentences.append(self._buffer[start:i + 1])
+                start = i + 1
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """回答结束，返回剩余文本"""
+        text, self._buffer = self._buffer, ""
+        return text
 
-    return text
 
 if __name__ == "__main__":
     # 测试用例
@@ -1,12 +1,14 @@
 import logging
 import time
+import itertools
+from functools import lru_cache
 from asr.common import setup_logger
 
 # 配置日志
 logger = setup_logger("wake_word")
 
 try:
-    from pypinyin import lazy_pinyin
+    from pypinyin import lazy_pinyin, pinyin, Style
 except ImportError:
     lazy_pinyin = None
 
@@ -25,4 +27,133 @@ def check_wake_word(text, wake_word, wake_word_pinyin=None):
                         return True
         except Exception:
             pass
-    return False
\ No newline at end of file
+    return False
+
+
+# 模糊声母: 平翘舌不分、n/l 不分
+FUZZY_INITIALS = (("zh", "z"), ("ch", "c"), ("sh", "s"), ("l", "n"))
+# 单个短语展开多音字读音组合的上限
+MAX_READINGS = 64
+
+
+@lru_cache(maxsize=8192)
+def _char_syllables(char: str, tone: bool, fuzzy: bool, heteronym: bool) -> tuple:
+    """单个字符的拼音 (多音字可返回全部读音)，非汉字返回字符本身"""
+    if lazy_pinyin is None:
+        return (char,)
+    style = Style.TONE3 if tone else Style.NORMAL
+    readings = pinyin(char, style=style, heteronym=heteronym)[0]
+    if readings == [char]:
+        # 非汉字: 加括号与拼音区分 (例如字母 a 与 "啊")
+        return (f"<{char.lower()}>",)
+    if fuzzy:
+        readings = [_fuzzy(r) for r in readings]
+    return tuple(dict.fromkeys(readings))
+
+
+def _fuzzy(syllable: str) -> str:
+    for initial, replacement in FUZZY_INITIALS:
+        if syllable.startswith(initial):
+            return replacement + syllable[len(initial):]
+    return syllable
+
+
+class WakeWordMatcher:
+    """
+    增量多唤醒词匹配器
+
+    把文本逐字转换为拼音音节，用 Aho-Corasick 自动机在一次扫描中匹配全部唤醒词和指令短语。
+    流式识别的中间结果通常只在末尾增长或修改，update() 只转换并扫描与上次文本不同的后缀，
+    公共前缀部分的音节、自动机状态和命中结果直接复用。
+
+    唤醒词按字展开全部多音字读音，文本按字取默认读音，因此不依赖上下文分词。
+    """
+
+    def __init__(self, phrases, tone_sensitive: bool = False, fuzzy_initials: bool = False):
+        """
+        Args:
+            phrases: 唤醒词 / 指令短语列表
+            tone_sensitive: 是否区分声调 (默认不区分，与 check_wake_word 一致)
+            fuzzy_initials: 是否启用模糊声母 (zh/z, ch/c, sh/s, n/l)
+        """
+        if isinstance(phrases, str):
+            phrases = [phrases]
+        self.phrases = list(dict.fromkeys(phrases))
+        self.tone_sensitive = tone_sensitive
+        self.fuzzy_initials = fuzzy_initials
+        self._build()
+        self.reset()
+
+    def _syllables(self, char: str, heteronym: bool = False) -> tuple:
+        return _char_syllables(char, self.tone_sensitive, self.fuzzy_initials, heteronym)
+
+    def _build(self):
+        # goto 表: 每个状态一个 {音节: 下一状态}
+        self._goto = [{}]
+        self._output = [()]  # 每个状态命中的短语下标
+        for index, phrase in enumerate(self.phrases):
+            readings = [self._syllables(c, heteronym=True) for c in phrase]
+            for sequence in itertools.islice(itertools.product(*readings), MAX_READINGS):
+                state = 0
+                for syllable in sequence:
+                    nxt = self._goto[state].get(syllable)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][syllable] = nxt
+                        self._goto.append({})
+                        self._output.append(())
+                    state = nxt
+                if index not in self._output[state]:
+                    self._output[state] += (index,)
+
+        # 广度优先计算失配指针，并合并后缀状态的输出
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for syllable, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and syllable not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(syllable, 0)
+                self._output[nxt] += self._output[self._fail[nxt]]
+
+    def _step(self, state: int, syllable: str) -> int:
+        while state and syllable not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(syllable, 0)
+
+    def reset(self):
+        """开始新的一句"""
+        self._text = ""
+        self._states = [0]  # _states[i]: 扫描完前 i 个字后的状态
+        self._matches = []  # (结束位置, 短语下标)，按结束位置递增
+
+    def update(self, text: str) -> list:
+        """
+        输入当前的完整中间结果，返回其中命中的短语 (按命中位置排序，去重)
+        """
+        prefix = 0
+        limit = min(len(text), len(self._text))
+        while prefix < limit and text[prefix] == self._text[prefix]:
+            prefix += 1
+
+        # 丢弃被修改部分的状态和命中
+        del self._states[prefix + 1:]
+        while self._matches and self._matches[-1][0] > prefix:
+            self._matches.pop()
+
+        state = self._states[-1]
+        for position in range(prefix, len(text)):
+            # 文本侧每个字只取默认读音
+            state = self._step(state, self._syllables(text[position])[0])
+            self._states.append(state)
+            for index in self._output[state]:
+                self._matches.append((position + 1, index))
+        self._text = text
+        return list(dict.fromkeys(self.phrases[index] for _, index in self._matches))
+
+    def match(self, text: str) -> list:
+        """无状态匹配: 重新扫描整段文本"""
+        self.reset()
+        return self.update(text)
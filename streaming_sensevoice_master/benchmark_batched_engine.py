@@ -0,0 +1,111 @@
+"""
+Load benchmark of K concurrent streams, with or without BatchedStreamingEngine.
+
+Every stream replays the wav file (or noise) in real time, 100 ms per
+request. The partial-result latency is the time between submitting a chunk
+and getting its hypotheses back, RTF is the compute time over the total
+duration of the K streams.
+
+```bash
+python benchmark_batched_engine.py --streams 16 --mode batched
+python benchmark_batched_engine.py --streams 16 --mode sequential
+```
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+
+from streaming_sensevoice import BatchedStreamingEngine, StreamingSenseVoice
+
+
+def replay(session, samples, step, infer, latencies):
+    begin = time.perf_counter()
+    for n, i in enumerate(range(0, len(samples), step)):
+        # pace the stream in real time
+        delay = begin + n * step / 16000 - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        is_last = i + step >= len(samples)
+        submitted = time.perf_counter()
+        results = infer(session, samples[i : i + step], is_last)
+        if len(results) > 0:
+            latencies.append(time.perf_counter() - submitted)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav", default=None, help="16k wav, noise if not set")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--mode", choices=["batched", "sequential"], default="batched")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--encoder-cache", action="store_true")
+    parser.add_argument("--model", default="iic/SenseVoiceSmall")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    if args.wav is not None:
+        samples, _ = sf.read(args.wav, dtype="float32")
+    else:
+        samples = np.random.randn(int(args.seconds * 16000)).astype(np.float32) * 0.1
+    samples = samples * 32768
+    step = int(0.1 * 16000)
+
+    sessions = [
+        StreamingSenseVoice(
+            model=args.model, device=args.device, encoder_cache=args.encoder_cache
+        )
+        for _ in range(args.streams)
+    ]
+    busy_time = [0.0]
+    if args.mode == "batched":
+        engine = BatchedStreamingEngine(args.max_batch_size, args.max_wait_ms)
+
+        def infer(session, audio, is_last):
+            return engine.submit(session, audio, is_last).result()
+
+    else:
+        # one inference at a time, as in a single event loop
+        lock = threading.Lock()
+
+        def infer(session, audio, is_last):
+            with lock:
+                begin = time.perf_counter()
+                results = list(session.streaming_inference(audio, is_last))
+                busy_time[0] += time.perf_counter() - begin
+            return results
+
+    latencies = [[] for _ in sessions]
+    threads = [
+        threading.Thread(
+            target=replay, args=(session, samples, step, infer, latencies[k])
+        )
+        for k, session in enumerate(sessions)
+    ]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+    if args.mode == "batched":
+        busy_time[0] = engine.busy_time
+        engine.close()
+
+    latencies = np.array([t for stream in latencies for t in stream]) * 1000
+    duration = len(samples) / 16000 * args.streams
+    print(f"mode={args.mode} streams={args.streams} wall={elapsed:.1f}s")
+    print(
+        f"partial latency p50 {np.percentile(latencies, 50):.1f} ms, "
+        f"p99 {np.percentile(latencies, 99):.1f} ms"
+    )
+    print(f"total RTF {busy_time[0] / duration:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare the windowed and the cached streaming encoder on a wav file.
+
+Every hypothesis emitted with `encoder_cache=True` is compared with the one
+emitted at the same step by the windowed encoder, the script fails when the
+character error rate between them exceeds `--tolerance`.
+
+```bash
+python benchmark_encoder_cache.py --wav data/test_16k.wav --tolerance 0.1
+```
+"""
+
+import argparse
+import sys
+import time
+
+import soundfile as sf
+
+from streaming_sensevoice import StreamingSenseVoice
+
+
+def edit_distance(ref, hyp):
+    dp = list(range(len(hyp) + 1))
+    for i in range(1, len(ref) + 1):
+        prev, dp[0] = dp[0], i
+        for j in range(1, len(hyp) + 1):
+            cur = dp[j]
+            dp[j] = min(dp[j] + 1, dp[j - 1] + 1, prev + (ref[i - 1] != hyp[j - 1]))
+            prev = cur
+    return dp[-1]
+
+
+def transcribe(model, samples, step):
+    model.reset()
+    hyps = []
+    begin = time.perf_counter()
+    for i in range(0, len(samples), step):
+        is_last = i + step >= len(samples)
+        for res in model.streaming_inference(samples[i : i + step], is_last):
+            hyps.append(res["text"])
+    return hyps, time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav", default="data/test_16k.wav")
+    parser.add_argument("--model", default="iic/SenseVoiceSmall")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    samples, sr = sf.read(args.wav)
+    samples = samples * 32768
+    duration = len(samples) / sr
+    step = int(0.1 * sr)
+
+    results = {}
+    for encoder_cache in (False, True):
+        model = StreamingSenseVoice(
+            model=args.model, device=args.device, encoder_cache=encoder_cache
+        )
+        # warm up
+        transcribe(model, samples[:sr], step)
+        hyps, elapsed = transcribe(model, samples, step)
+        results[encoder_cache] = hyps
+        print(
+            f"encoder_cache={encoder_cache}: {elapsed:.3f}s, "
+            f"rtf {elapsed / duration:.3f}, {len(hyps)} hypotheses"
+        )
+        print(f"  {hyps[-1] if hyps else ''}")
+
+    max_cer = 0.0
+    for ref, hyp in zip(results[False], results[True]):
+        max_cer = max(max_cer, edit_distance(ref, hyp) / max(len(ref), 1))
+    print(f"max CER between hypotheses: {max_cer:.3f} (tolerance {args.tolerance})")
+    if len(results[False]) != len(results[True]) or max_cer > args.tolerance:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the streaming feature cache, without the encoder.
+
+Feeds 100 ms chunks of noise through OnlineFbank and compares the time and
+the number of tensor allocations per chunk of the former per-frame
+`torch.roll` cache with `FeatureCache`.
+
+```bash
+python benchmark_feature_cache.py --seconds 60
+```
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+from online_fbank import OnlineFbank
+from torch.profiler import ProfilerActivity, profile
+
+from streaming_sensevoice.streaming_sensevoice import FeatureCache
+
+CHUNK_SIZE = 10
+PADDING = 8
+INPUT_SIZE = 560
+
+
+def roll_cache(chunks):
+    caches = torch.zeros((CHUNK_SIZE + 2 * PADDING, INPUT_SIZE))
+    fbank = OnlineFbank(window_type="hamming")
+    for chunk in chunks:
+        fbank.accept_waveform(chunk, False)
+        features = fbank.get_lfr_frames()
+        for feature in torch.unbind(torch.tensor(features), dim=0):
+            caches = torch.roll(caches, -1, dims=0)
+            caches[-1, :] = feature
+        caches[PADDING:]
+
+
+def ring_cache(chunks):
+    caches = FeatureCache(CHUNK_SIZE + 2 * PADDING, INPUT_SIZE)
+    fbank = OnlineFbank(window_type="hamming")
+    for chunk in chunks:
+        fbank.accept_waveform(chunk, False)
+        features = fbank.get_lfr_frames()
+        if len(features) > 0:
+            caches.extend(torch.from_numpy(np.asarray(features, dtype=np.float32)))
+        caches.window()[PADDING:]
+
+
+def count_allocations(fn, chunks):
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn(chunks)
+    return sum(1 for event in prof.events() if event.cpu_memory_usage > 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=60)
+    args = parser.parse_args()
+
+    sample_rate = 16000
+    step = int(0.1 * sample_rate)
+    samples = np.random.randn(args.seconds * sample_rate).astype(np.float32) * 1000
+    chunks = [samples[i : i + step] for i in range(0, len(samples), step)]
+
+    for name, fn in (("torch.roll", roll_cache), ("FeatureCache", ring_cache)):
+        fn(chunks[:10])
+        begin = time.perf_counter()
+        fn(chunks)
+        elapsed = time.perf_counter() - begin
+        allocations = count_allocations(fn, chunks)
+        print(
+            f"{name:>12}: {elapsed / len(chunks) * 1e6:8.1f} us/chunk, "
+            f"{allocations / len(chunks):6.1f} tensor allocations/chunk"
+        )
+
+
+if __name__ == "__main__":
+    main()
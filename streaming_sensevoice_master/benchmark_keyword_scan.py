@@ -0,0 +1,103 @@
+"""
+Per-chunk cost of the barge-in check: prefix beam search + substring match
+versus KeywordScanner on the same CTC log-probs.
+
+The log-probs are synthetic so the benchmark runs without the model: every
+frame is peaky on blank or on a random token, and the keyword tokens are
+spiked in order in half of the utterances. The detection rate and the false
+alarms of the scanner are reported with the timings.
+
+```bash
+python benchmark_keyword_scan.py --utterances 200 --threshold 0.5
+```
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+from asr_decoder import CTCDecoder
+
+from streaming_sensevoice import KeywordScanner
+
+
+def make_utterance(rng, frames, vocab_size, keyword, with_keyword):
+    logits = rng.normal(0.0, 1.0, (frames, vocab_size)).astype(np.float32)
+    # mostly blank, with a token every few frames
+    tokens = np.where(rng.random(frames) < 0.3, rng.integers(1, vocab_size, frames), 0)
+    if with_keyword:
+        beg = int(rng.integers(0, frames - 3 * len(keyword)))
+        # spoken keyword: each token spiked once, separated by blanks
+        tokens[beg : beg + 3 * len(keyword)] = 0
+        tokens[beg : beg + 3 * len(keyword) : 3] = keyword
+    logits[np.arange(frames), tokens] += 12.0
+    return torch.from_numpy(logits).log_softmax(dim=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--utterances", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=50, help="60ms frames per utterance")
+    parser.add_argument("--chunk-size", type=int, default=10)
+    parser.add_argument("--vocab-size", type=int, default=25055)
+    parser.add_argument("--beam-size", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    keyword = [int(t) for t in rng.integers(1, args.vocab_size, 2)]
+    utterances = [
+        (make_utterance(rng, args.frames, args.vocab_size, keyword, i % 2 == 0), i % 2 == 0)
+        for i in range(args.utterances)
+    ]
+    num_chunks = sum((len(probs) + args.chunk_size - 1) // args.chunk_size for probs, _ in utterances)
+
+    decoder = CTCDecoder()
+    scanner = KeywordScanner({"keyword": keyword}, args.threshold)
+
+    begin = time.perf_counter()
+    beam_hits = 0
+    for probs, _ in utterances:
+        decoder.reset()
+        found = False
+        for i in range(0, len(probs), args.chunk_size):
+            is_last = i + args.chunk_size >= len(probs)
+            res = decoder.ctc_prefix_beam_search(
+                probs[i : i + args.chunk_size], beam_size=args.beam_size, is_last=is_last
+            )
+            # the text match of `core.run`, on token ids
+            tokens = res["tokens"][0]
+            found = found or any(tokens[j : j + len(keyword)] == keyword for j in range(len(tokens)))
+        beam_hits += found
+    beam_elapsed = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    detected = false_alarms = 0
+    scores = []
+    for probs, with_keyword in utterances:
+        scanner.reset()
+        hits = []
+        for i in range(0, len(probs), args.chunk_size):
+            hits.extend(scanner.scan(probs[i : i + args.chunk_size]))
+        if hits:
+            scores.append(hits[0]["score"])
+        detected += with_keyword and len(hits) > 0
+        false_alarms += not with_keyword and len(hits) > 0
+    scan_elapsed = time.perf_counter() - begin
+
+    num_keyword = sum(with_keyword for _, with_keyword in utterances)
+    print(
+        f"beam search: {beam_elapsed / num_chunks * 1000:7.3f} ms/chunk, "
+        f"{beam_hits}/{num_keyword} keywords found"
+    )
+    print(
+        f"    scanner: {scan_elapsed / num_chunks * 1000:7.3f} ms/chunk, "
+        f"{detected}/{num_keyword} detected, {false_alarms} false alarms, "
+        f"mean confidence {np.mean(scores) if scores else 0:.3f}"
+    )
+    print(f"    speedup: {beam_elapsed / scan_elapsed:.1f}x over {num_chunks} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Setup time of a StreamingSenseVoice session, as done for every websocket
+connection of the realtime server, with and without the shared caches.
+
+- cold:    the caches are cleared before every session, the symbol table, the
+           hotword graph and the queries are rebuilt like in a new process
+- restart: the in-process caches are cleared but the symbol table is loaded
+           from `symbol_table.json` next to the bpe model (--persist)
+- cached:  the artifacts are shared by all the sessions of the process
+
+The model weights are loaded once before timing in all the modes.
+
+```bash
+python benchmark_session_setup.py --sessions 20 --contexts 小安 变
+python benchmark_session_setup.py --sessions 20 --contexts 小安 变 --persist
+```
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from streaming_sensevoice import StreamingSenseVoice
+from streaming_sensevoice import streaming_sensevoice as cache
+
+
+def clear():
+    cache.sensevoice_queries.clear()
+    cache.symbol_tables.clear()
+    cache.context_graphs.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--contexts", nargs="*", default=None, help="hotwords, none for the realtime server")
+    parser.add_argument("--persist", action="store_true", help="also time the restart mode")
+    parser.add_argument("--model", default="iic/SenseVoiceSmall")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    StreamingSenseVoice.load_model(model=args.model, device=args.device)
+    modes = ["cold", "restart", "cached"] if args.persist else ["cold", "cached"]
+    for mode in modes:
+        if mode == "restart":
+            # write the symbol table once
+            StreamingSenseVoice(contexts=args.contexts, model=args.model, device=args.device, persist_cache=True)
+        elapsed = []
+        for _ in range(args.sessions):
+            if mode != "cached":
+                clear()
+            begin = time.perf_counter()
+            StreamingSenseVoice(
+                contexts=args.contexts,
+                model=args.model,
+                device=args.device,
+                persist_cache=mode == "restart",
+            )
+            elapsed.append(time.perf_counter() - begin)
+        elapsed = np.array(elapsed) * 1000
+        print(
+            f"{mode:>8}: p50 {np.median(elapsed):8.2f} ms, max {elapsed.max():8.2f} ms "
+            f"per session ({args.sessions} sessions)"
+        )
+
+
+if __name__ == "__main__":
+    main()
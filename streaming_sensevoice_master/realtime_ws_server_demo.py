@@ -50,9 +50,17 @@ import numpy as np
 
 import sys, uuid
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import soundfile as sf
 import io
 
+try:
+    import av
+except ImportError:
+    av = None
+
 
 class Config(BaseSettings, cli_parse_args=True, cli_use_class_docs_for_groups=True):
     HOST: str = Field("127.0.0.1", description="Host")
@@ -69,6 +77,18 @@ class Config(BaseSettings, cli_parse_args=True, cli_use_class_docs_for_groups=Tr
         550, description="VAD min slience duration (ms)"
     )
     VAD_THRESHOLD: float = Field(0.5, description="VAD threshold")
+    BATCH_MAX_SIZE: int = Field(
+        0, description="Max sessions per batched encoder forward, 0 to disable"
+    )
+    BATCH_MAX_WAIT_MS: float = Field(
+        10.0, description="Max wait (ms) to collect chunks into one batch"
+    )
+    INFERENCE_WORKERS: int = Field(
+        4, description="Worker threads running decoding, VAD and unbatched ASR"
+    )
+    SESSION_QUEUE_SIZE: int = Field(
+        32, description="Max pending messages per session before reads stop"
+    )
 
 
 config = Config()
@@ -83,11 +103,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from streaming_sensevoice import StreamingSenseVoice
+from streaming_sensevoice import BatchedStreamingEngine, StreamingSenseVoice
 
 # load model on startup
 StreamingSenseVoice.load_model(model=config.SENSEVOICE_MODEL_PATH, device=config.DEVICE)
 
+# batch the encoder forwards of all sessions
+engine = None
+if config.BATCH_MAX_SIZE > 0:
+    engine = BatchedStreamingEngine(
+        max_batch_size=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS
+    )
+
+# decoding, VAD and ASR run here, the event loop only does websocket I/O
+executor = ThreadPoolExecutor(max_workers=config.INFERENCE_WORKERS)
+
 
 class TranscriptionChunk(BaseModel):
     timestamps: list[int]
@@ -116,8 +146,282 @@ async def clientHost():
     return FileResponse("realtime_ws_client.html", media_type="text/html")
 
 
+class AudioRingBuffer:
+    """Preallocated sample buffer between the decoded messages and the VAD chunks."""
+
+    def __init__(self, capacity: int):
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.begin = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def write(self, samples: np.ndarray, scale: float = 1.0):
+        capacity = len(self.buffer)
+        if self.size + len(samples) > capacity:
+            # grow only when one message does not fit, keep the samples in order
+            size = self.size
+            buffer = np.zeros(max(2 * capacity, size + len(samples)), np.float32)
+            buffer[:size] = self.read(size)
+            self.buffer, self.begin, self.size = buffer, 0, size
+            capacity = len(self.buffer)
+        end = (self.begin + self.size) % capacity
+        n = min(len(samples), capacity - end)
+        if scale == 1.0:
+            self.buffer[end : end + n] = samples[:n]
+            self.buffer[: len(samples) - n] = samples[n:]
+        else:
+            # convert while copying, no intermediate float array
+            np.multiply(samples[:n], scale, out=self.buffer[end : end + n])
+            np.multiply(samples[n:], scale, out=self.buffer[: len(samples) - n])
+        self.size += len(samples)
+
+    def read(self, size: int) -> np.ndarray:
+        n = min(size, len(self.buffer) - self.begin)
+        chunk = np.empty(size, dtype=np.float32)
+        chunk[:n] = self.buffer[self.begin : self.begin + n]
+        chunk[n:] = self.buffer[: size - n]
+        self.begin = (self.begin + size) % len(self.buffer)
+        self.size -= size
+        return chunk
+
+
+# format -> (little-endian dtype, scale to float samples in [-1, 1])
+PCM_FORMATS = {"pcm_s16le": ("<i2", 1 / 32768), "pcm_f32le": ("<f4", 1.0)}
+COMPRESSED_FORMATS = ("mp3",)
+
+
+class PCMDecoder:
+    """Raw PCM, viewed with np.frombuffer without decoding or copying."""
+
+    def __init__(self, audio_format: str):
+        dtype, self.scale = PCM_FORMATS[audio_format]
+        self.dtype = np.dtype(dtype)
+        self.remainder = b""
+
+    def decode(self, data: bytes) -> np.ndarray:
+        if self.remainder:
+            data = self.remainder + data
+        # keep a sample split across two messages for the next one
+        count = len(data) // self.dtype.itemsize
+        self.remainder = data[count * self.dtype.itemsize :]
+        return np.frombuffer(data, dtype=self.dtype, count=count)
+
+
+class CompressedDecoder:
+    """Streaming decoder kept alive for the whole session.
+
+    Uses PyAV when installed, so frames split across messages are decoded
+    once complete. Otherwise every message is decoded with soundfile, and a
+    message that fails to decode is retried once together with the next
+    message, then dropped.
+    """
+
+    scale = 1.0
+
+    def __init__(self, audio_format: str):
+        self.audio_format = audio_format
+        self.pending = b""
+        self.codec = None
+        if av is not None:
+            self.codec = av.CodecContext.create(audio_format, "r")
+            self.resampler = av.AudioResampler(
+                format="flt", layout="mono", rate=config.SAMPLERATE
+            )
+
+    def decode(self, data: bytes) -> np.ndarray:
+        if self.codec is not None:
+            samples = []
+            for packet in self.codec.parse(data):
+                for frame in self.codec.decode(packet):
+                    for resampled in self.resampler.resample(frame):
+                        samples.append(resampled.to_ndarray()[0])
+            return np.concatenate(samples) if samples else np.zeros(0, np.float32)
+
+        pending, self.pending = self.pending, b""
+        decoded = None
+        if pending:
+            decoded = self.read(pending + data)
+            if decoded is None:
+                logger.warning(
+                    f"Dropped {len(pending)} bytes of {self.audio_format} audio that failed to decode"
+                )
+        if decoded is None:
+            decoded = self.read(data)
+        if decoded is None:
+            # possibly a frame split across messages, retry once with the next one
+            self.pending = data
+            return np.zeros(0, np.float32)
+        samples, sr = decoded
+
+        if sr != config.SAMPLERATE:
+            raise ValueError("Sample rate mismatch")
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        return samples
+
+    def read(self, data: bytes):
+        """Returns (samples, sample rate), None if soundfile can not decode the bytes."""
+        buffer = io.BytesIO(data)
+        try:
+            buffer.name = f"a.{self.audio_format}"
+
+            return sf.read(buffer, dtype="float32")
+        except sf.LibsndfileError as e:
+            logger.debug(f"Decode failed: {e}")
+            return None
+        finally:
+            buffer.close()
+
+
+class RealtimeSession:
+    """State of one websocket session, only one message of it is processed at a time."""
+
+    def __init__(
+        self,
+        session_id: str,
+        chunk_duration: float,
+        vad_threshold: float,
+        vad_min_silence_duration_ms: int,
+        audio_format: str = "mp3",
+    ):
+        self.session_id = session_id
+        if audio_format in PCM_FORMATS:
+            self.decoder = PCMDecoder(audio_format)
+        else:
+            self.decoder = CompressedDecoder(audio_format)
+        self.sensevoice_model = StreamingSenseVoice(
+            model=config.SENSEVOICE_MODEL_PATH, device=config.DEVICE
+        )
+        self.vad_iterator = VADIterator(
+            version=config.SILEROVAD_VERSION,
+            threshold=vad_threshold,
+            min_silence_duration_ms=vad_min_silence_duration_ms,
+        )
+
+        self.chunk_size = int(chunk_duration * config.SAMPLERATE)
+        self.audio_buffer = AudioRingBuffer(max(config.SAMPLERATE, 4 * self.chunk_size))
+
+        self.speech_count = 0
+        self.currentAudioBeginTime = 0.0
+        self.asrDetected = False
+        self.transcription_response: TranscriptionResponse = None
+
+    def detect(self, data: bytes) -> list:
+        """Decode one message and run VAD, returns [(speech_dict, speech_samples)]."""
+        self.audio_buffer.write(self.decoder.decode(data), self.decoder.scale)
+
+        segments = []
+        while len(self.audio_buffer) >= self.chunk_size:
+            chunk = self.audio_buffer.read(self.chunk_size)
+            segments.extend(self.vad_iterator(chunk))
+        return segments
+
+    async def infer(self, speech_samples, is_last):
+        if engine is not None:
+            # wait for the batch on the event loop, a session waiting for the
+            # engine must not hold a worker, or at most INFERENCE_WORKERS
+            # sessions could be batched together
+            return await engine.streaming_inference(
+                self.sensevoice_model, speech_samples, is_last
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            executor,
+            lambda: list(
+                self.sensevoice_model.streaming_inference(speech_samples, is_last)
+            ),
+        )
+
+    async def process(self, data: bytes) -> list[dict]:
+        """Decode one message, run VAD and ASR, returns the messages to send."""
+        messages = []
+
+        segments = await asyncio.get_running_loop().run_in_executor(
+            executor, self.detect, data
+        )
+        for speech_dict, speech_samples in segments:
+            if "start" in speech_dict:
+                self.sensevoice_model.reset()
+
+                self.currentAudioBeginTime = (
+                    speech_dict["start"] / config.SAMPLERATE
+                )
+
+                if self.asrDetected:
+                    logger.debug(
+                        f"{self.speech_count}: VAD *NOT* end: \n{self.transcription_response.data.raw_text}\n{str(self.transcription_response.data.timestamps)}"
+                    )
+                    self.speech_count += 1
+                self.asrDetected = False
+
+                logger.debug(
+                    f"{self.speech_count}: VAD start: {self.currentAudioBeginTime}"
+                )
+                messages.append(VADEvent(is_active=True).model_dump())
+
+            is_last = "end" in speech_dict
+
+            for res in await self.infer(speech_samples, is_last):
+
+                if len(res["text"]) > 0:
+                    self.asrDetected = True
+
+                if self.asrDetected:
+                    self.transcription_response = TranscriptionResponse(
+                        id=self.speech_count,
+                        begin_at=self.currentAudioBeginTime,
+                        end_at=None,
+                        data=TranscriptionChunk(
+                            timestamps=res["timestamps"], raw_text=res["text"]
+                        ),
+                        is_final=False,
+                        session_id=self.session_id,
+                    )
+                    messages.append(self.transcription_response.model_dump())
+
+            if is_last:
+                if self.asrDetected:
+                    self.speech_count += 1
+                    self.asrDetected = False
+
+                    self.transcription_response.is_final = True
+                    self.transcription_response.end_at = (
+                        speech_dict["end"] / config.SAMPLERATE
+                    )
+
+                    messages.append(self.transcription_response.model_dump())
+                    logger.debug(
+                        f"{self.speech_count}: VAD end: {speech_dict['end'] / config.SAMPLERATE}\n{self.transcription_response.data.raw_text}\n{str(self.transcription_response.data.timestamps)}"
+                    )
+                else:
+                    logger.debug(
+                        f"{self.speech_count}: VAD end: {speech_dict['end'] / config.SAMPLERATE}\nNo Speech"
+                    )
+                messages.append(VADEvent(is_active=False).model_dump())
+        return messages
+
+
+async def receive_audio(websocket: WebSocket, audio_queue: asyncio.Queue):
+    while True:
+        # blocks when the session is behind, the client then sees TCP backpressure
+        await audio_queue.put(await websocket.receive_bytes())
+
+
+async def process_audio(
+    websocket: WebSocket, session: RealtimeSession, audio_queue: asyncio.Queue
+):
+    while True:
+        data = await audio_queue.get()
+        # one message of a session in flight at a time keeps the results in order
+        messages = await session.process(data)
+        for message in messages:
+            await websocket.send_json(message)
+
+
 @app.websocket("/api/realtime/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    session_id = None
     try:
         await websocket.accept()
 
@@ -126,130 +430,55 @@ async def websocket_endpoint(websocket: WebSocket):
 
         query_params = parse_qs(websocket.scope["query_string"].decode())
         chunk_duration = float(
-            query_params.get("chunk_duration", config.CHUNK_DURATION)
+            query_params.get("chunk_duration", [config.CHUNK_DURATION])[0]
+        )
+        vad_threshold = float(
+            query_params.get("vad_threshold", [config.VAD_THRESHOLD])[0]
         )
-        vad_threshold = float(query_params.get("vad_threshold", config.VAD_THRESHOLD))
         vad_min_silence_duration_ms = int(
             query_params.get(
-                "vad_min_silence_duration_ms", config.VAD_MIN_SILENCE_DURATION_MS
-            )
+                "vad_min_silence_duration_ms", [config.VAD_MIN_SILENCE_DURATION_MS]
+            )[0]
         )
-
-        sensevoice_model = StreamingSenseVoice(
-            model=config.SENSEVOICE_MODEL_PATH, device=config.DEVICE
-        )
-        vad_iterator = VADIterator(
-            version=config.SILEROVAD_VERSION,
-            threshold=vad_threshold,
-            min_silence_duration_ms=vad_min_silence_duration_ms,
+        # binary frame format, raw PCM must be sent at the server sample rate
+        audio_format = query_params.get("format", ["mp3"])[0]
+        sample_rate = int(query_params.get("sample_rate", [config.SAMPLERATE])[0])
+        if audio_format not in PCM_FORMATS and audio_format not in COMPRESSED_FORMATS:
+            await websocket.close(
+                code=1003, reason=f"Unsupported format {audio_format}"
+            )
+            return
+        if audio_format in PCM_FORMATS and sample_rate != config.SAMPLERATE:
+            await websocket.close(
+                code=1003, reason=f"Sample rate must be {config.SAMPLERATE}"
+            )
+            return
+
+        session = await asyncio.get_running_loop().run_in_executor(
+            executor,
+            RealtimeSession,
+            session_id,
+            chunk_duration,
+            vad_threshold,
+            vad_min_silence_duration_ms,
+            audio_format,
         )
-
-        audio_buffer = np.array([], dtype=np.float32)
-        chunk_size = int(chunk_duration * config.SAMPLERATE)
-
-        speech_count = 0
-        currentAudioBeginTime = 0.0
-
-        asrDetected = False
-
-        transcription_response: TranscriptionResponse = None
-        while True:
-            data = await websocket.receive_bytes()
-
-            # mp3 decode
-            buffer = io.BytesIO(data)
-            try:
-                buffer.name = "a.mp3"
-
-                samples, sr = sf.read(buffer, dtype="float32")
-                audio_buffer = np.concatenate((audio_buffer, samples))
-            except sf.LibsndfileError as e:
-                continue
-            finally:
-                buffer.close()
-
-            if sr != config.SAMPLERATE:
-                raise ValueError("Sample rate mismatch")
-
-            while len(audio_buffer) >= chunk_size:
-                chunk = audio_buffer[:chunk_size]
-                audio_buffer = audio_buffer[chunk_size:]
-
-                for speech_dict, speech_samples in vad_iterator(chunk):
-                    if "start" in speech_dict:
-                        sensevoice_model.reset()
-
-                        currentAudioBeginTime: float = (
-                            speech_dict["start"] / config.SAMPLERATE
-                        )
-
-                        if asrDetected:
-                            logger.debug(
-                                f"{speech_count}: VAD *NOT* end: \n{transcription_response.data.raw_text}\n{str(transcription_response.data.timestamps)}"
-                            )
-                            speech_count += 1
-                        asrDetected = False
-
-                        logger.debug(
-                            f"{speech_count}: VAD start: {currentAudioBeginTime}"
-                        )
-                        await websocket.send_json(VADEvent(is_active=True).model_dump())
-
-                    is_last = "end" in speech_dict
-
-                    for res in sensevoice_model.streaming_inference(
-                        speech_samples, is_last
-                    ):
-
-                        if len(res["text"]) > 0:
-                            asrDetected = True
-
-                        if asrDetected:
-                            transcription_response = TranscriptionResponse(
-                                id=speech_count,
-                                begin_at=currentAudioBeginTime,
-                                end_at=None,
-                                data=TranscriptionChunk(
-                                    timestamps=res["timestamps"], raw_text=res["text"]
-                                ),
-                                is_final=False,
-                                session_id=session_id,
-                            )
-                            await websocket.send_json(
-                                transcription_response.model_dump()
-                            )
-
-                    if is_last:
-                        if asrDetected:
-                            speech_count += 1
-                            asrDetected = False
-
-                            transcription_response.is_final = True
-                            transcription_response.end_at = (
-                                speech_dict["end"] / config.SAMPLERATE
-                            )
-
-                            await websocket.send_json(
-                                transcription_response.model_dump()
-                            )
-                            logger.debug(
-                                f"{speech_count}: VAD end: {speech_dict['end'] / config.SAMPLERATE}\n{transcription_response.data.raw_text}\n{str(transcription_response.data.timestamps)}"
-                            )
-                        else:
-                            logger.debug(
-                                f"{speech_count}: VAD end: {speech_dict['end'] / config.SAMPLERATE}\nNo Speech"
-                            )
-                        await websocket.send_json(
-                            VADEvent(is_active=False).model_dump()
-                        )
+        audio_queue = asyncio.Queue(maxsize=config.SESSION_QUEUE_SIZE)
+
+        tasks = [
+            asyncio.create_task(receive_audio(websocket, audio_queue)),
+            asyncio.create_task(process_audio(websocket, session, audio_queue)),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     finally:
-        sensevoice_model.reset()
-        del sensevoice_model
-        del vad_iterator
-        del audio_buffer
         logger.info(f"Session {session_id} closed")
 
 
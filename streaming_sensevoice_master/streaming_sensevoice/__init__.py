@@ -12,4 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .engine import BatchedStreamingEngine
+from .keyword_scanner import KeywordScanner
 from .streaming_sensevoice import StreamingSenseVoice
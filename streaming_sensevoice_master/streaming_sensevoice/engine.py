@@ -0,0 +1,220 @@
+# Copyright (c) 2024, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import torch
+
+
+class BatchedStreamingEngine:
+    """Batch the encoder forwards of many StreamingSenseVoice sessions.
+
+    Requests of different sessions submitted within `max_wait_ms` of the
+    oldest pending one are encoded together, up to `max_batch_size` sessions
+    per forward. Feature extraction and decoding stay per session, the
+    requests of one session are processed in submission order.
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        # session id -> deque of (session, audio, is_last, future, arrival)
+        self.pending = OrderedDict()
+        self.busy_time = 0.0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, session, audio, is_last: bool = False) -> Future:
+        """Returns a future of the results `session.streaming_inference` yields."""
+        future = Future()
+        if not self.running:
+            future.set_exception(RuntimeError("BatchedStreamingEngine is closed"))
+            return future
+        self.requests.put((session, audio, is_last, future, time.perf_counter()))
+        return future
+
+    async def streaming_inference(self, session, audio, is_last: bool = False):
+        return await asyncio.wrap_future(self.submit(session, audio, is_last))
+
+    def close(self):
+        self.running = False
+        self.requests.put(None)
+        self.thread.join()
+        # the requests left are never processed, fail them so that their
+        # callers do not wait for ever
+        while True:
+            try:
+                self.add_pending(self.requests.get_nowait())
+            except queue.Empty:
+                break
+        for requests in self.pending.values():
+            for request in requests:
+                if not request[3].done():
+                    request[3].set_exception(
+                        RuntimeError("BatchedStreamingEngine is closed")
+                    )
+        self.pending.clear()
+
+    def add_pending(self, request):
+        if request is None:
+            return
+        self.pending.setdefault(id(request[0]), deque()).append(request)
+
+    def collect(self):
+        if not self.pending:
+            self.add_pending(self.requests.get())
+            if not self.pending:
+                return []
+        oldest = min(requests[0][4] for requests in self.pending.values())
+        deadline = oldest + self.max_wait
+        while self.running and len(self.pending) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                self.add_pending(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        # drain what is already queued without waiting
+        while True:
+            try:
+                self.add_pending(self.requests.get_nowait())
+            except queue.Empty:
+                break
+
+        batch = []
+        for key in list(self.pending.keys())[: self.max_batch_size]:
+            requests = self.pending[key]
+            batch.append(requests.popleft())
+            if not requests:
+                del self.pending[key]
+        return batch
+
+    def run(self):
+        while self.running:
+            batch = self.collect()
+            if batch:
+                begin = time.perf_counter()
+                self.process(batch)
+                self.busy_time += time.perf_counter() - begin
+
+    def process(self, batch):
+        chunks, results = [], []
+        for session, audio, is_last, future, _ in batch:
+            try:
+                # the feature window is reused by the next chunk, copy it
+                chunks.append(
+                    deque(
+                        (window.clone(), cur_size, last_chunk)
+                        for window, cur_size, last_chunk in session.get_chunks(
+                            audio, is_last
+                        )
+                    )
+                )
+            except Exception as e:
+                future.set_exception(e)
+                chunks.append(deque())
+            results.append([])
+
+        try:
+            while True:
+                active = [i for i in range(len(batch)) if chunks[i]]
+                if not active:
+                    break
+                jobs = [(batch[i][0], *chunks[i].popleft()) for i in active]
+                for i, job, probs in zip(active, jobs, self.forward(jobs)):
+                    results[i].append(job[0].decode_chunk(probs, job[3]))
+        except Exception as e:
+            for request in batch:
+                if not request[3].done():
+                    request[3].set_exception(e)
+            return
+
+        for request, result in zip(batch, results):
+            if not request[3].done():
+                request[3].set_result(result)
+
+    @torch.no_grad()
+    def forward(self, jobs):
+        inputs, groups = [], OrderedDict()
+        for i, (session, window, cur_size, is_last) in enumerate(jobs):
+            speech, num_skip, kwargs = session.get_encoder_input(
+                window, cur_size, is_last
+            )
+            inputs.append((speech, num_skip, kwargs))
+            key = (id(session.model), tuple(speech.shape))
+            if kwargs is not None:
+                caches = session.layer_caches
+                cache_sizes = None
+                if caches is not None:
+                    cache_sizes = (caches[0]["k"].size(2), caches[0]["fsmn"].size(1))
+                key += (tuple(sorted(kwargs.items())), cache_sizes)
+            groups.setdefault(key, []).append(i)
+
+        probs = [None] * len(jobs)
+        for indices in groups.values():
+            model = jobs[indices[0]][0].model
+            speech = torch.cat([inputs[i][0] for i in indices])
+            kwargs = inputs[indices[0]][2]
+            if kwargs is None:
+                speech_lengths = torch.full(
+                    (len(indices),), speech.size(1), device=speech.device
+                )
+                encoder_out, _ = model.encoder(speech, speech_lengths)
+            else:
+                cache = self.stack_caches([jobs[i][0].layer_caches for i in indices])
+                encoder_out, cache = model.encoder.forward_streaming(
+                    speech, cache, **kwargs
+                )
+                for b, i in enumerate(indices):
+                    jobs[i][0].layer_caches = self.split_caches(cache, b)
+            log_probs = model.ctc.log_softmax(encoder_out)
+            for b, i in enumerate(indices):
+                session, is_last = jobs[i][0], jobs[i][3]
+                chunk_probs = log_probs[b, inputs[i][1] :]
+                probs[i] = chunk_probs if is_last else chunk_probs[: session.chunk_size]
+        return probs
+
+    @staticmethod
+    def stack_caches(caches):
+        if caches[0] is None:
+            return None
+        return [
+            {
+                "k": torch.cat([cache[n]["k"] for cache in caches]),
+                "v": torch.cat([cache[n]["v"] for cache in caches]),
+                "fsmn": torch.cat([cache[n]["fsmn"] for cache in caches]),
+                "num_prefix": caches[0][n]["num_prefix"],
+            }
+            for n in range(len(caches[0]))
+        ]
+
+    @staticmethod
+    def split_caches(cache, b):
+        return [
+            {
+                "k": layer["k"][b : b + 1],
+                "v": layer["v"][b : b + 1],
+                "fsmn": layer["fsmn"][b : b + 1],
+                "num_prefix": layer["num_prefix"],
+            }
+            for layer in cache
+        ]
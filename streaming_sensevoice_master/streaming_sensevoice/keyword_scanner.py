@@ -0,0 +1,125 @@
+# Copyright (c) 2024, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class KeywordScanner:
+    """Windowed keyword spotting on CTC log-probs, without beam search.
+
+    For every end frame, the best in-order alignment of the keyword tokens
+    inside the last `window` frames is found with a max-product recursion:
+    `score_j(t) = max(score_j(t - 1), score_{j-1}(t - 1) + log p_t(token_j))`.
+    The confidence is the geometric mean posterior of the tokens on that path,
+    `exp(score_L / L)`, in [0, 1]. A keyword is reported once per chunk when
+    its confidence reaches its threshold, then its history is cleared so the
+    same utterance is not reported again.
+    """
+
+    def __init__(
+        self,
+        keywords: Dict[str, List[int]],
+        thresholds: Union[float, Dict[str, float]] = 0.5,
+        window: int = 20,
+        frame_ms: int = 60,
+    ):
+        """
+        Args:
+        keywords:
+            Keyword -> token ids (blank and empty pieces excluded).
+        thresholds:
+            Confidence threshold of all keywords, or keyword -> threshold.
+        window:
+            Number of encoder frames a keyword must fit in.
+        frame_ms:
+            Duration of an encoder frame, to report the end time.
+        """
+        self.window = window
+        self.frame_ms = frame_ms
+        self.names = list(keywords)
+        # gather the columns of all keywords with one index
+        self.token_ids = np.concatenate([np.asarray(keywords[k], dtype=np.int64) for k in self.names])
+        self.slices = []
+        beg = 0
+        for name in self.names:
+            num_tokens = len(keywords[name])
+            if num_tokens == 0:
+                raise ValueError(f"keyword {name!r} has no tokens")
+            self.slices.append(slice(beg, beg + num_tokens))
+            beg += num_tokens
+        if isinstance(thresholds, dict):
+            self.thresholds = [thresholds.get(name, 0.5) for name in self.names]
+        else:
+            self.thresholds = [thresholds] * len(self.names)
+        self.reset()
+
+    def reset(self):
+        self.frame = 0
+        # the last `window - 1` frames of token log-probs, -inf before the start
+        self.history = np.full((self.window - 1, len(self.token_ids)), -np.inf, dtype=np.float32)
+
+    def scores(self, log_probs: np.ndarray) -> np.ndarray:
+        """Confidence of every keyword at every frame of the chunk, (T, K)."""
+        frames = np.concatenate((self.history, log_probs))
+        # (T, tokens, window): the window ending at each frame of the chunk
+        windows = sliding_window_view(frames, self.window, axis=0)
+        scores = np.empty((len(log_probs), len(self.names)), dtype=np.float32)
+        for k, columns in enumerate(self.slices):
+            score = np.maximum.accumulate(windows[:, columns.start], axis=1)
+            for j in range(columns.start + 1, columns.stop):
+                # token j is aligned strictly after token j - 1
+                prev = np.full_like(score, -np.inf)
+                prev[:, 1:] = score[:, :-1]
+                score = np.maximum.accumulate(prev + windows[:, j], axis=1)
+            scores[:, k] = np.exp(score[:, -1] / (columns.stop - columns.start))
+        return scores
+
+    def scan(self, log_probs) -> List[dict]:
+        """Feed the log-probs of one chunk, (T, vocab) tensor or array.
+
+        Returns:
+            [{"keyword", "score", "end_ms"}] of the keywords detected in the
+            chunk, end_ms is relative to the last reset.
+        """
+        if hasattr(log_probs, "detach"):
+            log_probs = log_probs.detach()[:, self.token_ids].cpu().numpy()
+        else:
+            log_probs = np.asarray(log_probs)[:, self.token_ids]
+        log_probs = log_probs.astype(np.float32, copy=False)
+        if len(log_probs) == 0:
+            return []
+
+        scores = self.scores(log_probs)
+        hits = []
+        for k, name in enumerate(self.names):
+            t = int(np.argmax(scores[:, k]))
+            if scores[t, k] >= self.thresholds[k]:
+                hits.append(
+                    {
+                        "keyword": name,
+                        "score": float(scores[t, k]),
+                        "end_ms": (self.frame + t + 1) * self.frame_ms,
+                    }
+                )
+
+        self.frame += len(log_probs)
+        history = np.concatenate((self.history, log_probs))[-(self.window - 1) :]
+        for hit in hits:
+            # forget the detected keyword, it is reported once
+            history[:, self.slices[self.names.index(hit["keyword"])]] = -np.inf
+        self.history = history
+        return hits
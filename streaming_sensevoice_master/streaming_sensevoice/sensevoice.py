@@ -267,6 +267,83 @@ class MultiHeadedAttentionSANM(nn.Module):
         att_outs = self.forward_attention(v_h, scores, None)
         return att_outs + fsmn_memory, cache
 
+    def forward_fsmn_streaming(self, inputs, fsmn_cache):
+        """FSMN memory with the left context taken from the previous chunks.
+
+        Args:
+            inputs (torch.Tensor): Value tensor (#batch, time, size).
+            fsmn_cache (torch.Tensor): Last values of the previous chunks
+                (#batch, <= left_padding, size).
+
+        Returns:
+            torch.Tensor: Output tensor (#batch, time, size).
+
+        """
+        left_padding, right_padding = self.pad_fn.padding
+        x = torch.cat((fsmn_cache, inputs), dim=1).transpose(1, 2)
+        x = F.pad(x, (left_padding - fsmn_cache.size(1), right_padding))
+        x = self.fsmn_block(x)
+        x = x.transpose(1, 2)
+        x += inputs
+        return self.dropout(x)
+
+    def forward_streaming(
+        self, x, cache=None, num_stable=None, look_back=0, num_prefix=0
+    ):
+        """Compute self-attention over the cached frames and the new frames.
+
+        Only the first `num_stable` frames of `x` are committed to the cache,
+        the remaining look-ahead frames are fed again with the next chunk.
+        The first `num_prefix` frames of the first call (the query tokens) are
+        never evicted, the other cached frames are limited to `look_back`.
+
+        Args:
+            x (torch.Tensor): Input tensor (#batch, time, size).
+            cache (dict): {"k", "v", "fsmn", "num_prefix"} of the previous call.
+            num_stable (int): Number of frames of `x` to commit to the cache.
+            look_back (int): Number of history frames to keep in the cache.
+            num_prefix (int): Number of frames never evicted, first call only.
+
+        Returns:
+            torch.Tensor: Output tensor (#batch, time, d_model).
+            dict: Updated cache.
+
+        """
+        q_h, k_h, v_h, v = self.forward_qkv(x)
+        if num_stable is None:
+            num_stable = x.size(1)
+        if cache is None:
+            cache = {
+                "k": k_h[:, :, :0],
+                "v": v_h[:, :, :0],
+                "fsmn": v[:, :0],
+                "num_prefix": num_prefix,
+            }
+
+        fsmn_memory = self.forward_fsmn_streaming(v, cache["fsmn"])
+        k_h_all = torch.cat((cache["k"], k_h), dim=2)
+        v_h_all = torch.cat((cache["v"], v_h), dim=2)
+        q_h = q_h * self.d_k ** (-0.5)
+        scores = torch.matmul(q_h, k_h_all.transpose(-2, -1))
+        att_outs = self.forward_attention(v_h_all, scores, None)
+
+        # evict the look-ahead frames and the history beyond `look_back`
+        num_prefix = cache["num_prefix"]
+        end = cache["k"].size(2) + num_stable
+        beg = max(num_prefix, end - max(look_back, 0))
+        k_h_all = torch.cat((k_h_all[:, :, :num_prefix], k_h_all[:, :, beg:end]), dim=2)
+        v_h_all = torch.cat((v_h_all[:, :, :num_prefix], v_h_all[:, :, beg:end]), dim=2)
+        fsmn_cache = torch.cat((cache["fsmn"], v[:, :num_stable]), dim=1)
+        left_padding = self.pad_fn.padding[0]
+        fsmn_cache = fsmn_cache[:, max(fsmn_cache.size(1) - left_padding, 0) :]
+        new_cache = {
+            "k": k_h_all,
+            "v": v_h_all,
+            "fsmn": fsmn_cache,
+            "num_prefix": num_prefix,
+        }
+        return att_outs + fsmn_memory, new_cache
+
 
 class LayerNorm(nn.LayerNorm):
     def __init__(self, *args, **kwargs):
@@ -438,6 +515,47 @@ class EncoderLayerSANM(nn.Module):
 
         return x, cache
 
+    def forward_streaming(
+        self, x, cache=None, num_stable=None, look_back=0, num_prefix=0
+    ):
+        """Compute encoded features of the new frames with the cached history.
+
+        Args:
+            x (torch.Tensor): Input tensor (#batch, time, size).
+            cache (dict): Cache of the self-attention layer.
+            num_stable (int): Number of frames of `x` to commit to the cache.
+            look_back (int): Number of history frames to keep in the cache.
+            num_prefix (int): Number of frames never evicted, first call only.
+
+        Returns:
+            torch.Tensor: Output tensor (#batch, time, size).
+            dict: Updated cache.
+
+        """
+        residual = x
+        if self.normalize_before:
+            x = self.norm1(x)
+
+        attn, cache = self.self_attn.forward_streaming(
+            x, cache, num_stable, look_back, num_prefix
+        )
+        if self.in_size == self.size:
+            x = residual + attn
+        else:
+            x = attn
+
+        if not self.normalize_before:
+            x = self.norm1(x)
+
+        residual = x
+        if self.normalize_before:
+            x = self.norm2(x)
+        x = residual + self.feed_forward(x)
+        if not self.normalize_before:
+            x = self.norm2(x)
+
+        return x, cache
+
 
 @tables.register("encoder_classes", "SenseVoiceEncoderSmall")
 class SenseVoiceEncoderSmall(nn.Module):
@@ -581,6 +699,59 @@ class SenseVoiceEncoderSmall(nn.Module):
         xs_pad = self.tp_norm(xs_pad)
         return xs_pad, olens
 
+    def forward_streaming(
+        self,
+        xs_pad: torch.Tensor,
+        cache: Optional[list] = None,
+        num_stable: Optional[int] = None,
+        look_back: int = 0,
+        num_prefix: int = 0,
+        offset: int = 0,
+    ):
+        """Encode the new frames only, reusing the per-layer caches.
+
+        Args:
+            xs_pad: New frames (#batch, time, size), the first call may start
+                with `num_prefix` frames (the query tokens) kept for ever.
+            cache: Per-layer caches returned by the previous call.
+            num_stable: Number of frames committed to the caches, the rest is
+                look-ahead and must be fed again with the next chunk.
+            look_back: Number of history frames kept in each layer's cache.
+            offset: Position of the first frame of `xs_pad`.
+
+        Returns:
+            torch.Tensor: Encoded frames (#batch, time, output_size).
+            list: Updated per-layer caches.
+        """
+        batch_size, timesteps, input_dim = xs_pad.size()
+        xs_pad = xs_pad * self.output_size() ** 0.5
+        positions = torch.arange(
+            offset + 1, offset + timesteps + 1, device=xs_pad.device
+        )[None, :]
+        xs_pad = xs_pad + self.embed.encode(positions, input_dim, xs_pad.dtype)
+
+        num_layers = len(self.encoders0) + len(self.encoders) + len(self.tp_encoders)
+        if cache is None:
+            cache = [None] * num_layers
+        new_cache = []
+
+        def forward_layers(xs_pad, encoder_layers):
+            for encoder_layer in encoder_layers:
+                xs_pad, layer_cache = encoder_layer.forward_streaming(
+                    xs_pad, cache[len(new_cache)], num_stable, look_back, num_prefix
+                )
+                new_cache.append(layer_cache)
+            return xs_pad
+
+        # forward encoder1
+        xs_pad = forward_layers(xs_pad, self.encoders0)
+        xs_pad = forward_layers(xs_pad, self.encoders)
+        xs_pad = self.after_norm(xs_pad)
+        # forward encoder2
+        xs_pad = forward_layers(xs_pad, self.tp_encoders)
+        xs_pad = self.tp_norm(xs_pad)
+        return xs_pad, new_cache
+
 
 @tables.register("model_classes", "SenseVoiceSmall")
 class SenseVoiceSmall(nn.Module):
@@ -946,4 +1117,4 @@ class SenseVoiceSmall(nn.Module):
         if "max_seq_len" not in kwargs:
             kwargs["max_seq_len"] = 512
         models = export_rebuild_model(model=self, **kwargs)
-        return models
\ No newline at end of file
+        return models
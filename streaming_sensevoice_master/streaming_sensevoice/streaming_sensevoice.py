@@ -12,20 +12,62 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
 from functools import partial
-from typing import List
+from typing import Dict, List, Union
 
 import torch
 from asr_decoder import CTCDecoder
+from asr_decoder.context_graph import ContextGraph
 from funasr import AutoModel
 from funasr.frontends.wav_frontend import load_cmvn
 from online_fbank import OnlineFbank
 import numpy as np
 
+from .keyword_scanner import KeywordScanner
 from .sensevoice import SenseVoiceSmall
 
 
 sensevoice_models = {}
+# per model artifacts, shared by all the sessions like the models
+sensevoice_queries = {}
+symbol_tables = {}
+context_graphs = {}
+
+
+class FeatureCache:
+    """Fixed size window of the latest feature frames.
+
+    Every frame is written twice, `size` rows apart, so the window is always
+    the contiguous view `buffer[pos : pos + size]` and is never rolled or
+    copied.
+    """
+
+    def __init__(self, size: int, dim: int):
+        self.size = size
+        self.buffer = torch.zeros((2 * size, dim))
+        self.pos = 0
+
+    def reset(self):
+        self.buffer.zero_()
+        self.pos = 0
+
+    def extend(self, frames: torch.Tensor):
+        if len(frames) > self.size:
+            self.pos = (self.pos + len(frames) - self.size) % self.size
+            frames = frames[-self.size :]
+        head = min(len(frames), self.size - self.pos)
+        for beg in (self.pos, self.pos + self.size):
+            self.buffer[beg : beg + head] = frames[:head]
+        tail = len(frames) - head
+        if tail > 0:
+            self.buffer[:tail] = frames[head:]
+            self.buffer[self.size : self.size + tail] = frames[head:]
+        self.pos = (self.pos + len(frames)) % self.size
+
+    def window(self) -> torch.Tensor:
+        return self.buffer[self.pos : self.pos + self.size]
 
 
 class StreamingSenseVoice:
@@ -39,6 +81,8 @@ class StreamingSenseVoice:
         textnorm: bool = False,
         device: str = "cpu",
         model: str = "iic/SenseVoiceSmall",
+        encoder_cache: bool = False,
+        persist_cache: bool = False,
     ):
         """
         Args:
@@ -46,22 +90,17 @@ class StreamingSenseVoice:
             If not empty, then valid values are: auto, zh, en, ja, ko, yue
         textnorm:
             True to enable inverse text normalization; False to disable it.
+        encoder_cache:
+            True to keep the per-layer attention and FSMN caches across chunks
+            and only encode the new frames; False to re-encode the whole
+            padded window for every chunk.
+        persist_cache:
+            True to also keep the symbol table in `symbol_table.json` next to
+            the bpe model, so that a new process does not rebuild it.
         """
         self.device = device
         self.model, kwargs = self.load_model(model=model, device=device)
-        # language query
-        language = self.model.lid_dict[language]
-        language = torch.LongTensor([[language]]).to(self.device)
-        language = self.model.embed(language).repeat(1, 1, 1)
-        # text normalization query
-        textnorm = self.model.textnorm_dict["withitn" if textnorm else "woitn"]
-        textnorm = torch.LongTensor([[textnorm]]).to(self.device)
-        textnorm = self.model.embed(textnorm).repeat(1, 1, 1)
-        # event and emotion query
-        event_emo = self.model.embed(torch.LongTensor([[1, 2]]).to(self.device)).repeat(
-            1, 1, 1
-        )
-        self.query = torch.cat((language, event_emo, textnorm), dim=1)
+        self.query = self.load_query(model, device, language, textnorm)
         # features
         cmvn = load_cmvn(kwargs["frontend_conf"]["cmvn_file"]).numpy()
         self.neg_mean, self.inv_stddev = cmvn[0, :], cmvn[1, :]
@@ -69,12 +108,14 @@ class StreamingSenseVoice:
         # decoder
         self.tokenizer = kwargs["tokenizer"]
         bpe_model = kwargs["tokenizer_conf"]["bpemodel"]
-        symbol_table = {}
-        for i in range(self.tokenizer.get_vocab_size()):
-            symbol_table[self.tokenizer.decode(i)] = i
         if beam_size > 1 and contexts is not None:
             self.beam_size = beam_size
-            self.decoder = CTCDecoder(contexts, symbol_table, bpe_model)
+            # the hotword graph is read-only while decoding, share it
+            self.decoder = CTCDecoder()
+            self.decoder.context_graph = self.load_context_graph(
+                contexts, self.tokenizer, bpe_model, persist_cache
+            )
+            self.decoder.reset()
         else:
             self.beam_size = 1
             self.decoder = CTCDecoder()
@@ -82,9 +123,12 @@ class StreamingSenseVoice:
         self.chunk_size = chunk_size
         self.padding = padding
         self.cur_idx = -1
-        self.caches_shape = (chunk_size + 2 * padding, kwargs["input_size"])
-        self.caches = torch.zeros(self.caches_shape)
-        self.zeros = np.zeros((1, kwargs["input_size"]), dtype=float)
+        self.caches = FeatureCache(chunk_size + 2 * padding, kwargs["input_size"])
+        self.zeros = np.zeros((1, kwargs["input_size"]), dtype=np.float32)
+        self.fbank_used = False
+        self.encoder_cache = encoder_cache
+        self.layer_caches = None
+        self.keyword_scanner = None
 
     @staticmethod
     def load_model(model: str, device: str) -> tuple:
@@ -96,11 +140,77 @@ class StreamingSenseVoice:
             sensevoice_models[key] = (model, kwargs)
         return sensevoice_models[key]
 
+    @torch.no_grad()
+    def load_query(self, model: str, device: str, language: str, textnorm: bool):
+        """The language, event, emotion and text normalization queries
+        prepended to the encoder input."""
+        key = f"{model}-{device}-{language}-{textnorm}"
+        if key not in sensevoice_queries:
+            # language query
+            language = self.model.lid_dict[language]
+            language = torch.LongTensor([[language]]).to(device)
+            language = self.model.embed(language).repeat(1, 1, 1)
+            # text normalization query
+            textnorm = self.model.textnorm_dict["withitn" if textnorm else "woitn"]
+            textnorm = torch.LongTensor([[textnorm]]).to(device)
+            textnorm = self.model.embed(textnorm).repeat(1, 1, 1)
+            # event and emotion query
+            event_emo = self.model.embed(torch.LongTensor([[1, 2]]).to(device)).repeat(
+                1, 1, 1
+            )
+            sensevoice_queries[key] = torch.cat((language, event_emo, textnorm), dim=1)
+        return sensevoice_queries[key]
+
+    @staticmethod
+    def load_symbol_table(tokenizer, bpe_model: str, persist: bool = False) -> dict:
+        if bpe_model in symbol_tables:
+            return symbol_tables[bpe_model]
+        path = os.path.join(os.path.dirname(bpe_model), "symbol_table.json")
+        # rebuild the persisted table if the bpe model changed
+        stat = os.stat(bpe_model)
+        source = [stat.st_size, stat.st_mtime_ns]
+        symbol_table = None
+        if persist and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("source") == source:
+                symbol_table = cached["symbols"]
+        if symbol_table is None:
+            symbol_table = {}
+            for i in range(tokenizer.get_vocab_size()):
+                symbol_table[tokenizer.decode(i)] = i
+            if persist:
+                try:
+                    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                        json.dump({"source": source, "symbols": symbol_table}, f, ensure_ascii=False)
+                    os.replace(f"{path}.tmp", path)
+                except OSError:
+                    # read-only model directory, keep it in process only
+                    pass
+        symbol_tables[bpe_model] = symbol_table
+        return symbol_table
+
+    @staticmethod
+    def load_context_graph(
+        contexts: List[str], tokenizer, bpe_model: str, persist: bool = False
+    ) -> ContextGraph:
+        key = (bpe_model, tuple(contexts))
+        if key not in context_graphs:
+            symbol_table = StreamingSenseVoice.load_symbol_table(tokenizer, bpe_model, persist)
+            context_graphs[key] = ContextGraph(contexts, symbol_table, bpe_model)
+        return context_graphs[key]
+
     def reset(self):
         self.cur_idx = -1
         self.decoder.reset()
-        self.fbank = OnlineFbank(window_type="hamming")
-        self.caches = torch.zeros(self.caches_shape)
+        # OnlineFbank can not be rewound, only replace it once it got audio
+        if self.fbank_used:
+            self.fbank = OnlineFbank(window_type="hamming")
+            self.fbank_used = False
+        self.caches.reset()
+        self.layer_caches = None
+        if self.keyword_scanner is not None:
+            self.keyword_scanner.reset()
 
     def get_size(self):
         effective_size = self.cur_idx + 1 - self.padding
@@ -108,15 +218,65 @@ class StreamingSenseVoice:
             return 0
         return effective_size % self.chunk_size or self.chunk_size
 
-    def inference(self, speech):
-        speech = speech[None, :, :]
-        speech_lengths = torch.tensor([speech.shape[1]])
-        speech = speech.to(self.device)
-        speech_lengths = speech_lengths.to(self.device)
-        speech = torch.cat((self.query, speech), dim=1)
-        speech_lengths += 4
-        encoder_out, _ = self.model.encoder(speech, speech_lengths)
-        return self.model.ctc.log_softmax(encoder_out)[0, 4:]
+    def get_num_frames_to_chunk(self):
+        num_frames = self.cur_idx + 1
+        if num_frames < self.padding + self.chunk_size:
+            return self.padding + self.chunk_size - num_frames
+        return self.chunk_size - (num_frames - self.padding) % self.chunk_size
+
+    def get_encoder_input(self, window, cur_size, is_last):
+        """
+        Returns:
+        speech:
+            Encoder input of the chunk, (1, time, input_size).
+        num_skip:
+            Number of leading encoder outputs which are not part of the chunk.
+        kwargs:
+            Arguments of `encoder.forward_streaming`, None to encode the whole
+            window with `encoder.forward`.
+        """
+        query_size = self.query.size(1)
+        if not self.encoder_cache:
+            speech = torch.cat((self.query, window[None, :, :].to(self.device)), dim=1)
+            num_skip = query_size + self.padding
+            if cur_size != self.chunk_size:
+                num_skip += self.chunk_size - cur_size
+            return speech, num_skip, None
+
+        # frames not emitted yet: the current chunk and its look-ahead
+        num_pending = min(cur_size + self.padding, self.cur_idx + 1)
+        num_stable = num_pending if is_last else self.chunk_size
+        if self.layer_caches is None:
+            # first chunk: same window as `encoder.forward`, the query tokens
+            # and the left padding are committed to the caches with the chunk
+            speech = window[-(num_pending + self.padding) :][None, :, :]
+            speech = torch.cat((self.query, speech.to(self.device)), dim=1)
+            num_skip = query_size + self.padding
+            offset = 0
+        else:
+            speech = window[-num_pending:][None, :, :].to(self.device)
+            num_skip = 0
+            offset = query_size + self.padding
+        kwargs = {
+            "num_stable": num_skip + num_stable,
+            "look_back": self.padding,
+            "num_prefix": query_size,
+            "offset": offset,
+        }
+        return speech, num_skip, kwargs
+
+    @torch.no_grad()
+    def inference(self, window, cur_size, is_last):
+        speech, num_skip, kwargs = self.get_encoder_input(window, cur_size, is_last)
+        if kwargs is None:
+            speech_lengths = torch.tensor([speech.size(1)], device=self.device)
+            encoder_out, _ = self.model.encoder(speech, speech_lengths)
+        else:
+            encoder_out, self.layer_caches = self.model.encoder.forward_streaming(
+                speech, self.layer_caches, **kwargs
+            )
+        probs = self.model.ctc.log_softmax(encoder_out)[0, num_skip:]
+        return probs if is_last else probs[: self.chunk_size]
 
     def decode(self, times, tokens):
         times_ms = []
@@ -126,32 +286,81 @@ class StreamingSenseVoice:
             times_ms.append(step * 60)
         return times_ms, self.tokenizer.decode(tokens)
 
-    def streaming_inference(self, audio, is_last):
+    def get_chunks(self, audio, is_last):
+        """Accept audio and yield `(window, cur_size, is_last)` for every chunk
+        ready for the encoder, `window` is only valid until the next chunk."""
         self.fbank.accept_waveform(audio, is_last)
+        self.fbank_used = True
         features = self.fbank.get_lfr_frames(
             neg_mean=self.neg_mean, inv_stddev=self.inv_stddev
         )
         if is_last and len(features) == 0:
             features = self.zeros
-        for idx, feature in enumerate(torch.unbind(torch.tensor(features), dim=0)):
-            is_last = is_last and idx == features.shape[0] - 1
-            self.caches = torch.roll(self.caches, -1, dims=0)
-            self.caches[-1, :] = feature
-            self.cur_idx += 1
+        features = torch.from_numpy(np.asarray(features, dtype=np.float32))
+        beg, end = 0, len(features)
+        while beg < end:
+            # write up to the end of the current chunk at once
+            num_frames = min(self.get_num_frames_to_chunk(), end - beg)
+            self.caches.extend(features[beg : beg + num_frames])
+            self.cur_idx += num_frames
+            beg += num_frames
+            last_chunk = is_last and beg == end
             cur_size = self.get_size()
-            if cur_size != self.chunk_size and not is_last:
+            if cur_size != self.chunk_size and not last_chunk:
                 continue
-            probs = self.inference(self.caches)[self.padding :]
-            if cur_size != self.chunk_size:
-                probs = probs[self.chunk_size - cur_size :]
-            if not is_last:
-                probs = probs[: self.chunk_size]
-            if self.beam_size > 1:
-                res = self.decoder.ctc_prefix_beam_search(
-                    probs, beam_size=self.beam_size, is_last=is_last
-                )
-                times_ms, text = self.decode(res["times"][0], res["tokens"][0])
-            else:
-                res = self.decoder.ctc_greedy_search(probs, is_last=is_last)
-                times_ms, text = self.decode(res["times"], res["tokens"])
-            yield {"timestamps": times_ms, "text": text}
\ No newline at end of file
+            yield self.caches.window(), cur_size, last_chunk
+
+    def decode_chunk(self, probs, is_last):
+        if self.beam_size > 1:
+            res = self.decoder.ctc_prefix_beam_search(
+                probs, beam_size=self.beam_size, is_last=is_last
+            )
+            times_ms, text = self.decode(res["times"][0], res["tokens"][0])
+        else:
+            res = self.decoder.ctc_greedy_search(probs, is_last=is_last)
+            times_ms, text = self.decode(res["times"], res["tokens"])
+        return {"timestamps": times_ms, "text": text}
+
+    def set_keywords(
+        self,
+        keywords: Union[List[str], Dict[str, float]],
+        threshold: float = 0.5,
+        window: int = 20,
+    ):
+        """
+        Args:
+        keywords:
+            Keywords to scan for with `keyword_scan`, or keyword -> threshold.
+        threshold:
+            Confidence threshold of the keywords without their own threshold.
+        window:
+            Number of encoder frames (60ms each) a keyword must fit in.
+        """
+        if isinstance(keywords, dict):
+            thresholds = {k: v if v is not None else threshold for k, v in keywords.items()}
+        else:
+            thresholds = threshold
+        token_ids = {}
+        for keyword in keywords:
+            tokens = self.tokenizer.encode(keyword)
+            # drop the word boundary pieces, CTC never emits them alone
+            token_ids[keyword] = [t for t in tokens if len(self.tokenizer.decode(t).strip()) > 0]
+        self.keyword_scanner = KeywordScanner(token_ids, thresholds, window)
+
+    def keyword_scan(self, audio, is_last):
+        """Encode the audio like `streaming_inference` but only score the
+        keywords of `set_keywords` on the CTC log-probs, without beam search.
+
+        Returns:
+            [{"keyword", "score", "end_ms"}] of the keywords detected.
+        """
+        hits = []
+        for window, cur_size, last_chunk in self.get_chunks(audio, is_last):
+            probs = self.inference(window, cur_size, last_chunk)
+            hits.extend(self.keyword_scanner.scan(probs))
+        return hits
+
+    def streaming_inference(self, audio, is_last):
+        for window, cur_size, last_chunk in self.get_chunks(audio, is_last):
+            probs = self.inference(window, cur_size, last_chunk)
+            yield self.decode_chunk(probs, last_chunk)
@@ -0,0 +1,50 @@
+"""
+BatchedStreamingEngine request handling, with sessions that do not encode
+anything.
+
+```bash
+pytest tests
+```
+"""
+
+import threading
+import time
+
+import pytest
+
+from streaming_sensevoice.engine import BatchedStreamingEngine
+
+
+class Session:
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get_chunks(self, audio, is_last):
+        self.started.set()
+        self.release.wait()
+        return iter(())
+
+
+def test_close_fails_queued_requests():
+    engine = BatchedStreamingEngine(max_wait_ms=0)
+    session = Session()
+    first = engine.submit(session, b"", False)
+    assert session.started.wait(5)
+    # queued behind the request being processed
+    queued = [engine.submit(session, b"", False) for _ in range(3)]
+
+    closing = threading.Thread(target=engine.close)
+    closing.start()
+    while engine.running:
+        time.sleep(0.001)
+    session.release.set()
+    closing.join(5)
+    assert not closing.is_alive()
+
+    assert first.result(0) == []
+    for future in queued:
+        with pytest.raises(RuntimeError):
+            future.result(0)
+    with pytest.raises(RuntimeError):
+        engine.submit(session, b"", False).result(0)
@@ -0,0 +1,137 @@
+"""
+Cached vs windowed streaming encoder and FeatureCache vs the former roll
+buffer, on a small randomly initialized encoder so that no model download is
+needed.
+
+```bash
+pytest tests
+```
+"""
+
+import numpy as np
+import pytest
+import torch
+from asr_decoder import CTCDecoder
+from funasr.models.ctc.ctc import CTC
+from online_fbank import OnlineFbank
+
+from streaming_sensevoice import StreamingSenseVoice
+from streaming_sensevoice.sensevoice import SenseVoiceEncoderSmall
+from streaming_sensevoice.streaming_sensevoice import FeatureCache
+
+INPUT_SIZE = 560
+VOCAB_SIZE = 4
+SCALE = 0.1
+
+
+class Tokenizer:
+    def decode(self, tokens):
+        if isinstance(tokens, int):
+            tokens = [tokens]
+        return "".join(chr(ord("a") + t) for t in tokens)
+
+
+class Model(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.encoder = SenseVoiceEncoderSmall(
+            input_size=INPUT_SIZE,
+            output_size=64,
+            attention_heads=4,
+            linear_units=128,
+            num_blocks=3,
+            tp_blocks=1,
+            dropout_rate=0.0,
+        )
+        self.ctc = CTC(odim=VOCAB_SIZE, encoder_output_size=64)
+        # small attention, FSMN and feed forward updates over the residuals, so
+        # that the hypotheses follow the input frames like a trained encoder
+        # rather than the approximation of the cached history
+        with torch.no_grad():
+            for layer in list(self.encoder.encoders) + list(self.encoder.tp_encoders):
+                for module in (layer.self_attn, layer.feed_forward):
+                    for param in module.parameters():
+                        param.mul_(SCALE)
+
+
+def streaming_model(model, query, encoder_cache, chunk_size=10, padding=8):
+    # the model, the query and the cmvn of the pretrained model are replaced
+    # by small random ones, the rest is set up like `__init__`
+    asr = StreamingSenseVoice.__new__(StreamingSenseVoice)
+    asr.device = "cpu"
+    asr.model = model
+    asr.query = query
+    asr.neg_mean = np.full(INPUT_SIZE, -10.0, dtype=np.float32)
+    asr.inv_stddev = np.full(INPUT_SIZE, 0.2, dtype=np.float32)
+    asr.fbank = OnlineFbank(window_type="hamming")
+    asr.tokenizer = Tokenizer()
+    asr.beam_size = 1
+    asr.decoder = CTCDecoder()
+    asr.chunk_size = chunk_size
+    asr.padding = padding
+    asr.cur_idx = -1
+    asr.caches = FeatureCache(chunk_size + 2 * padding, INPUT_SIZE)
+    asr.zeros = np.zeros((1, INPUT_SIZE), dtype=np.float32)
+    asr.fbank_used = False
+    asr.encoder_cache = encoder_cache
+    asr.layer_caches = None
+    asr.keyword_scanner = None
+    return asr
+
+
+@pytest.fixture(scope="module")
+def samples():
+    rng = np.random.default_rng(0)
+    # 4s of noise with a slowly changing envelope, so the hypotheses change
+    envelope = np.repeat(rng.uniform(0.1, 1.0, 40), 1600)
+    return (rng.standard_normal(len(envelope)) * envelope * 3000).astype(np.float32)
+
+
+def transcribe(asr, samples, step=1600):
+    asr.reset()
+    hyps, probs = [], []
+    inference = asr.inference
+
+    def recorded(*args):
+        probs.append(inference(*args))
+        return probs[-1]
+
+    asr.inference = recorded
+    for i in range(0, len(samples), step):
+        is_last = i + step >= len(samples)
+        for res in asr.streaming_inference(samples[i : i + step], is_last):
+            hyps.append(res["text"])
+    return hyps, probs
+
+
+def test_encoder_cache_matches_windowed(samples):
+    model = Model().eval()
+    query = torch.randn(1, 4, INPUT_SIZE)
+    windowed, windowed_probs = transcribe(streaming_model(model, query, False), samples)
+    cached, cached_probs = transcribe(streaming_model(model, query, True), samples)
+
+    assert len(windowed) == len(cached) > 1
+    # the first chunk sees the same frames in both modes
+    torch.testing.assert_close(cached_probs[0], windowed_probs[0], atol=1e-4, rtol=1e-4)
+    # the later chunks reuse the history encoded without their look-ahead,
+    # the approximation must not change the hypotheses
+    assert cached == windowed
+    assert len(set(windowed)) > 2
+
+
+def test_feature_cache_matches_roll():
+    size, dim = 26, 4
+    rng = np.random.default_rng(0)
+    roll = torch.zeros((size, dim))
+    cache = FeatureCache(size, dim)
+    for num_frames in [0, 1, 7, 25, 26, 3, 40, 9, 1, 52, 13]:
+        frames = torch.from_numpy(rng.standard_normal((num_frames, dim)).astype(np.float32))
+        for frame in frames:
+            roll = torch.roll(roll, -1, dims=0)
+            roll[-1, :] = frame
+        cache.extend(frames)
+        assert torch.equal(cache.window(), roll)
+
+    cache.reset()
+    assert torch.equal(cache.window(), torch.zeros((size, dim)))